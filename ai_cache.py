@@ -0,0 +1,158 @@
+"""
+Response cache for /ask.
+
+Answers are keyed by sha256(model, system prompt, normalized question), where
+normalizing casefolds the question, collapses whitespace and drops trailing
+punctuation, so "What is Spice?" and "what is spice" share one entry.
+
+The most recently used AI_CACHE_SIZE entries live in an in-memory LRU and are
+served without touching the database. Every entry is also written to the
+ai_response_cache table, so the cache survives restarts: load() warms the LRU
+from the newest rows at startup and an LRU miss falls back to one primary-key
+lookup before a completion is requested. Entries older than AI_CACHE_TTL
+seconds are ignored and purged on load().
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from database import dialect_insert
+from models import get_async_db_session, AIResponseCacheEntry
+
+logger = logging.getLogger(__name__)
+
+AI_CACHE_SIZE = int(os.getenv('AI_CACHE_SIZE', '1000'))
+AI_CACHE_TTL = float(os.getenv('AI_CACHE_TTL', str(7 * 24 * 3600)))
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Casefold, collapse whitespace and strip trailing ?!. so trivially different phrasings match"""
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", prompt.casefold()).strip())
+
+
+def cache_key(model: str, system_prompt: str, prompt: str) -> str:
+    return hashlib.sha256("\0".join((model, system_prompt, normalize_prompt(prompt))).encode()).hexdigest()
+
+
+def _created_time(created_at: datetime) -> float:
+    """time.time() equivalent of a stored (naive UTC) created_at"""
+    return time.time() - (datetime.utcnow() - created_at).total_seconds()
+
+
+class AIResponseCache:
+    """In-memory LRU of answers with TTL, backed by the ai_response_cache table"""
+
+    def __init__(self, max_entries: int = AI_CACHE_SIZE, ttl: float = AI_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, answer: str, output_tokens: int, created: float) -> None:
+        with self._lock:
+            self._entries[key] = (answer, output_tokens, created)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            answer, output_tokens, created = entry
+            if time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return answer, output_tokens
+
+    async def get(self, key: str) -> Optional[Tuple[str, int]]:
+        """(answer, output_tokens) for a fresh entry, from memory or the backing table"""
+        cached = self._lookup(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        async with get_async_db_session() as session:
+            row = await session.get(AIResponseCacheEntry, key)
+        if row is not None:
+            created = _created_time(row.created_at)
+            if time.time() - created <= self.ttl:
+                self._remember(key, row.answer, row.output_tokens, created)
+                self.store_hits += 1
+                return row.answer, row.output_tokens
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, model: str, answer: str, output_tokens: int) -> None:
+        """Remember an answer in memory and persist it"""
+        now = datetime.utcnow()
+        self._remember(key, answer, output_tokens, time.time())
+        async with get_async_db_session() as session:
+            try:
+                stmt = dialect_insert(session.bind.dialect.name)(AIResponseCacheEntry)
+                await session.execute(stmt.on_conflict_do_update(
+                    index_elements=[AIResponseCacheEntry.key],
+                    set_={
+                        'answer': stmt.excluded.answer,
+                        'output_tokens': stmt.excluded.output_tokens,
+                        'model_used': stmt.excluded.model_used,
+                        'created_at': stmt.excluded.created_at
+                    }
+                ), {"key": key, "model_used": model, "answer": answer,
+                    "output_tokens": output_tokens, "created_at": now})
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    async def load(self) -> int:
+        """Purge expired rows and warm the LRU with the newest entries. Returns the number loaded."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        async with get_async_db_session() as session:
+            try:
+                await session.execute(delete(AIResponseCacheEntry).where(AIResponseCacheEntry.created_at < cutoff))
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+            rows = (await session.execute(
+                select(AIResponseCacheEntry.key, AIResponseCacheEntry.answer,
+                       AIResponseCacheEntry.output_tokens, AIResponseCacheEntry.created_at)
+                .order_by(AIResponseCacheEntry.created_at.desc())
+                .limit(self.max_entries)
+            )).all()
+        # Oldest first so the newest end up most recently used
+        for key, answer, output_tokens, created_at in reversed(rows):
+            self._remember(key, answer, output_tokens, _created_time(created_at))
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.store_hits + self.misses
+        return {
+            "hits": self.hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.store_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+# Global AI response cache instance
+ai_response_cache = AIResponseCache()
@@ -0,0 +1,91 @@
+"""
+Bounded FIFO admission for AI requests.
+
+At most AI_MAX_CONCURRENCY completions run at once per process; up to
+AI_QUEUE_LIMIT more wait their turn in arrival order and learn their queue
+position when they join. Anything beyond that is refused immediately
+(QueueFullError) instead of piling up behind a slow upstream.
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', '4'))
+AI_QUEUE_LIMIT = int(os.getenv('AI_QUEUE_LIMIT', '20'))
+
+
+class QueueFullError(Exception):
+    """Raised when the wait queue is already at AI_QUEUE_LIMIT"""
+
+
+class AIRequestQueue:
+    """Semaphore with a bounded, position-aware FIFO wait queue"""
+
+    def __init__(self, max_concurrency: int = AI_MAX_CONCURRENCY, max_waiting: int = AI_QUEUE_LIMIT):
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.rejected = 0
+        self.queued = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, on_queued: Optional[Callable[[int], Awaitable[None]]] = None) -> None:
+        """Take a slot, waiting in line if all are busy. on_queued(position) is awaited when queued."""
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+        if len(self._waiters) >= self.max_waiting:
+            self.rejected += 1
+            raise QueueFullError(f"{len(self._waiters)} AI requests are already waiting")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            if on_queued:
+                try:
+                    await on_queued(len(self._waiters))
+                except Exception as e:
+                    logger.warning(f"Queue position callback failed: {e}")
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to us just as we were cancelled; pass it on
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        """Hand the slot to the next waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, on_queued: Optional[Callable[[int], Awaitable[None]]] = None):
+        await self.acquire(on_queued)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self._active,
+            "waiting": len(self._waiters),
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,228 @@
+"""
+In-memory daily AI quota accounting.
+
+AIService used to run two COUNT(*) queries over ai_usage before every request
+and open another session to log it afterwards. AIQuotaTracker keeps today's
+per-user and per-guild request counts in dictionaries instead:
+
+- seed() loads today's counts from ai_usage with one GROUP BY per key, so the
+  quotas stay correct across a restart. At midnight the counters start over
+  in memory on the first check of the new day, so no check waits on the
+  database (every request of the new day has gone through this tracker).
+- reserve() checks both limits and increments both counters under one lock,
+  so concurrent requests cannot overshoot a limit between check and log.
+- record() queues the ai_usage row; a background task inserts queued rows in
+  one batch every AI_USAGE_FLUSH_INTERVAL seconds and on shutdown. Answers
+  served from the response cache or shared with an identical in-flight
+  request are logged as model_used='cache'/'coalesced' and are not counted.
+
+Only rows still queued when the process is killed are lost, so a hard crash
+can under-count by at most one flush interval of requests. Counters are per
+process: run one tracker per database if the bot is ever split across processes.
+"""
+import asyncio
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+
+from models import get_db_session, get_async_db_session, AIUsage
+
+logger = logging.getLogger(__name__)
+
+AI_USAGE_FLUSH_INTERVAL = float(os.getenv('AI_USAGE_FLUSH_INTERVAL', '5.0'))
+# model_used of answers that did not need their own completion; free of quota
+CACHED_MODEL = 'cache'  # served from the response cache
+COALESCED_MODEL = 'coalesced'  # shared with an identical in-flight request
+FREE_MODELS = (CACHED_MODEL, COALESCED_MODEL)
+
+
+@dataclass(frozen=True)
+class QuotaReservation:
+    """One request counted against today's quotas"""
+    day: str
+    guild_id: int
+    user_id: int
+    user_used: int
+    guild_used: int
+
+
+class AIQuotaTracker:
+    """Per-day AI request counters with check-and-reserve and batched persistence"""
+
+    def __init__(self, flush_interval: float = AI_USAGE_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._day: Optional[str] = None
+        self._user_counts: Dict[int, int] = {}
+        self._guild_counts: Dict[int, int] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.flushed = 0
+
+    @staticmethod
+    def today() -> str:
+        return date.today().strftime('%Y-%m-%d')
+
+    def seed(self, day: Optional[str] = None) -> None:
+        """Load the counts for `day` (today by default) from ai_usage"""
+        day = day or self.today()
+        session = get_db_session()
+        try:
+            user_counts = dict(session.execute(
+                select(AIUsage.user_id, func.count(AIUsage.id))
+                .where(AIUsage.date_only == day, AIUsage.model_used.notin_(FREE_MODELS)).group_by(AIUsage.user_id)
+            ).all())
+            guild_counts = dict(session.execute(
+                select(AIUsage.guild_id, func.count(AIUsage.id))
+                .where(AIUsage.date_only == day, AIUsage.model_used.notin_(FREE_MODELS)).group_by(AIUsage.guild_id)
+            ).all())
+        finally:
+            session.close()
+
+        with self._lock:
+            self._set_day(day, user_counts, guild_counts)
+
+    def _set_day(self, day: str, user_counts: Dict[int, int], guild_counts: Dict[int, int]) -> None:
+        """Switch the counters to `day`, adding the rows queued for it (they are not in the table yet)"""
+        for row in self._pending:
+            if row["date_only"] == day and row["model_used"] not in FREE_MODELS:
+                user_counts[row["user_id"]] = user_counts.get(row["user_id"], 0) + 1
+                guild_counts[row["guild_id"]] = guild_counts.get(row["guild_id"], 0) + 1
+        self._day = day
+        self._user_counts = user_counts
+        self._guild_counts = guild_counts
+
+    def _ensure_day(self) -> str:
+        day = self.today()
+        if self._day is None:
+            # Only when start() was never awaited; the bot seeds in a worker thread at startup
+            self.seed(day)
+        elif self._day != day:
+            with self._lock:
+                if self._day != day:
+                    self._set_day(day, {}, {})
+        return day
+
+    def usage(self, guild_id: int, user_id: int) -> Tuple[int, int]:
+        """Today's (user, guild) request counts"""
+        self._ensure_day()
+        with self._lock:
+            return self._user_counts.get(user_id, 0), self._guild_counts.get(guild_id, 0)
+
+    def reserve(self, guild_id: int, user_id: int, user_limit: int,
+                guild_limit: int) -> Tuple[Optional[QuotaReservation], Optional[str]]:
+        """
+        Atomically check both limits and count one request against them.
+        Returns (reservation, None), or (None, "user"/"guild") naming the exhausted limit.
+        """
+        day = self._ensure_day()
+        with self._lock:
+            user_used = self._user_counts.get(user_id, 0)
+            if user_used >= user_limit:
+                return None, "user"
+            guild_used = self._guild_counts.get(guild_id, 0)
+            if guild_used >= guild_limit:
+                return None, "guild"
+            self._user_counts[user_id] = user_used + 1
+            self._guild_counts[guild_id] = guild_used + 1
+            return QuotaReservation(day, guild_id, user_id, user_used + 1, guild_used + 1), None
+
+    def release(self, reservation: QuotaReservation) -> None:
+        """Give back a reservation whose request failed before reaching the model"""
+        with self._lock:
+            if reservation.day != self._day:
+                return
+            for counts, key in ((self._user_counts, reservation.user_id), (self._guild_counts, reservation.guild_id)):
+                if counts.get(key, 0) > 0:
+                    counts[key] -= 1
+
+    def record(self, reservation: QuotaReservation, prompt_chars: int, output_tokens: int, model_used: str) -> None:
+        """Queue the ai_usage row for a completed request"""
+        with self._lock:
+            self._pending.append({
+                "guild_id": reservation.guild_id,
+                "user_id": reservation.user_id,
+                "prompt_chars": prompt_chars,
+                "output_tokens": output_tokens,
+                "model_used": model_used,
+                "date_only": reservation.day,
+            })
+
+    def record_free(self, guild_id: int, user_id: int, prompt_chars: int, model_used: str = CACHED_MODEL) -> None:
+        """Queue the ai_usage row for an answer that needed no completion of its own (not counted against quotas)"""
+        with self._lock:
+            self._pending.append({
+                "guild_id": guild_id,
+                "user_id": user_id,
+                "prompt_chars": prompt_chars,
+                "output_tokens": 0,
+                "model_used": model_used,
+                "date_only": self.today(),
+            })
+
+    async def flush(self) -> int:
+        """Insert every queued usage row in one batch. Returns the number written."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+        async with get_async_db_session() as session:
+            try:
+                await session.execute(insert(AIUsage.__table__), rows)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                with self._lock:
+                    self._pending[:0] = rows
+                raise
+        self.flushed += len(rows)
+        return len(rows)
+
+    async def start(self) -> None:
+        """Seed today's counters and start the background flusher"""
+        await asyncio.to_thread(self.seed)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # Rows were put back in the queue; the next tick retries them
+                logger.error(f"AI usage flush failed, will retry: {e}")
+
+    async def stop(self) -> None:
+        """Stop the flusher after writing everything still queued"""
+        # Wake the flusher instead of cancelling it: a cancel could land mid-flush, after the
+        # queued rows were taken out of _pending, and drop them
+        self._stopping = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "day": self._day,
+                "users": len(self._user_counts),
+                "guilds": len(self._guild_counts),
+                "pending": len(self._pending),
+                "flushed": self.flushed,
+            }
+
+
+# Global quota tracker instance
+ai_quota = AIQuotaTracker()
@@ -1,9 +1,13 @@
 import os
 import json
-from datetime import datetime, date
-from openai import OpenAI
-from models import get_db_session, AIUsage
-from sqlalchemy import func
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+from openai import AsyncOpenAI, APITimeoutError
+from ai_quota import ai_quota, QuotaReservation, COALESCED_MODEL
+from ai_queue import AIRequestQueue, QueueFullError
+from ai_cache import ai_response_cache, cache_key
+from metrics import ai_request_duration, ai_output_tokens
 
 # AI Configuration
 DAILY_USER_LIMIT = 25
@@ -11,44 +15,77 @@ DAILY_SERVER_LIMIT = 500
 OPENAI_MODEL = "gpt-4o-mini"
 MAX_INPUT_CHARS = 4000
 MAX_OUTPUT_TOKENS = 600
+SYSTEM_PROMPT = "You are a helpful assistant in a Discord server. Keep responses concise and friendly."
+AI_REQUEST_TIMEOUT = float(os.getenv('AI_REQUEST_TIMEOUT', '30'))
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # e.g. a local mock server for benchmarks
+
+class InFlightCompletion:
+    """A pending completion that identical concurrent questions share"""
+
+    def __init__(self):
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.listeners: list[Callable[[str], Awaitable[None]]] = []
+        self.text = ""
+
+    async def broadcast(self, text: str):
+        """on_partial for the leading request: forward streamed text to every waiting caller"""
+        self.text = text
+        for listener in list(self.listeners):
+            try:
+                await listener(text)
+            except Exception as e:
+                print(f"Error forwarding streamed AI answer: {e}")
+
 
 class AIService:
     def __init__(self):
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
-        self.client = OpenAI(api_key=self.openai_api_key)
+        self.client = AsyncOpenAI(
+            api_key=self.openai_api_key,
+            base_url=OPENAI_BASE_URL or None,
+            timeout=AI_REQUEST_TIMEOUT,
+            max_retries=1
+        )
+        self.queue = AIRequestQueue()
+        # Completions in progress by cache key; identical questions wait on them instead of calling OpenAI
+        self._inflight: dict[str, InFlightCompletion] = {}
+        self.coalesced = 0
     
     def check_usage_limits(self, guild_id: int, user_id: int) -> tuple[bool, str]:
         """Check if user and server are within daily limits"""
-        session = get_db_session()
         try:
-            today = date.today().strftime('%Y-%m-%d')
-            
-            # Check user daily limit
-            user_usage = session.query(func.count(AIUsage.id)).filter(
-                AIUsage.user_id == user_id,
-                AIUsage.date_only == today
-            ).scalar() or 0
+            user_usage, server_usage = ai_quota.usage(guild_id, user_id)
             
             if user_usage >= DAILY_USER_LIMIT:
-                return False, f"You've reached your daily limit of {DAILY_USER_LIMIT} AI requests. Try again tomorrow!"
-            
-            # Check server daily limit
-            server_usage = session.query(func.count(AIUsage.id)).filter(
-                AIUsage.guild_id == guild_id,
-                AIUsage.date_only == today
-            ).scalar() or 0
+                return False, self.limit_message("user")
             
             if server_usage >= DAILY_SERVER_LIMIT:
-                return False, f"This server has reached its daily limit of {DAILY_SERVER_LIMIT} AI requests. Try again tomorrow!"
+                return False, self.limit_message("guild")
             
             return True, f"Usage: {user_usage}/{DAILY_USER_LIMIT} personal, {server_usage}/{DAILY_SERVER_LIMIT} server"
             
         except Exception as e:
             return False, f"Error checking usage limits: {str(e)}"
-        finally:
-            session.close()
+    
+    @staticmethod
+    def limit_message(exhausted: str) -> str:
+        """Message for an exhausted "user" or "guild" daily limit"""
+        if exhausted == "user":
+            return f"You've reached your daily limit of {DAILY_USER_LIMIT} AI requests. Try again tomorrow!"
+        return f"This server has reached its daily limit of {DAILY_SERVER_LIMIT} AI requests. Try again tomorrow!"
+    
+    def reserve_usage(self, guild_id: int, user_id: int) -> tuple[Optional[QuotaReservation], str]:
+        """Count a request against the daily limits, or explain why it is refused"""
+        try:
+            reservation, exhausted = ai_quota.reserve(guild_id, user_id, DAILY_USER_LIMIT, DAILY_SERVER_LIMIT)
+        except Exception as e:
+            return None, f"Error checking usage limits: {str(e)}"
+        if reservation is None:
+            return None, self.limit_message(exhausted)
+        return reservation, (f"Usage: {reservation.user_used}/{DAILY_USER_LIMIT} personal, "
+                             f"{reservation.guild_used}/{DAILY_SERVER_LIMIT} server")
     
     def trim_prompt(self, prompt: str) -> str:
         """Trim prompt to max character limit"""
@@ -58,69 +95,150 @@ class AIService:
         trimmed = prompt[:MAX_INPUT_CHARS-50]  # Leave room for truncation message
         return f"{trimmed}... [Message trimmed to {MAX_INPUT_CHARS} characters]"
     
-    def log_usage(self, guild_id: int, user_id: int, prompt_chars: int, output_tokens: int):
-        """Log AI usage for tracking"""
-        session = get_db_session()
+    def log_usage(self, reservation: QuotaReservation, prompt_chars: int, output_tokens: int):
+        """Log AI usage for tracking (written to ai_usage in periodic batches)"""
         try:
-            usage = AIUsage(
-                guild_id=guild_id,
-                user_id=user_id,
-                prompt_chars=prompt_chars,
-                output_tokens=output_tokens,
-                model_used=OPENAI_MODEL,
-                date_only=date.today().strftime('%Y-%m-%d')
-            )
-            session.add(usage)
-            session.commit()
+            ai_quota.record(reservation, prompt_chars, output_tokens, OPENAI_MODEL)
+            ai_output_tokens.inc(output_tokens)
         except Exception as e:
-            session.rollback()
             print(f"Error logging AI usage: {e}")
-        finally:
-            session.close()
     
-    async def ask_ai(self, guild_id: int, user_id: int, prompt: str) -> tuple[bool, str]:
-        """Process AI request with all safety checks"""
+    async def _complete(self, trimmed_prompt: str,
+                        on_partial: Optional[Callable[[str], Awaitable[None]]] = None) -> tuple[Optional[str], int]:
+        """Run one completion. With on_partial, stream it and await on_partial(text so far) per token."""
+        # the newest OpenAI model is "gpt-4o-mini" which is cost-effective for conversations
+        request = dict(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": trimmed_prompt}
+            ],
+            max_tokens=MAX_OUTPUT_TOKENS,
+            temperature=0.7
+        )
+        if on_partial is None:
+            response = await self.client.chat.completions.create(**request)
+            output_tokens = response.usage.completion_tokens if response.usage else 0
+            return response.choices[0].message.content, output_tokens
+        
+        parts = []
+        output_tokens = 0
+        stream = await self.client.chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            if chunk.usage:
+                output_tokens = chunk.usage.completion_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                await on_partial("".join(parts))
+        # Some compatible servers omit the usage chunk; fall back to one token per delta
+        return "".join(parts), output_tokens or len(parts)
+    
+    async def ask_ai(self, guild_id: int, user_id: int, prompt: str,
+                     on_queued: Optional[Callable[[int], Awaitable[None]]] = None,
+                     on_partial: Optional[Callable[[str], Awaitable[None]]] = None) -> tuple[bool, str]:
+        """
+        Process AI request with all safety checks. on_queued(position) is awaited if the request has to wait;
+        with on_partial the answer is streamed and on_partial(text so far) is awaited as tokens arrive.
+        """
+        reservation = None
+        started = time.perf_counter()
         try:
-            # Check usage limits first
-            can_use, limit_msg = self.check_usage_limits(guild_id, user_id)
-            if not can_use:
-                return False, limit_msg
-            
             # Trim prompt if too long
             original_length = len(prompt)
             trimmed_prompt = self.trim_prompt(prompt)
+            trim_note = ""
+            if original_length > MAX_INPUT_CHARS:
+                trim_note = f"\n*Note: Your message was trimmed from {original_length} to {MAX_INPUT_CHARS} characters*"
             
-            # Make OpenAI API call
-            # the newest OpenAI model is "gpt-4o-mini" which is cost-effective for conversations
-            response = self.client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are a helpful assistant in a Discord server. Keep responses concise and friendly."
-                    },
-                    {"role": "user", "content": trimmed_prompt}
-                ],
-                max_tokens=MAX_OUTPUT_TOKENS,
-                temperature=0.7
-            )
+            # Repeated questions are answered from the cache without using quota
+            key = cache_key(OPENAI_MODEL, SYSTEM_PROMPT, trimmed_prompt)
+            try:
+                cached = await ai_response_cache.get(key)
+            except Exception as e:
+                print(f"Error reading AI response cache: {e}")
+                cached = None
+            if cached is not None:
+                ai_quota.record_free(guild_id, user_id, len(trimmed_prompt))
+                ai_request_duration.labels("cache").observe(time.perf_counter() - started)
+                return True, cached[0] + "\n\n*Answered from cache - does not count toward your daily limit*" + trim_note
             
-            answer = response.choices[0].message.content
-            output_tokens = response.usage.completion_tokens if response.usage else 0
+            # The same question is already being answered for someone else: share that completion
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                # Sharing is free, but only for callers who could have asked on their own
+                within_limits, limit_msg = self.check_usage_limits(guild_id, user_id)
+                if not within_limits:
+                    ai_request_duration.labels("limited").observe(time.perf_counter() - started)
+                    return False, limit_msg
+                self.coalesced += 1
+                if on_partial is not None:
+                    if inflight.text:
+                        await on_partial(inflight.text)
+                    inflight.listeners.append(on_partial)
+                async with asyncio.timeout(AI_REQUEST_TIMEOUT):
+                    answer, _ = await asyncio.shield(inflight.future)
+                ai_quota.record_free(guild_id, user_id, len(trimmed_prompt), COALESCED_MODEL)
+                ai_request_duration.labels("coalesced").observe(time.perf_counter() - started)
+                return True, (answer or "No response received") + "\n\n*Shared answer to an identical question - does not count toward your daily limit*" + trim_note
+            
+            # Reserve against the usage limits
+            reservation, limit_msg = self.reserve_usage(guild_id, user_id)
+            if reservation is None:
+                ai_request_duration.labels("limited").observe(time.perf_counter() - started)
+                return False, limit_msg
+            
+            # Make OpenAI API call; identical questions arriving meanwhile wait on this one
+            inflight = InFlightCompletion()
+            if on_partial is not None:
+                inflight.listeners.append(on_partial)
+            self._inflight[key] = inflight
+            try:
+                async with self.queue.slot(on_queued):
+                    async with asyncio.timeout(AI_REQUEST_TIMEOUT):
+                        answer, output_tokens = await self._complete(
+                            trimmed_prompt, inflight.broadcast if on_partial is not None else None
+                        )
+            except BaseException as e:
+                if isinstance(e, asyncio.CancelledError):
+                    # Waiting callers were not cancelled themselves; give them an ordinary error
+                    e = RuntimeError("the shared AI request was cancelled")
+                inflight.future.set_exception(e)
+                inflight.future.exception()  # Retrieved here in case nobody else was waiting
+                raise
+            else:
+                inflight.future.set_result((answer, output_tokens))
+            finally:
+                del self._inflight[key]
             
             # Log usage for tracking
-            self.log_usage(guild_id, user_id, len(trimmed_prompt), output_tokens)
+            self.log_usage(reservation, len(trimmed_prompt), output_tokens)
+            reservation = None
+            
+            if answer:
+                try:
+                    await ai_response_cache.put(key, OPENAI_MODEL, answer, output_tokens)
+                except Exception as e:
+                    print(f"Error writing AI response cache: {e}")
             
             # Add usage info to response
-            usage_info = f"\n\n*{limit_msg}*"
-            if original_length > MAX_INPUT_CHARS:
-                usage_info += f"\n*Note: Your message was trimmed from {original_length} to {MAX_INPUT_CHARS} characters*"
+            usage_info = f"\n\n*{limit_msg}*" + trim_note
+            ai_request_duration.labels("completion").observe(time.perf_counter() - started)
             
             return True, (answer or "No response received") + usage_info
             
         except Exception as e:
+            # Failed requests do not count against the quota
+            if reservation is not None:
+                ai_quota.release(reservation)
+            ai_request_duration.labels("error").observe(time.perf_counter() - started)
             error_msg = str(e)
-            if "insufficient_quota" in error_msg:
+            if isinstance(e, QueueFullError):
+                return False, "The AI is busy with too many questions right now. Please try again in a minute."
+            elif isinstance(e, (TimeoutError, APITimeoutError)):
+                return False, f"The AI did not answer within {AI_REQUEST_TIMEOUT:.0f} seconds. Please try again."
+            elif "insufficient_quota" in error_msg:
                 return False, "OpenAI API quota exceeded. Please check your API key billing."
             elif "invalid_api_key" in error_msg:
                 return False, "Invalid OpenAI API key. Please check the configuration."
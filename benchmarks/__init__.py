@@ -0,0 +1,11 @@
+"""
+Offline benchmarks for the bot.
+
+Run from the repository root, e.g. `python -m benchmarks.bench_indexes`.
+They default to a throwaway SQLite file; pass --database-url to point them at
+a local PostgreSQL instead. Never point them at a production database.
+
+benchmarks.suite times every DatabaseManager method and the contribution
+command handlers against synthetic data from benchmarks.datagen and writes
+JSON results that benchmarks.compare diffs between two runs.
+"""
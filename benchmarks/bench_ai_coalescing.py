@@ -0,0 +1,135 @@
+"""
+Harness for single-flight /ask: N concurrent copies of one question should cost one completion.
+
+Fires --duplicates concurrent ask_ai calls for the same question (with varying
+case, spacing and punctuation, from different users) against the local mock
+completions server, then checks that:
+
+- the mock server saw exactly one upstream request,
+- every caller got the answer,
+- only the leading caller's quota was charged, and every caller has its own
+  ai_usage row (one completion, the rest model_used='coalesced'),
+- a caller who already used up their daily limit (asking in another guild)
+  is refused instead of getting the shared answer.
+
+Exits non-zero if any check fails.
+
+    python -m benchmarks.bench_ai_coalescing --duplicates 25
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database, summarize
+from benchmarks.mock_openai import MockCompletionServer
+
+GUILD_ID = 1
+OVER_LIMIT_GUILD = 2
+OVER_LIMIT_USER = 9999
+QUESTION = "Where do I find Spice Melange?"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--duplicates", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds until the mock answers")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+def variant(i: int) -> str:
+    """The question as different members might type it"""
+    text = QUESTION.lower() if i % 2 else QUESTION
+    return ("  " * (i % 3)) + text.rstrip("?") + ("?" * (i % 4))
+
+
+async def run(args) -> dict:
+    server = MockCompletionServer(args.latency, tokens=20, token_delay=0.01)
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = server.start()
+
+    from sqlalchemy import func, select
+    import models
+    from models import create_tables, get_db_session, AIUsage
+    from ai_service import AIService, DAILY_USER_LIMIT
+    from ai_quota import ai_quota
+
+    create_tables()
+    service = AIService()
+    ai_quota.seed()
+    for _ in range(DAILY_USER_LIMIT):
+        ai_quota.reserve(OVER_LIMIT_GUILD, OVER_LIMIT_USER, DAILY_USER_LIMIT, DAILY_USER_LIMIT + 1)
+
+    streamed = {}
+
+    async def ask(i: int):
+        async def on_partial(text: str):
+            streamed[i] = text
+        start = time.perf_counter()
+        # Every third caller streams, to check partial text fans out to waiting callers too
+        ok, answer = await service.ask_ai(GUILD_ID, 3000 + i, variant(i), on_partial=on_partial if i % 3 == 0 else None)
+        return ok, answer, (time.perf_counter() - start) * 1000
+
+    async def ask_over_limit():
+        return await service.ask_ai(OVER_LIMIT_GUILD, OVER_LIMIT_USER, QUESTION)
+
+    *results, over_limit = await asyncio.gather(*(ask(i) for i in range(args.duplicates)), ask_over_limit())
+    await ai_quota.flush()
+
+    session = get_db_session()
+    try:
+        usage_rows = dict(session.execute(
+            select(AIUsage.model_used, func.count(AIUsage.id)).group_by(AIUsage.model_used)
+        ).all())
+    finally:
+        session.close()
+    charged = sum(ai_quota.usage(GUILD_ID, 3000 + i)[0] for i in range(args.duplicates))
+    streaming_callers = len(range(0, args.duplicates, 3))
+
+    checks = {
+        "one upstream request": server.requests == 1,
+        "every caller answered": all(ok and "Mock" in answer for ok, answer, _ in results),
+        "one quota charge": charged == 1 and ai_quota.usage(GUILD_ID, 0)[1] == 1,
+        "one usage row per caller": sum(usage_rows.values()) == args.duplicates
+                                    and usage_rows.get("coalesced") == args.duplicates - 1,
+        "streaming callers saw partial text": len(streamed) == streaming_callers,
+        "over-limit caller refused": not over_limit[0] and "daily limit" in over_limit[1],
+    }
+
+    await service.client.close()
+    server.stop()
+    await models.async_engine.dispose()
+    models.engine.dispose()
+
+    return {
+        "duplicates": args.duplicates,
+        "upstream_requests": server.requests,
+        "coalesced": service.coalesced,
+        "usage_rows": usage_rows,
+        "latency": summarize([ms for _, _, ms in results]),
+        "checks": checks,
+    }
+
+
+def main():
+    args = parse_args()
+    configure_database(args.database_url, fresh=True)
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['duplicates']} identical questions -> {result['upstream_requests']} upstream request(s), "
+              f"{result['coalesced']} coalesced, median {result['latency']['median_ms']:.0f} ms")
+        print(f"ai_usage rows: {result['usage_rows']}")
+        for name, passed in result["checks"].items():
+            print(f"  [{'ok' if passed else 'FAIL'}] {name}")
+    if not all(result["checks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
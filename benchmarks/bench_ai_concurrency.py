@@ -0,0 +1,119 @@
+"""
+Event-loop responsiveness while many /ask completions are in flight.
+
+Starts a local mock of the OpenAI chat completions endpoint that answers after
+--latency seconds, points AIService at it through OPENAI_BASE_URL, fires
+--requests concurrent ask_ai calls and measures how late a 10 ms ticker task
+wakes up meanwhile. --blocking runs the same load through the synchronous
+OpenAI client (the previous implementation) for comparison.
+
+    python -m benchmarks.bench_ai_concurrency --requests 50 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database, summarize
+from benchmarks.mock_openai import MockCompletionServer
+
+TICK = 0.01
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds the mock server takes per completion")
+    parser.add_argument("--blocking", action="store_true", help="use the synchronous OpenAI client inline")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+async def run(args) -> dict:
+    server = MockCompletionServer(args.latency)
+    base_url = server.start()
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("AI_QUEUE_LIMIT", str(args.requests))
+
+    import models
+    from models import create_tables
+    from ai_service import AIService, OPENAI_MODEL
+    from ai_quota import ai_quota
+
+    create_tables()
+    service = AIService()
+    ai_quota.seed()
+
+    if args.blocking:
+        from openai import OpenAI
+        sync_client = OpenAI(api_key="bench", base_url=base_url)
+
+        async def ask(i: int):
+            sync_client.chat.completions.create(model=OPENAI_MODEL, messages=[{"role": "user", "content": f"q{i}"}])
+            return True, ""
+    else:
+        async def ask(i: int):
+            return await service.ask_ai(1, 1000 + i, f"question {i}")
+
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append((time.perf_counter() - start - TICK) * 1000)
+
+    latencies = []
+
+    async def timed(i: int):
+        start = time.perf_counter()
+        ok, _ = await ask(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+        return ok
+
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK * 3)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(timed(i) for i in range(args.requests)))
+    wall = time.perf_counter() - started
+    done.set()
+    await tick_task
+
+    await ai_quota.flush()
+    await service.client.close()
+    server.stop()
+    await models.async_engine.dispose()
+    models.engine.dispose()
+
+    return {
+        "mode": "blocking" if args.blocking else "async",
+        "requests": args.requests,
+        "succeeded": sum(results),
+        "wall_s": round(wall, 3),
+        "loop_lag": {**summarize(lags), "max_ms": max(lags) if lags else 0.0},
+        "request_latency": summarize(latencies),
+        "queue": service.queue.stats(),
+    }
+
+
+def main():
+    args = parse_args()
+    configure_database(args.database_url, fresh=True)
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    lag = result["loop_lag"]
+    latency = result["request_latency"]
+    print(f"{result['mode']}: {result['succeeded']}/{result['requests']} ok in {result['wall_s']:.2f}s")
+    print(f"  loop lag      median {lag['median_ms']:8.2f} ms  p95 {lag['p95_ms']:8.2f} ms  max {lag['max_ms']:8.2f} ms")
+    print(f"  request time  median {latency['median_ms']:8.1f} ms  p95 {latency['p95_ms']:8.1f} ms")
+    print(f"  queue         {result['queue']}")
+
+
+if __name__ == "__main__":
+    main()
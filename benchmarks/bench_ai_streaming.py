@@ -0,0 +1,104 @@
+"""
+Time to first visible token for /ask, streamed versus waiting for the full answer.
+
+Uses the local mock completions server (first token after --latency seconds,
+then one token every --token-delay seconds) and a fake interaction whose
+edit_original_response takes --edit-rtt seconds like a Discord API call.
+"Visible" is the moment the first edit carrying answer text completes.
+
+    python -m benchmarks.bench_ai_streaming --requests 10 --tokens 80
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database, summarize
+from benchmarks.mock_openai import MockCompletionServer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.4, help="seconds until the first token")
+    parser.add_argument("--tokens", type=int, default=80)
+    parser.add_argument("--token-delay", type=float, default=0.03)
+    parser.add_argument("--edit-rtt", type=float, default=0.08, help="simulated Discord edit round trip")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for StreamingAnswer"""
+
+    def __init__(self, edit_rtt: float):
+        self.edit_rtt = edit_rtt
+        self.edit_times = []
+
+    async def edit_original_response(self, **kwargs):
+        await asyncio.sleep(self.edit_rtt)
+        self.edit_times.append(time.monotonic())
+
+
+async def run(args) -> dict:
+    server = MockCompletionServer(args.latency, tokens=args.tokens, token_delay=args.token_delay)
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = server.start()
+
+    import discord
+    import models
+    from models import create_tables
+    from ai_service import AIService
+    from ai_quota import ai_quota
+    from bot.commands import StreamingAnswer
+
+    create_tables()
+    service = AIService()
+    ai_quota.seed()
+
+    results = {}
+    for mode in ("buffered", "streaming"):
+        first_visible, total, edits = [], [], []
+        for i in range(args.requests):
+            interaction = FakeInteraction(args.edit_rtt)
+            streaming = StreamingAnswer(interaction)
+            start = time.monotonic()
+            _, answer = await service.ask_ai(
+                1, 2000 + i, f"{mode} question {i}",
+                on_partial=streaming.update if mode == "streaming" else None
+            )
+            await streaming.finish(discord.Embed(description=answer))
+            first_visible.append((interaction.edit_times[0] - start) * 1000)
+            total.append((interaction.edit_times[-1] - start) * 1000)
+            edits.append(len(interaction.edit_times))
+        results[mode] = {
+            "first_visible": summarize(first_visible),
+            "complete": summarize(total),
+            "edits_per_answer": sum(edits) / len(edits),
+        }
+
+    await ai_quota.flush()
+    await service.client.close()
+    server.stop()
+    await models.async_engine.dispose()
+    models.engine.dispose()
+    return results
+
+
+def main():
+    args = parse_args()
+    configure_database(args.database_url, fresh=True)
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for mode, result in results.items():
+        print(f"{mode:<10} first visible median {result['first_visible']['median_ms']:7.0f} ms  "
+              f"complete median {result['complete']['median_ms']:7.0f} ms  "
+              f"{result['edits_per_answer']:.1f} edits/answer")
+
+
+if __name__ == "__main__":
+    main()
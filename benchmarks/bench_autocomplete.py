@@ -0,0 +1,115 @@
+"""
+material_autocomplete: the original fetch-and-scan implementation versus the
+prebuilt MaterialSearchIndex.
+
+    python -m benchmarks.bench_autocomplete
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database, summarize
+
+QUERIES = ["", "i", "ir", "iro", "iron", "iron o", "sm", "spice", "spice m", "mel", "plast", "zzz", "ore", "sipd"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--iterations", type=int, default=2000, help="keystrokes per implementation")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    configure_database(args.database_url, fresh=True)
+
+    from discord import app_commands
+    import models
+    from models import create_tables, init_default_materials, get_async_db_session, Material
+    from material_catalog import material_catalog
+    from sqlalchemy import select
+
+    create_tables()
+    init_default_materials()
+    material_catalog.reload()
+
+    # Mirror the original handler's logging configuration (INFO, to stderr) but discard the output
+    logger = logging.getLogger("bench.autocomplete")
+    logger.addHandler(logging.NullHandler())
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    async def legacy(current: str):
+        """The pre-index implementation: DB fetch, two INFO logs, lower() + substring per material"""
+        async with get_async_db_session() as session:
+            rows = (await session.scalars(select(Material).order_by(Material.display_name))).all()
+            materials = [{"id": m.id, "name": m.name, "display_name": m.display_name, "value": m.value} for m in rows]
+        logger.info(f"Loaded {len(materials)} materials for autocomplete")
+        choices = []
+        if current:
+            for material in materials:
+                if current.lower() in material['display_name'].lower() or current.lower() in material['name'].lower():
+                    choices.append(app_commands.Choice(name=material['display_name'], value=material['name']))
+                    if len(choices) >= 25:
+                        break
+        if not choices:
+            for material in materials[:25]:
+                choices.append(app_commands.Choice(name=material['display_name'], value=material['name']))
+        logger.info(f"Returning {len(choices)} choices for autocomplete")
+        return choices
+
+    def legacy_filter_only(current: str, materials):
+        """The original filtering loop alone, with the materials already in memory"""
+        choices = []
+        if current:
+            for material in materials:
+                if current.lower() in material['display_name'].lower() or current.lower() in material['name'].lower():
+                    choices.append(app_commands.Choice(name=material['display_name'], value=material['name']))
+                    if len(choices) >= 25:
+                        break
+        if not choices:
+            for material in materials[:25]:
+                choices.append(app_commands.Choice(name=material['display_name'], value=material['name']))
+        return choices
+
+    async def indexed(current: str):
+        return [app_commands.Choice(name=d, value=n) for d, n in material_catalog.search(current)]
+
+    materials = material_catalog.all()
+    results = {}
+
+    samples = []
+    for i in range(args.iterations):
+        start = time.perf_counter()
+        await legacy(QUERIES[i % len(QUERIES)])
+        samples.append((time.perf_counter() - start) * 1e6)
+    results["legacy (db + log + scan)"] = summarize(samples, unit="us")
+
+    samples = []
+    for i in range(args.iterations):
+        start = time.perf_counter()
+        legacy_filter_only(QUERIES[i % len(QUERIES)], materials)
+        samples.append((time.perf_counter() - start) * 1e6)
+    results["legacy scan only"] = summarize(samples, unit="us")
+
+    samples = []
+    for i in range(args.iterations):
+        start = time.perf_counter()
+        await indexed(QUERIES[i % len(QUERIES)])
+        samples.append((time.perf_counter() - start) * 1e6)
+    results["search index"] = summarize(samples, unit="us")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, stats in results.items():
+            print(f"{name:<28} median {stats['median_us']:9.2f} us  p95 {stats['p95_us']:9.2f} us")
+    await models.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
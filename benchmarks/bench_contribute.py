@@ -0,0 +1,92 @@
+"""
+/contribute write path throughput under concurrent submissions: the original
+four-session sequence versus the single-transaction record_contribution.
+
+    python -m benchmarks.bench_contribute --concurrency 20 --contributions 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--contributions", type=int, default=2000)
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    configure_database(args.database_url, fresh=True)
+
+    import models
+    from models import create_tables, init_default_materials, get_async_db_session, Material
+    from material_catalog import material_catalog
+    from database import AsyncDatabaseManager
+    from sqlalchemy import select
+
+    create_tables()
+    init_default_materials()
+    material_catalog.reload()
+    names = [m["name"] for m in material_catalog.all()]
+
+    # The legacy check-then-insert in ensure_*_exists races under concurrency (duplicate key on
+    # first sight of a guild/member), so both paths are measured against pre-existing rows.
+    for guild_id in range(1, 6):
+        await AsyncDatabaseManager.ensure_guild_exists(guild_id, f"guild-{guild_id}")
+    for member_id in range(1, args.members + 1):
+        await AsyncDatabaseManager.ensure_member_exists(member_id, f"user-{member_id}", f"User {member_id}")
+
+    async def legacy(guild_id: int, member_id: int, material_name: str, amount: int):
+        """ensure_guild_exists, ensure_member_exists, material SELECT, then add_contribution's own SELECT + INSERT"""
+        await AsyncDatabaseManager.ensure_guild_exists(guild_id, f"guild-{guild_id}")
+        await AsyncDatabaseManager.ensure_member_exists(member_id, f"user-{member_id}", f"User {member_id}")
+        async with get_async_db_session() as session:
+            await session.scalar(select(Material).where(Material.name == material_name))
+        async with get_async_db_session() as session:
+            await session.scalar(select(Material.id).where(Material.name == material_name))
+        await AsyncDatabaseManager.add_contribution(guild_id, member_id, material_name, amount)
+
+    async def single_transaction(guild_id: int, member_id: int, material_name: str, amount: int):
+        await AsyncDatabaseManager.record_contribution(
+            guild_id, f"guild-{guild_id}", member_id, f"user-{member_id}", f"User {member_id}", material_name, amount
+        )
+
+    async def run(label: str, fn) -> dict:
+        rng = random.Random(7)
+        work = [(rng.randint(1, 5), rng.randint(1, args.members), rng.choice(names), rng.randint(1, 10_000))
+                for _ in range(args.contributions)]
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in work:
+            queue.put_nowait(item)
+
+        async def worker():
+            while not queue.empty():
+                await fn(*queue.get_nowait())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        return {"path": label, "contributions": args.contributions, "concurrency": args.concurrency,
+                "seconds": elapsed, "per_second": args.contributions / elapsed}
+
+    results = [await run("legacy (4 sessions)", legacy), await run("record_contribution", single_transaction)]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            print(f"{r['path']:<24} {r['per_second']:9.1f} contributions/s  ({r['seconds']:.2f}s, concurrency {r['concurrency']})")
+    await models.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+"""
+Read cost and exactness of the two contribution storage modes.
+
+Generates a contribution history (benchmarks.datagen) with CONTRIBUTION_STORAGE
+set to --storage and times the manager reads that aggregate it: the points
+leaderboard and top contributors (member_points rollup), a member summary
+(member_material_totals rollup) and the guild summary (SUM over contributions).
+Run it once per mode and compare.
+
+It then writes contributions with amounts around BIGINT_MAX (2**63 - 1) into a
+separate guild and checks every total against exact Python arithmetic after
+the incremental rollup writes, after a rebuild of the rollup and after a
+material revalue. SQLite keeps Numeric values as REAL, so there values held in
+a Numeric column (past BIGINT_MAX in fixed mode, past 2**53 in numeric mode)
+are compared at double precision; everything else must match exactly. Exits
+non-zero if any check fails.
+
+    python -m benchmarks.bench_fixed_point --storage fixed --contributions 1000000
+"""
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database, time_call
+
+BIGINT_MAX = 2**63 - 1
+CHECK_GUILD = 10**6
+# (member, material, amount): totals straddle BIGINT_MAX per material, per member and per guild
+CHECK_CONTRIBUTIONS = [
+    (1, "exact_unit", BIGINT_MAX - 1),
+    (1, "exact_unit", 1),
+    (2, "exact_unit", BIGINT_MAX),
+    (2, "exact_unit", 5),
+    (3, "exact_unit", BIGINT_MAX + 1),
+    (3, "exact_priced", 5),
+    (4, "exact_priced", 10**20),
+    (4, "exact_unit", 5),
+    (5, "exact_priced", BIGINT_MAX // 250),
+    (6, "exact_unit", 3),
+]
+CHECK_VALUES = {"exact_unit": 1, "exact_priced": 250}
+REVALUED = 7
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--storage", choices=["numeric", "fixed"], default="fixed")
+    parser.add_argument("--guilds", type=int, default=5)
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--contributions", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+def expected_totals(values):
+    """Exact totals for CHECK_CONTRIBUTIONS at the given material values"""
+    members, materials = {}, {}
+    for member_id, material, amount in CHECK_CONTRIBUTIONS:
+        points = amount * values[material]
+        member = members.setdefault(member_id, {"points": 0, "amount": 0, "materials": {}})
+        member["points"] += points
+        member["amount"] += amount
+        member["materials"][material] = member["materials"].get(material, 0) + points
+        materials[material] = materials.get(material, 0) + amount
+    return members, materials
+
+
+def compare(mismatches, label, actual, expected, approximate_above):
+    """Record a mismatch; values past `approximate_above` only need to agree to double precision"""
+    actual = int(actual)
+    if abs(expected) > approximate_above:
+        ok = abs(actual - expected) <= abs(expected) * 2**-50
+    else:
+        ok = actual == expected
+    if not ok:
+        mismatches.append(f"{label}: {actual} != {expected}")
+
+
+def check_totals(stage, values, approximate_above):
+    """Compare every manager read of the check guild with the exact totals; returns the mismatches"""
+    from database import DatabaseManager
+
+    members, materials = expected_totals(values)
+    display = {name: name.replace("_", " ").title() for name in values}
+    mismatches = []
+    for member_id, expected in members.items():
+        points = DatabaseManager.get_member_points(CHECK_GUILD, member_id)
+        compare(mismatches, f"{stage} member {member_id} points", points * 100, expected["points"], approximate_above)
+        summary = DatabaseManager.get_member_contribution_summary(CHECK_GUILD, member_id)
+        compare(mismatches, f"{stage} member {member_id} summary total",
+                summary["total_points"] * 100, expected["points"], approximate_above)
+        for entry in summary["materials"]:
+            name = next(n for n, d in display.items() if d == entry["material_name"])
+            compare(mismatches, f"{stage} member {member_id} {name} points",
+                    entry["points"] * 100, expected["materials"][name], approximate_above)
+
+    board = DatabaseManager.get_top_contributors_by_points(CHECK_GUILD, limit=len(members))
+    ranked = sorted(members.values(), key=lambda m: m["points"], reverse=True)
+    for position, (entry, expected) in enumerate(zip(board, ranked), 1):
+        compare(mismatches, f"{stage} leaderboard #{position}", entry["total_points"] * 100, expected["points"],
+                approximate_above)
+    top = DatabaseManager.get_top_contributors(CHECK_GUILD, limit=len(members))
+    ranked = sorted(members.values(), key=lambda m: m["amount"], reverse=True)
+    for position, (entry, expected) in enumerate(zip(top, ranked), 1):
+        compare(mismatches, f"{stage} top contributor #{position}", entry["total_contributions"], expected["amount"],
+                approximate_above)
+    for entry in DatabaseManager.get_guild_contributions_summary(CHECK_GUILD):
+        name = next(n for n, d in display.items() if d == entry["material"])
+        compare(mismatches, f"{stage} guild {name} total", entry["total_amount"], materials[name], approximate_above)
+    return mismatches
+
+
+def run_checks(dialect: str, storage: str) -> dict:
+    from database import DatabaseManager
+
+    approximate_above = float("inf")
+    if dialect == "sqlite":
+        approximate_above = BIGINT_MAX if storage == "fixed" else 2**53
+    for name, value in CHECK_VALUES.items():
+        DatabaseManager.add_material(name, name.replace("_", " ").title(), value)
+    written = all(
+        DatabaseManager.record_contribution(CHECK_GUILD, "exactness", member_id, f"exact-{member_id}", None,
+                                            material, amount)
+        for member_id, material, amount in CHECK_CONTRIBUTIONS
+    )
+    values = dict(CHECK_VALUES)
+    stages = {"incremental": check_totals("incremental", values, approximate_above)}
+    DatabaseManager.rebuild_member_points(CHECK_GUILD)
+    stages["rebuild"] = check_totals("rebuild", values, approximate_above)
+    revalued = DatabaseManager.update_material_value("exact_priced", REVALUED)
+    values["exact_priced"] = REVALUED
+    stages["revalue"] = check_totals("revalue", values, approximate_above)
+
+    checks = {"check contributions written": written, "material revalued": revalued}
+    checks.update({f"totals exact after {stage}": not mismatches for stage, mismatches in stages.items()})
+    return {"checks": checks, "mismatches": [m for mismatches in stages.values() for m in mismatches]}
+
+
+def main():
+    args = parse_args()
+    os.environ["CONTRIBUTION_STORAGE"] = args.storage
+    configure_database(args.database_url, fresh=True)
+
+    import models
+    from benchmarks.datagen import generate
+    from database import DatabaseManager
+
+    data = generate(args.guilds, args.members, args.contributions, quiet=True)
+    guild_id, member_id = data["busiest_guild"], data["busiest_member"]
+
+    reads = {
+        "get_top_contributors_by_points": lambda: DatabaseManager.get_top_contributors_by_points(guild_id),
+        "get_top_contributors": lambda: DatabaseManager.get_top_contributors(guild_id),
+        "get_member_contribution_summary": lambda: DatabaseManager.get_member_contribution_summary(guild_id, member_id),
+        "get_guild_contributions_summary": lambda: DatabaseManager.get_guild_contributions_summary(guild_id),
+    }
+    results = []
+    for name, fn in reads.items():
+        stats = time_call(fn, repeat=args.repeat)
+        results.append({"storage": args.storage, "rows": args.contributions, "read": name, **stats})
+        if not args.json:
+            print(f"{args.storage:<8} {args.contributions:>10,} rows  {name:<34} "
+                  f"median {stats['median_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms")
+
+    exactness = run_checks(models.engine.dialect.name, args.storage)
+    if args.json:
+        print(json.dumps({"results": results, **exactness}, indent=2))
+    else:
+        for mismatch in exactness["mismatches"]:
+            print(f"  mismatch: {mismatch}")
+        for name, passed in exactness["checks"].items():
+            print(f"  [{'ok' if passed else 'FAIL'}] {name}")
+    models.engine.dispose()
+    if not all(exactness["checks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Query time of the hot contribution / AI-usage queries as the tables grow.
+
+A fixed-size "probe" guild (and AI user) is queried while filler rows in other
+guilds grow the tables from 10k rows upwards. With the composite indexes in
+models.py the probe queries should stay flat; run with --drop-indexes to see
+the sequential-scan baseline.
+
+The points reads use the member_points rollup, so it is rebuilt after every
+growth step; the raw contribution aggregates that the contribution indexes
+serve (one member's points, a guild's points per member) are timed as well.
+
+    python -m benchmarks.bench_indexes --sizes 10000,100000,1000000,10000000
+"""
+import argparse
+import json
+import random
+from datetime import date
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database, time_call
+
+PROBE_GUILD_ID = 1
+PROBE_MEMBERS = 50
+PROBE_ROWS_PER_MEMBER = 20
+PROBE_AI_USER_ID = 1
+FILLER_GUILDS = 200
+FILLER_MEMBERS = 5000
+BATCH_SIZE = 50_000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="comma separated contribution row counts (add 10000000 for the full run)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--drop-indexes", action="store_true", help="benchmark without secondary indexes")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    configure_database(args.database_url, fresh=True)
+
+    from sqlalchemy import func, insert, select, text
+    import models
+    from models import engine, Guild, Member, Material, Contribution, AIUsage, create_tables, init_default_materials
+    from migrations import create_indexes
+    from database import DatabaseManager, contribution_row
+
+    create_tables()
+    init_default_materials()
+    if args.drop_indexes:
+        with engine.begin() as conn:
+            for table in (Contribution.__table__, AIUsage.__table__):
+                for index in table.indexes:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    else:
+        create_indexes()
+
+    with engine.begin() as conn:
+        material_ids = [row[0] for row in conn.execute(text("SELECT id FROM materials"))]
+        conn.execute(insert(Guild), [{"id": gid, "name": f"guild-{gid}"} for gid in range(1, FILLER_GUILDS + 2)])
+        conn.execute(insert(Member), [{"id": mid, "username": f"user-{mid}", "display_name": f"User {mid}"}
+                                      for mid in range(1, FILLER_MEMBERS + 1)])
+
+        # Fixed-size probe data that every size step queries
+        conn.execute(insert(Contribution.__table__), [
+            contribution_row(PROBE_GUILD_ID, mid, {"id": random.choice(material_ids)}, random.randint(1, 5000))
+            for mid in range(1, PROBE_MEMBERS + 1) for _ in range(PROBE_ROWS_PER_MEMBER)
+        ])
+        today = date.today().strftime('%Y-%m-%d')
+        conn.execute(insert(AIUsage), [
+            {"guild_id": PROBE_GUILD_ID, "user_id": PROBE_AI_USER_ID, "prompt_chars": 100,
+             "output_tokens": 100, "model_used": "bench", "date_only": today}
+            for _ in range(20)
+        ])
+
+    rows = PROBE_MEMBERS * PROBE_ROWS_PER_MEMBER
+    rng = random.Random(42)
+    results = []
+
+    def grow_to(target: int) -> None:
+        nonlocal rows
+        while rows < target:
+            batch = min(BATCH_SIZE, target - rows)
+            with engine.begin() as conn:
+                conn.execute(insert(Contribution.__table__), [
+                    contribution_row(rng.randint(2, FILLER_GUILDS + 1), rng.randint(1, FILLER_MEMBERS),
+                                     {"id": rng.choice(material_ids)}, rng.randint(1, 5000))
+                    for _ in range(batch)
+                ])
+                conn.execute(insert(AIUsage), [
+                    {"guild_id": rng.randint(2, FILLER_GUILDS + 1), "user_id": rng.randint(2, FILLER_MEMBERS),
+                     "prompt_chars": 100, "output_tokens": 100, "model_used": "bench",
+                     "date_only": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"}
+                    for _ in range(batch // 10)
+                ])
+            rows += batch
+        # The points reads come from the rollup, which raw inserts do not maintain
+        DatabaseManager.rebuild_member_points()
+        if engine.dialect.name == "postgresql":
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text("ANALYZE contributions"))
+                conn.execute(text("ANALYZE ai_usage"))
+                conn.execute(text("ANALYZE member_points"))
+        else:
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE"))
+
+    def ai_usage_counts():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT count(id) FROM ai_usage WHERE user_id = :u AND date_only = :d"),
+                         {"u": PROBE_AI_USER_ID, "d": today}).scalar()
+            conn.execute(text("SELECT count(id) FROM ai_usage WHERE guild_id = :g AND date_only = :d"),
+                         {"g": PROBE_GUILD_ID, "d": today}).scalar()
+
+    raw_points = func.sum(Contribution.amount * Material.value)
+
+    def raw_member_points():
+        with engine.connect() as conn:
+            conn.execute(
+                select(raw_points).join(Material, Contribution.material_id == Material.id)
+                .where(Contribution.guild_id == PROBE_GUILD_ID, Contribution.member_id == 7)
+            ).scalar()
+
+    def raw_guild_points():
+        with engine.connect() as conn:
+            conn.execute(
+                select(Contribution.member_id, raw_points).join(Material, Contribution.material_id == Material.id)
+                .where(Contribution.guild_id == PROBE_GUILD_ID).group_by(Contribution.member_id)
+                .order_by(raw_points.desc()).limit(10)
+            ).all()
+
+    queries = {
+        "member points (raw SUM)": raw_member_points,
+        "guild points per member (raw GROUP BY)": raw_guild_points,
+        "get_member_points": lambda: DatabaseManager.get_member_points(PROBE_GUILD_ID, 7),
+        "get_member_contributions_with_points":
+            lambda: DatabaseManager.get_member_contributions_with_points(PROBE_GUILD_ID, 7),
+        "get_top_contributors_by_points": lambda: DatabaseManager.get_top_contributors_by_points(PROBE_GUILD_ID, 10),
+        "check_usage_limits (2x count)": ai_usage_counts,
+    }
+
+    for size in sorted(int(s) for s in args.sizes.split(",")):
+        grow_to(size)
+        for name, fn in queries.items():
+            stats = time_call(fn, repeat=args.repeat)
+            results.append({"rows": size, "query": name, "indexed": not args.drop_indexes, **stats})
+            if not args.json:
+                print(f"{size:>10,} rows  {name:<40} median {stats['median_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    models.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Sustained contribution ingest rate: direct record_contribution transactions
+versus the write-behind journal (acknowledgement rate, and the rate including
+the final flush to the database).
+
+    python -m benchmarks.bench_ingest --contributions 5000 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--contributions", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    configure_database(args.database_url, fresh=True)
+
+    import models
+    from models import create_tables, init_default_materials
+    from material_catalog import material_catalog
+    from database import AsyncDatabaseManager
+    from ingestion import ContributionIngestor, ContributionJournal
+
+    create_tables()
+    init_default_materials()
+    material_catalog.reload()
+    materials = material_catalog.all()
+    rng = random.Random(3)
+    work = [(rng.randint(1, 5), rng.randint(1, 500), rng.choice(materials), rng.randint(1, 10_000))
+            for _ in range(args.contributions)]
+
+    async def drive(fn) -> float:
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in work:
+            queue.put_nowait(item)
+
+        async def worker():
+            while not queue.empty():
+                await fn(*queue.get_nowait())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        return time.perf_counter() - start
+
+    async def direct(guild_id, member_id, material, amount):
+        await AsyncDatabaseManager.record_contribution(
+            guild_id, f"guild-{guild_id}", member_id, f"user-{member_id}", None, material["name"], amount
+        )
+
+    results = []
+    elapsed = await drive(direct)
+    results.append({"path": "direct", "seconds": elapsed, "per_second": args.contributions / elapsed})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ingestor = ContributionIngestor(
+            ContributionJournal(os.path.join(tmp, "contributions.journal")),
+            batch_size=args.batch_size, flush_interval=args.flush_interval
+        )
+        await ingestor.start()
+
+        async def journaled(guild_id, member_id, material, amount):
+            await ingestor.submit(guild_id, f"guild-{guild_id}", member_id, f"user-{member_id}", None, material, amount)
+
+        start = time.perf_counter()
+        acked = await drive(journaled)
+        await ingestor.stop()
+        drained = time.perf_counter() - start
+        results.append({"path": "journal (acknowledged)", "seconds": acked, "per_second": args.contributions / acked})
+        results.append({"path": "journal (flushed to db)", "seconds": drained,
+                        "per_second": args.contributions / drained, "flushes": ingestor.flushes})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            print(f"{r['path']:<26} {r['per_second']:10.1f} contributions/s  ({r['seconds']:.2f}s)")
+    await models.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
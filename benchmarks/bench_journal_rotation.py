@@ -0,0 +1,163 @@
+"""
+Journal durability under concurrent rotation.
+
+Submits contributions to a ContributionIngestor at a steady arrival rate
+while another task keeps flushing (rotating) journal segments, with a
+deliberately slow fsync so that appends land while a segment is being
+sealed. The database write is stubbed out. os.fsync is wrapped to record, per file,
+how many bytes each call made durable; at every acknowledgement the check
+snapshots those sizes. Afterwards each acknowledged record is located in its
+segment and checked:
+
+- its bytes were fsynced before it was acknowledged,
+- no fsync ran on a closed (or reused) file descriptor,
+- every record is in exactly one segment, and the ingestor's flush splits
+  pending records at the segment boundary.
+
+Exits non-zero if any check fails.
+
+    python -m benchmarks.bench_journal_rotation --submits 2000 --fsync-ms 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL, help="only imported, never written")
+    parser.add_argument("--submits", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=5000, help="submits per second")
+    parser.add_argument("--burst", type=int, default=5, help="submits arriving together")
+    parser.add_argument("--batch-size", type=int, default=20, help="records between rotations")
+    parser.add_argument("--fsync-ms", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+async def run(args, directory: str) -> dict:
+    import ingestion
+    from ingestion import ContributionIngestor, ContributionJournal
+
+    real_fsync = os.fsync
+    synced = {}  # inode -> bytes made durable
+    bad_fsyncs = []
+
+    def slow_fsync(fd):
+        try:
+            stat = os.fstat(fd)
+        except OSError as e:
+            bad_fsyncs.append(str(e))
+            raise
+        time.sleep(args.fsync_ms / 1000)
+        real_fsync(fd)
+        synced[stat.st_ino] = max(synced.get(stat.st_ino, 0), stat.st_size)
+
+    journal = ContributionJournal(os.path.join(directory, "contributions.journal"))
+    journal.open(0)
+    ingestor = ContributionIngestor(journal, batch_size=args.batch_size)
+    acknowledged = {}  # seq -> snapshot of synced sizes at acknowledgement
+    flushed = []  # seqs handed to the database write, per sealed segment
+    kept = []  # flushed segments, kept for inspection instead of deleted
+
+    async def flush_without_database(records):
+        flushed.extend(record["seq"] for record in records)
+
+    def keep_segment(path):
+        os.replace(path, f"{path}.kept")
+        kept.append(f"{path}.kept")
+
+    ingestor._flush_records = flush_without_database
+    material = {"id": 1, "value": 100}
+    async def submit(n):
+        seq = await ingestor.submit(1, "guild", n, f"user-{n}", None, material, n + 1)
+        acknowledged[seq] = dict(synced)
+
+    async def arrivals():
+        """Open-loop arrivals, so submits keep coming while a segment is being sealed"""
+        tasks = []
+        for n in range(args.submits):
+            tasks.append(asyncio.create_task(submit(n)))
+            if n % args.burst == 0:
+                await asyncio.sleep(args.burst / args.rate)
+        await asyncio.gather(*tasks)
+
+    async def rotator(done: asyncio.Event):
+        while not done.is_set():
+            if len(ingestor._pending) >= args.batch_size:
+                await ingestor.flush()
+            await asyncio.sleep(0)
+
+    real_remove = os.remove
+    ingestion.os.fsync = slow_fsync
+    ingestion.os.remove = keep_segment
+    try:
+        done = asyncio.Event()
+        rotation = asyncio.create_task(rotator(done))
+        start = time.perf_counter()
+        await arrivals()
+        elapsed = time.perf_counter() - start
+        done.set()
+        await rotation
+        journal.close()
+    finally:
+        ingestion.os.fsync = real_fsync
+        ingestion.os.remove = real_remove
+
+    # Where each record's bytes end, per segment file (inode)
+    located = {}
+    for path in kept + journal.existing_segments():
+        inode = os.stat(path).st_ino
+        offset = 0
+        with open(path, "rb") as f:
+            for line in f:
+                offset += len(line)
+                seq = json.loads(line)["seq"]
+                located.setdefault(seq, []).append((inode, offset))
+
+    early = [seq for seq, snapshot in acknowledged.items()
+             if any(snapshot.get(inode, 0) < end for inode, end in located.get(seq, [(None, 1)]))]
+    pending = [record["seq"] for record in ingestor._pending]
+    checks = {
+        "every acknowledged record was fsynced first": not early,
+        "no fsync on a closed descriptor": not bad_fsyncs,
+        "every record is in exactly one segment": sorted(located) == sorted(acknowledged)
+                                                  and all(len(places) == 1 for places in located.values()),
+        "flush splits pending records at the segment boundary": sorted(flushed + pending) == sorted(acknowledged)
+                                                               and len(set(flushed)) == len(flushed),
+    }
+    return {
+        "submits": args.submits,
+        "segments": len(kept),
+        "acknowledged_per_second": args.submits / elapsed,
+        "acknowledged_before_fsync": len(early),
+        "bad_fsyncs": len(bad_fsyncs),
+        "checks": checks,
+    }
+
+
+def main():
+    args = parse_args()
+    configure_database(args.database_url)
+    with tempfile.TemporaryDirectory() as directory:
+        result = asyncio.run(run(args, directory))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['submits']} submits in {result['segments']} sealed segments, "
+              f"{result['acknowledged_per_second']:.0f} acknowledged/s, "
+              f"{result['acknowledged_before_fsync']} acknowledged before their fsync")
+        for name, passed in result["checks"].items():
+            print(f"  [{'ok' if passed else 'FAIL'}] {name}")
+    if not all(result["checks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Read-replica routing check with two local SQLite databases.
+
+Generates a guild history in the primary database, snapshots it into a second
+file that serves as READ_DATABASE_URL (a replica that never catches up, so a
+read that reaches it after a write is visibly stale), then checks that:
+
+- leaderboard and history reads go to the replica when nothing was written,
+- right after a member contributes, that member's summary and their guild's
+  leaderboard come from the primary and include the contribution,
+- other members' history and other guilds' leaderboards still use the replica,
+- once READ_YOUR_WRITES_WINDOW has passed, reads return to the replica.
+
+It also times the routed reads against both databases. Exits non-zero if any
+check fails.
+
+    python -m benchmarks.bench_read_replica --contributions 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database, time_async_call
+from benchmarks.datagen import generate, member_id
+
+GUILD_ID = 1
+OTHER_GUILD_ID = 2
+MEMBERS = 1000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--replica-path", default="benchmark-replica.db")
+    parser.add_argument("--contributions", type=int, default=100_000)
+    parser.add_argument("--window", type=float, default=1.0, help="READ_YOUR_WRITES_WINDOW in seconds")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+def snapshot(primary_url: str, replica_path: str) -> None:
+    """Copy the primary SQLite database into the replica file"""
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(replica_path + suffix):
+            os.remove(replica_path + suffix)
+    source = sqlite3.connect(primary_url[len("sqlite:///"):])
+    target = sqlite3.connect(replica_path)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+
+async def run(args) -> dict:
+    import models
+    from database import AsyncDatabaseManager
+    from leaderboard_cache import leaderboard_cache
+    from material_catalog import material_catalog
+    from read_routing import read_your_writes
+
+    await material_catalog.reload_async()
+    material = max(material_catalog.all(), key=lambda m: m["value"])
+    contributor = member_id(GUILD_ID, MEMBERS, MEMBERS)  # least active member, so the write changes the board
+    bystander = member_id(GUILD_ID, 1, MEMBERS)
+
+    def routed(call):
+        """Run a read and report which database served it"""
+        async def wrapper():
+            before = read_your_writes.replica_reads
+            result = await call()
+            return result, "replica" if read_your_writes.replica_reads > before else "primary"
+        return wrapper
+
+    summary = routed(lambda: AsyncDatabaseManager.get_member_contribution_summary(GUILD_ID, contributor))
+    bystander_history = routed(lambda: AsyncDatabaseManager.get_member_contribution_history(OTHER_GUILD_ID, bystander))
+    board = routed(lambda: AsyncDatabaseManager.get_top_contributors_by_points(GUILD_ID, MEMBERS))
+    other_board = routed(lambda: AsyncDatabaseManager.get_top_contributors_by_points(OTHER_GUILD_ID, 10))
+    guildmate_history = routed(lambda: AsyncDatabaseManager.get_member_contribution_history(GUILD_ID, bystander))
+
+    await asyncio.sleep(args.window)  # datagen's rollup rebuild counts as a write to every guild
+    before_summary, idle_route = await summary()
+    timings = {"replica_summary": await time_async_call(summary, repeat=args.repeat)}
+
+    # A large contribution that moves the contributor to the top of the leaderboard
+    amount = 10 ** 12
+    await AsyncDatabaseManager.record_contribution(GUILD_ID, f"Guild {GUILD_ID}", contributor,
+                                                   f"member-{contributor}", None, material["name"], amount)
+    leaderboard_cache.invalidate()
+    after_summary, fresh_route = await summary()
+    fresh_board, fresh_board_route = await board()
+    _, bystander_route = await bystander_history()
+    _, other_board_route = await other_board()
+    _, guildmate_route = await guildmate_history()
+    timings["primary_summary"] = await time_async_call(summary, repeat=args.repeat)
+
+    await asyncio.sleep(args.window)
+    stale_summary, later_route = await summary()
+
+    checks = {
+        "idle reads use the replica": idle_route == "replica",
+        "contributor's summary comes from the primary": fresh_route == "primary"
+                                                        and after_summary["entries"] == before_summary["entries"] + 1,
+        "guild leaderboard comes from the primary": fresh_board_route == "primary"
+                                                    and fresh_board[0]["username"] == f"member-{contributor}",
+        "other members' history uses the replica": guildmate_route == "replica" and bystander_route == "replica",
+        "other guilds' leaderboards use the replica": other_board_route == "replica",
+        "reads return to the replica after the window": later_route == "replica"
+                                                        and stale_summary["entries"] == before_summary["entries"],
+    }
+
+    await models.async_engine.dispose()
+    await models.async_read_engine.dispose()
+    return {
+        "contributions": args.contributions,
+        "window_s": args.window,
+        "routing": read_your_writes.stats(),
+        "timings": timings,
+        "checks": checks,
+    }
+
+
+def main():
+    args = parse_args()
+    if not args.database_url.startswith("sqlite:///"):
+        sys.exit("This check snapshots a SQLite primary; pass a sqlite:/// --database-url")
+    configure_database(args.database_url, fresh=True)
+    # The replica engines only connect on first use, after the snapshot below
+    os.environ["READ_DATABASE_URL"] = f"sqlite:///{args.replica_path}"
+    os.environ["READ_YOUR_WRITES_WINDOW"] = str(args.window)
+    generate(guilds=2, members=MEMBERS, contributions=args.contributions, quiet=True)
+    import models
+    models.engine.dispose()
+    snapshot(args.database_url, args.replica_path)
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2, default=str))
+    else:
+        routing = result["routing"]
+        print(f"{routing['replica_reads']} replica reads, {routing['primary_reads']} primary reads "
+              f"(window {result['window_s']}s)")
+        for name, stats in result["timings"].items():
+            print(f"  {name:<16} median {stats['median_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms")
+        for name, passed in result["checks"].items():
+            print(f"  [{'ok' if passed else 'FAIL'}] {name}")
+    if not all(result["checks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Shared helpers for the benchmark scripts"""
+import os
+import statistics
+import time
+from typing import Callable, Dict, List
+
+DEFAULT_DATABASE_URL = "sqlite:///benchmark.db"
+
+
+def configure_database(url: str, fresh: bool = False) -> None:
+    """Point models.py at the benchmark database. Must run before `import models`."""
+    if fresh and url.startswith("sqlite:///"):
+        path = url[len("sqlite:///"):]
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    os.environ["DATABASE_URL"] = url
+
+
+def time_call(fn: Callable[[], object], repeat: int = 20, warmup: int = 2) -> Dict[str, float]:
+    """Time a callable and return summary statistics in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+async def time_async_call(fn, repeat: int = 20, warmup: int = 2) -> Dict[str, float]:
+    """Time a coroutine function and return summary statistics in milliseconds"""
+    for _ in range(warmup):
+        await fn()
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float], unit: str = "ms") -> Dict[str, float]:
+    """Median/p95/p99/mean of a list of samples, keyed with their unit (ms by default)"""
+    return {
+        f"median_{unit}": statistics.median(samples) if samples else 0.0,
+        f"p95_{unit}": percentile(samples, 95),
+        f"p99_{unit}": percentile(samples, 99),
+        f"mean_{unit}": statistics.fmean(samples) if samples else 0.0,
+        "runs": len(samples),
+    }
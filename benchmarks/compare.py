@@ -0,0 +1,61 @@
+"""
+Compare two benchmarks.suite result files.
+
+Prints each benchmark's median before and after and the ratio, and marks
+those that got slower by more than --threshold (default 10%). With
+--fail-on-regression the exit status is 1 when anything regressed, for CI.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+import sys
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    return parser.parse_args()
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    args = parse_args()
+    baseline, current = load(args.baseline), load(args.current)
+    before = {r["name"]: r for r in baseline["results"]}
+    after = {r["name"]: r for r in current["results"]}
+
+    print(f"baseline {baseline['meta']['revision']} ({baseline['meta']['dialect']}, "
+          f"{baseline['meta']['data']['contributions']:,} rows)  vs  "
+          f"current {current['meta']['revision']} ({current['meta']['dialect']}, "
+          f"{current['meta']['data']['contributions']:,} rows)")
+    regressions = []
+    for name in sorted(before.keys() | after.keys()):
+        if name not in before or name not in after:
+            print(f"{name:<62} only in {'baseline' if name in before else 'current'}")
+            continue
+        old, new = before[name]["median_ms"], after[name]["median_ms"]
+        ratio = new / old if old else float("inf")
+        flag = ""
+        if ratio > 1 + args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - args.threshold:
+            flag = "  faster"
+        print(f"{name:<62} {old:9.3f} -> {new:9.3f} ms  x{ratio:5.2f}{flag}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
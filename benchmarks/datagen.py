@@ -0,0 +1,126 @@
+"""
+Synthetic contribution history for the benchmarks.
+
+Creates `guilds` guilds with `members` members each and spreads
+`contributions` rows over them: guild sizes and member activity follow a
+Zipf-like skew (a few very active guilds and members, a long tail), materials
+are drawn from the 29 default materials, amounts are log-uniform between 1
+and 100,000 and created_at spans the last year in id order. The points
+rollup is rebuilt afterwards, so the data looks like a database that has been
+live for a while. The same seed always produces the same data.
+
+    python -m benchmarks.datagen --guilds 10 --members 5000 --contributions 2000000
+"""
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database
+
+BATCH_SIZE = 50_000
+
+
+def zipf_cum_weights(n: int, skew: float = 1.1) -> List[float]:
+    """Cumulative weights for random.choices where rank k has weight 1 / k**skew"""
+    total = 0.0
+    cum = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** skew
+        cum.append(total)
+    return cum
+
+
+def member_id(guild_index: int, rank: int, members: int) -> int:
+    """Member ids are unique per guild; rank 1 is the guild's most active member"""
+    return guild_index * members + rank
+
+
+def generate(guilds: int, members: int, contributions: int, seed: int = 42, quiet: bool = False) -> Dict[str, Any]:
+    """Fill the configured database (which must be empty) and return a description of what was generated"""
+    from sqlalchemy import insert
+    from models import engine, create_tables, init_default_materials, Guild, Member, Contribution
+    from migrations import create_indexes
+    from material_catalog import material_catalog
+    from database import DatabaseManager, contribution_row
+
+    create_tables()
+    init_default_materials()
+    create_indexes()
+    material_catalog.reload()
+    materials = material_catalog.all()
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(Guild), [{"id": g, "name": f"Guild {g}"} for g in range(1, guilds + 1)])
+        conn.execute(insert(Member), [
+            {"id": member_id(g, rank, members), "username": f"member-{g}-{rank}", "display_name": f"Member {g}-{rank}"}
+            for g in range(1, guilds + 1) for rank in range(1, members + 1)
+        ])
+
+    guild_weights = zipf_cum_weights(guilds, skew=1.0)
+    member_weights = zipf_cum_weights(members)
+    guild_ids = list(range(1, guilds + 1))
+    ranks = list(range(1, members + 1))
+    log_max = math.log(100_000)
+    first_day = datetime.utcnow() - timedelta(days=365)
+    step = timedelta(days=365) / max(contributions, 1)
+
+    written = 0
+    while written < contributions:
+        batch = min(BATCH_SIZE, contributions - written)
+        batch_guilds = rng.choices(guild_ids, cum_weights=guild_weights, k=batch)
+        batch_ranks = rng.choices(ranks, cum_weights=member_weights, k=batch)
+        rows = [
+            contribution_row(
+                guild,
+                member_id(guild, rank, members),
+                rng.choice(materials),
+                int(math.exp(rng.random() * log_max)),
+                first_day + step * (written + i)
+            )
+            for i, (guild, rank) in enumerate(zip(batch_guilds, batch_ranks))
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(Contribution.__table__), rows)
+        written += batch
+        if not quiet:
+            print(f"  {written:,}/{contributions:,} contributions", end="\r", flush=True)
+
+    DatabaseManager.rebuild_member_points()
+    if not quiet:
+        print(f"Generated {contributions:,} contributions in {time.perf_counter() - started:.1f}s" + " " * 10)
+    return {
+        "guilds": guilds,
+        "members_per_guild": members,
+        "contributions": contributions,
+        "seed": seed,
+        "busiest_guild": 1,
+        "busiest_member": member_id(1, 1, members),
+        "typical_member": member_id(1, max(1, members // 10), members),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--guilds", type=int, default=10)
+    parser.add_argument("--members", type=int, default=2000, help="members per guild")
+    parser.add_argument("--contributions", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    configure_database(args.database_url, fresh=True)
+    generate(args.guilds, args.members, args.contributions, args.seed)
+    import models
+    models.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
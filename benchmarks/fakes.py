@@ -0,0 +1,92 @@
+"""Stand-ins for the discord.py objects the command handlers touch, so handlers can run without Discord"""
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+
+class FakeUser:
+    def __init__(self, user_id: int, name: str, display_name: Optional[str] = None):
+        self.id = user_id
+        self.name = name
+        self.display_name = display_name or name
+        self.mention = f"<@{user_id}>"
+        self.avatar = None
+        self.default_avatar = SimpleNamespace(url="https://cdn.discordapp.com/embed/avatars/0.png")
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, name: str):
+        self.id = guild_id
+        self.name = name
+
+
+class FakeResponse:
+    """interaction.response: records what the handler sent"""
+
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content: Optional[str] = None, **kwargs):
+        self._done = True
+        self._interaction.sent.append({"content": content, **kwargs})
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+        self._interaction.sent.append(kwargs)
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+
+    async def send(self, content: Optional[str] = None, **kwargs):
+        self._interaction.sent.append({"content": content, **kwargs})
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the slash command handlers"""
+
+    def __init__(self, guild: Optional[FakeGuild], user: FakeUser):
+        self.guild = guild
+        self.user = user
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.sent: List[Dict[str, Any]] = []
+
+    async def edit_original_response(self, **kwargs):
+        self.sent.append(kwargs)
+
+    @property
+    def failed(self) -> bool:
+        """True if the handler answered with one of its error embeds"""
+        return any(
+            message.get("embed") is not None and (message["embed"].title or "").startswith("❌")
+            for message in self.sent
+        )
+
+
+async def load_commands() -> Dict[str, Any]:
+    """Register the bot's slash commands on an offline Bot (no gateway) and return them by name"""
+    import discord
+    from discord.ext import commands
+    from bot.commands import setup_commands
+
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+    await setup_commands(bot)
+    return {command.name: command for command in bot.tree.get_commands()}
+
+
+async def load_command_callbacks() -> Dict[str, Any]:
+    """The registered slash command callbacks by name"""
+    return {name: command.callback for name, command in (await load_commands()).items()}
+
+
+def autocomplete_callback(command: Any, parameter: str) -> Any:
+    """The autocomplete coroutine registered for one parameter of a slash command"""
+    return command._params[parameter].autocomplete
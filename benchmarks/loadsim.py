@@ -0,0 +1,205 @@
+"""
+Interaction load simulator: many users hitting the bot at once, no Discord gateway needed.
+
+Registers the real slash commands on an offline Bot and dispatches fake
+interactions straight into their callbacks (and the /contribute material
+autocomplete) from --concurrency simultaneous virtual users, each issuing
+requests back to back with the --mix weights. Reports p50/p95/p99 latency,
+throughput and errors per operation, plus how late a 10 ms ticker on the
+same event loop woke up (event-loop lag), which is what a real gateway
+heartbeat would feel.
+
+    python -m benchmarks.loadsim --concurrency 500 --duration 30 \\
+        --mix contribute=4,leaderboard=3,autocomplete=10,contributions=2,history=1
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database, summarize
+
+TICK = 0.01
+DEFAULT_MIX = "contribute=4,leaderboard=3,autocomplete=10,contributions=2,history=1"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--guilds", type=int, default=5)
+    parser.add_argument("--members", type=int, default=1000, help="members per guild")
+    parser.add_argument("--contributions", type=int, default=100_000, help="history generated before the run")
+    parser.add_argument("--reuse", action="store_true", help="run against the data already in the database")
+    parser.add_argument("--concurrency", type=int, default=500, help="simultaneous virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight pairs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def run(args) -> Dict[str, Any]:
+    import models
+    from material_catalog import material_catalog
+    from benchmarks.datagen import generate, member_id
+    from benchmarks.fakes import FakeGuild, FakeInteraction, FakeUser, load_commands, autocomplete_callback
+
+    if args.reuse:
+        material_catalog.reload()
+    else:
+        generate(args.guilds, args.members, args.contributions, args.seed, quiet=args.json)
+
+    # Journal ingestion (CONTRIBUTION_INGEST_MODE=journal) runs as it does under main.py
+    from ingestion import get_contribution_ingestor
+    ingestor = get_contribution_ingestor()
+    if ingestor:
+        await ingestor.start()
+
+    commands = await load_commands()
+    autocomplete = autocomplete_callback(commands["contribute"], "material")
+    materials = material_catalog.all()
+    guilds = [FakeGuild(g, f"Guild {g}") for g in range(1, args.guilds + 1)]
+
+    def pick_user(rng: random.Random):
+        guild = rng.choice(guilds)
+        rank = rng.randint(1, args.members)
+        uid = member_id(guild.id, rank, args.members)
+        return guild, FakeUser(uid, f"member-{guild.id}-{rank}")
+
+    async def contribute(rng):
+        guild, user = pick_user(rng)
+        interaction = FakeInteraction(guild, user)
+        await commands["contribute"].callback(interaction, rng.choice(materials)["name"], str(rng.randint(1, 5000)))
+        return interaction
+
+    async def leaderboard(rng):
+        guild, user = pick_user(rng)
+        interaction = FakeInteraction(guild, user)
+        await commands["leaderboard"].callback(interaction)
+        return interaction
+
+    async def contributions(rng):
+        guild, user = pick_user(rng)
+        interaction = FakeInteraction(guild, user)
+        await commands["contributions"].callback(interaction)
+        return interaction
+
+    async def history(rng):
+        guild, user = pick_user(rng)
+        interaction = FakeInteraction(guild, user)
+        await commands["contribution_history"].callback(interaction)
+        return interaction
+
+    async def complete(rng):
+        guild, user = pick_user(rng)
+        interaction = FakeInteraction(guild, user)
+        name = rng.choice(materials)["display_name"]
+        await autocomplete(interaction, name[:rng.randint(0, 4)].lower())
+        return interaction
+
+    operations: Dict[str, Callable[[random.Random], Any]] = {
+        "contribute": contribute,
+        "leaderboard": leaderboard,
+        "contributions": contributions,
+        "history": history,
+        "autocomplete": complete,
+    }
+    mix = parse_mix(args.mix)
+    unknown = set(mix) - set(operations)
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    lags: List[float] = []
+    deadline = time.perf_counter() + args.duration
+    stop = asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append((time.perf_counter() - start - TICK) * 1000)
+
+    async def virtual_user(index: int):
+        rng = random.Random(args.seed * 100_003 + index)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                interaction = await operations[name](rng)
+                if interaction.failed:
+                    errors[name] += 1
+            except Exception:
+                errors[name] += 1
+            latencies[name].append((time.perf_counter() - start) * 1000)
+
+    tick_task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick_task
+
+    if ingestor:
+        await ingestor.stop()
+    await models.async_engine.dispose()
+    models.engine.dispose()
+
+    all_latencies = [ms for samples in latencies.values() for ms in samples]
+    return {
+        "meta": {
+            "dialect": models.engine.dialect.name,
+            "concurrency": args.concurrency,
+            "duration_s": round(elapsed, 3),
+            "mix": mix,
+        },
+        "operations": {
+            name: {**summarize(latencies[name]), "throughput_per_s": len(latencies[name]) / elapsed,
+                   "errors": errors[name]}
+            for name in names
+        },
+        "total": {**summarize(all_latencies), "throughput_per_s": len(all_latencies) / elapsed,
+                  "errors": sum(errors.values())},
+        "loop_lag": {**summarize(lags), "max_ms": max(lags) if lags else 0.0},
+    }
+
+
+def main():
+    args = parse_args()
+    configure_database(args.database_url, fresh=not args.reuse)
+    result = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{result['meta']['concurrency']} virtual users for {result['meta']['duration_s']:.1f}s "
+          f"on {result['meta']['dialect']}")
+    print(f"{'operation':<14}{'count':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    rows = list(result["operations"].items()) + [("total", result["total"])]
+    for name, stats in rows:
+        print(f"{name:<14}{stats['runs']:>8}{stats['throughput_per_s']:>9.1f}{stats['median_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['errors']:>8}")
+    lag = result["loop_lag"]
+    print(f"event-loop lag  p50 {lag['median_ms']:.1f} ms  p95 {lag['p95_ms']:.1f} ms  "
+          f"p99 {lag['p99_ms']:.1f} ms  max {lag['max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Local stand-in for the OpenAI chat completions endpoint, for the AI benchmarks"""
+import asyncio
+import json
+import threading
+import time
+
+from aiohttp import web
+
+
+class MockCompletionServer:
+    """
+    Minimal /v1/chat/completions endpoint on its own thread and event loop.
+
+    Answers `tokens` words after `latency` seconds. Streaming requests get the
+    first word after `latency` and one more every `token_delay` seconds as
+    server-sent events; plain requests get the whole answer once the last word
+    would have been produced.
+    """
+
+    def __init__(self, latency: float, tokens: int = 1, token_delay: float = 0.0):
+        self.latency = latency
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.base_url = None
+        self.requests = 0
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def _words(self):
+        return ["Mock"] + [" answer"] * (self.tokens - 1)
+
+    def _chunk(self, model: str, delta: dict, finish_reason=None, usage=None) -> bytes:
+        chunk = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if usage is None else [],
+        }
+        if usage is not None:
+            chunk["usage"] = usage
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    async def _completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.requests += 1
+        model = body.get("model", "mock")
+        usage = {"prompt_tokens": 10, "completion_tokens": self.tokens, "total_tokens": 10 + self.tokens}
+        await asyncio.sleep(self.latency)
+
+        if not body.get("stream"):
+            await asyncio.sleep(self.token_delay * (self.tokens - 1))
+            return web.json_response({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(self._words())}}],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i, word in enumerate(self._words()):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            await response.write(self._chunk(model, {"content": word}))
+        await response.write(self._chunk(model, {}, finish_reason="stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            await response.write(self._chunk(model, {}, usage=usage))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def _start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._completions)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+
+    def _serve(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self) -> str:
+        self._thread.start()
+        self._ready.wait()
+        return self.base_url
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
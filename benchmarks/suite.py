@@ -0,0 +1,284 @@
+"""
+Regression benchmark suite for DatabaseManager, AsyncDatabaseManager and the
+contribution command handlers.
+
+Generates a synthetic history with benchmarks.datagen (or reuses the one
+already in the database with --reuse), then times every manager method (methods
+missing from the suite are listed in the output) and the /contribute, /contributions, /contribution_history and /leaderboard
+handlers, which are called with the fake interactions from benchmarks.fakes.
+Reads target the busiest guild and its most active member; writes go to
+that guild's least active member so they barely change the read workload.
+
+Results are written as JSON (--output) so two runs can be compared with
+benchmarks.compare:
+
+    python -m benchmarks.suite --contributions 1000000 --output before.json
+    python -m benchmarks.suite --reuse --output after.json
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import inspect
+import platform
+import subprocess
+from contextlib import aclosing
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from benchmarks.common import DEFAULT_DATABASE_URL, configure_database, time_call, time_async_call
+
+HEAVY_REPEAT = 3  # rebuilds and revaluations rewrite whole tables
+IMPORT_BATCH = 1000  # contributions per import_contributions call
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--guilds", type=int, default=10)
+    parser.add_argument("--members", type=int, default=2000, help="members per guild")
+    parser.add_argument("--contributions", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reuse", action="store_true", help="benchmark the data already in the database")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", default="", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    return parser.parse_args()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def untimed_methods(manager, cases: List[Dict[str, Any]]) -> List[str]:
+    """Public methods of `manager` that no case in `cases` is named after"""
+    timed = {name.split(" (")[0] for group in cases for name in group}
+    return sorted(name for name, _ in inspect.getmembers(manager, inspect.isfunction)
+                  if not name.startswith("_") and name not in timed)
+
+
+def describe_existing(members: int) -> Dict[str, Any]:
+    """The datagen description for a database generated earlier with the same --members"""
+    from sqlalchemy import func, select
+    from models import get_db_session, Guild, Contribution
+    from benchmarks.datagen import member_id
+
+    session = get_db_session()
+    try:
+        guilds = session.scalar(select(func.count(Guild.id)))
+        contributions = session.scalar(select(func.count(Contribution.id)))
+    finally:
+        session.close()
+    return {
+        "guilds": guilds,
+        "members_per_guild": members,
+        "contributions": contributions,
+        "busiest_guild": 1,
+        "busiest_member": member_id(1, 1, members),
+        "typical_member": member_id(1, max(1, members // 10), members),
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    import models
+    from models import CONTRIBUTION_STORAGE, get_db_session
+    from database import DatabaseManager, AsyncDatabaseManager
+    from material_catalog import material_catalog
+    from leaderboard_cache import leaderboard_cache
+    from benchmarks.datagen import generate, member_id
+    from benchmarks.fakes import FakeGuild, FakeInteraction, FakeUser, load_command_callbacks
+
+    if args.reuse:
+        material_catalog.reload()
+        data = describe_existing(args.members)
+    else:
+        data = generate(args.guilds, args.members, args.contributions, args.seed, quiet=args.json)
+
+    guild_id = data["busiest_guild"]
+    busiest = data["busiest_member"]
+    typical = data["typical_member"]
+    writer = member_id(guild_id, args.members, args.members)
+    iron = material_catalog.get("ironOre")
+    _, history_cursor = DatabaseManager.get_member_contribution_history(guild_id, busiest, None, 50)
+    material_names = (f"benchMaterial{n}" for n in itertools.count())
+    async_material_names = (f"benchAsyncMaterial{n}" for n in itertools.count())
+
+    def apply_rollup_sync():
+        session = get_db_session()
+        try:
+            DatabaseManager.apply_rollup(session, [(guild_id, writer, iron["id"], 5, iron["value"])])
+        finally:
+            session.rollback()
+            session.close()
+
+    async def apply_rollup_async():
+        async with models.get_async_db_session() as session:
+            await AsyncDatabaseManager.apply_rollup(session, [(guild_id, writer, iron["id"], 5, iron["value"])])
+            await session.rollback()
+
+    def iter_guild_contributions(member=None):
+        return sum(len(batch) for batch in DatabaseManager.iter_guild_contributions(guild_id, member))
+
+    async def stream_guild_contributions(member=None):
+        rows = 0
+        async with aclosing(AsyncDatabaseManager.stream_guild_contributions(guild_id, member)) as batches:
+            async for batch in batches:
+                rows += len(batch)
+        return rows
+
+    writer_row = [{"id": writer, "username": "writer", "display_name": "Writer"}]
+    import_batch = [(writer, iron, 5)] * IMPORT_BATCH
+
+    sync_cases: Dict[str, Callable[[], Any]] = {
+        "ensure_guild_exists": lambda: DatabaseManager.ensure_guild_exists(guild_id, f"Guild {guild_id}"),
+        "ensure_member_exists": lambda: DatabaseManager.ensure_member_exists(writer, "writer", "Writer"),
+        "get_all_materials": DatabaseManager.get_all_materials,
+        "get_material_by_name": lambda: DatabaseManager.get_material_by_name("spiceMelange"),
+        "add_contribution": lambda: DatabaseManager.add_contribution(guild_id, writer, "ironOre", 5),
+        "record_contribution": lambda: DatabaseManager.record_contribution(
+            guild_id, f"Guild {guild_id}", writer, "writer", "Writer", "ironOre", 5),
+        "apply_rollup": apply_rollup_sync,
+        "get_member_contributions": lambda: DatabaseManager.get_member_contributions(guild_id, typical),
+        "get_guild_contributions_summary": lambda: DatabaseManager.get_guild_contributions_summary(guild_id),
+        "get_top_contributors": lambda: DatabaseManager.get_top_contributors(guild_id, 10),
+        "get_member_points": lambda: DatabaseManager.get_member_points(guild_id, busiest),
+        "get_top_contributors_by_points": lambda: DatabaseManager.get_top_contributors_by_points(guild_id, 10),
+        "get_member_contributions_with_points":
+            lambda: DatabaseManager.get_member_contributions_with_points(guild_id, busiest),
+        "get_member_contribution_summary": lambda: DatabaseManager.get_member_contribution_summary(guild_id, busiest),
+        "get_member_contribution_history (first page)":
+            lambda: DatabaseManager.get_member_contribution_history(guild_id, busiest, None, 10),
+        "get_member_contribution_history (page 6)":
+            lambda: DatabaseManager.get_member_contribution_history(guild_id, busiest, history_cursor, 10),
+        "iter_guild_contributions (busiest member)": lambda: iter_guild_contributions(busiest),
+    }
+    sync_heavy: Dict[str, Callable[[], Any]] = {
+        "iter_guild_contributions (guild)": iter_guild_contributions,
+        "rebuild_member_points (guild)": lambda: DatabaseManager.rebuild_member_points(guild_id),
+        "update_material_value": lambda: DatabaseManager.update_material_value("ironOre", iron["value"]),
+        "add_material": lambda: DatabaseManager.add_material(next(material_names), "Bench Material", 1),
+    }
+
+    async_cases: Dict[str, Callable[[], Any]] = {
+        "ensure_guild_exists": lambda: AsyncDatabaseManager.ensure_guild_exists(guild_id, f"Guild {guild_id}"),
+        "ensure_member_exists": lambda: AsyncDatabaseManager.ensure_member_exists(writer, "writer", "Writer"),
+        "get_all_materials": AsyncDatabaseManager.get_all_materials,
+        "get_material_by_name": lambda: AsyncDatabaseManager.get_material_by_name("spiceMelange"),
+        "add_contribution": lambda: AsyncDatabaseManager.add_contribution(guild_id, writer, "ironOre", 5),
+        "record_contribution": lambda: AsyncDatabaseManager.record_contribution(
+            guild_id, f"Guild {guild_id}", writer, "writer", "Writer", "ironOre", 5),
+        "apply_rollup": apply_rollup_async,
+        "get_member_contributions": lambda: AsyncDatabaseManager.get_member_contributions(guild_id, typical),
+        "get_guild_contributions_summary": lambda: AsyncDatabaseManager.get_guild_contributions_summary(guild_id),
+        "get_top_contributors": lambda: AsyncDatabaseManager.get_top_contributors(guild_id, 10),
+        "get_member_points": lambda: AsyncDatabaseManager.get_member_points(guild_id, busiest),
+        "get_top_contributors_by_points": lambda: AsyncDatabaseManager.get_top_contributors_by_points(guild_id, 10),
+        "get_leaderboard (cold)": lambda: (leaderboard_cache.invalidate(guild_id),
+                                          AsyncDatabaseManager.get_leaderboard(guild_id, 10))[1],
+        "get_leaderboard (warm)": lambda: AsyncDatabaseManager.get_leaderboard(guild_id, 10),
+        "get_member_contributions_with_points":
+            lambda: AsyncDatabaseManager.get_member_contributions_with_points(guild_id, busiest),
+        "get_member_contribution_summary":
+            lambda: AsyncDatabaseManager.get_member_contribution_summary(guild_id, busiest),
+        "get_member_contribution_history (first page)":
+            lambda: AsyncDatabaseManager.get_member_contribution_history(guild_id, busiest, None, 10),
+        "get_member_contribution_history (page 6)":
+            lambda: AsyncDatabaseManager.get_member_contribution_history(guild_id, busiest, history_cursor, 10),
+        "stream_guild_contributions (busiest member)": lambda: stream_guild_contributions(busiest),
+    }
+    async_heavy: Dict[str, Callable[[], Any]] = {
+        "stream_guild_contributions (guild)": stream_guild_contributions,
+        f"import_contributions ({IMPORT_BATCH} rows)": lambda: AsyncDatabaseManager.import_contributions(
+            guild_id, f"Guild {guild_id}", writer_row, import_batch),
+        "rebuild_member_points (guild)": lambda: AsyncDatabaseManager.rebuild_member_points(guild_id),
+        "update_material_value": lambda: AsyncDatabaseManager.update_material_value("ironOre", iron["value"]),
+        "add_material": lambda: AsyncDatabaseManager.add_material(next(async_material_names), "Bench Material", 1),
+    }
+
+    untimed = (untimed_methods(DatabaseManager, [sync_cases, sync_heavy])
+               + untimed_methods(AsyncDatabaseManager, [async_cases, async_heavy]))
+
+    callbacks = await load_command_callbacks()
+    guild = FakeGuild(guild_id, f"Guild {guild_id}")
+    handler_failures: Dict[str, int] = {}
+
+    def handler(name: str, command: str, user_id: int, *params):
+        async def call():
+            interaction = FakeInteraction(guild, FakeUser(user_id, f"member-{user_id}"))
+            await callbacks[command](interaction, *params)
+            if interaction.failed:
+                handler_failures[name] = handler_failures.get(name, 0) + 1
+        return call
+
+    async def leaderboard_cold():
+        leaderboard_cache.invalidate(guild_id)
+        await handler("", "leaderboard", busiest)()
+
+    handler_cases: Dict[str, Callable[[], Any]] = {
+        "/contribute": handler("/contribute", "contribute", writer, "ironOre", "5"),
+        "/contributions (busiest member)": handler("/contributions (busiest member)", "contributions", busiest),
+        "/contributions (typical member)": handler("/contributions (typical member)", "contributions", typical),
+        "/contribution_history": handler("/contribution_history", "contribution_history", busiest),
+        "/leaderboard (cold)": leaderboard_cold,
+        "/leaderboard (warm)": handler("/leaderboard (warm)", "leaderboard", busiest),
+    }
+
+    results: List[Dict[str, Any]] = []
+
+    def report(name: str, stats: Dict[str, float]) -> None:
+        results.append({"name": name, **stats})
+        if not args.json:
+            print(f"{name:<62} median {stats['median_ms']:9.3f} ms  p95 {stats['p95_ms']:9.3f} ms")
+
+    for group, cases, repeat in (("sync", sync_cases, args.repeat), ("sync", sync_heavy, HEAVY_REPEAT)):
+        for name, fn in cases.items():
+            if args.only in f"{group}.{name}":
+                report(f"{group}.{name}", time_call(fn, repeat=repeat, warmup=1))
+    for group, cases, repeat in (("async", async_cases, args.repeat), ("async", async_heavy, HEAVY_REPEAT),
+                                 ("handler", handler_cases, args.repeat)):
+        for name, fn in cases.items():
+            if args.only in f"{group}.{name}":
+                report(f"{group}.{name}", await time_async_call(fn, repeat=repeat, warmup=1))
+
+    await models.async_engine.dispose()
+    models.engine.dispose()
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "dialect": models.engine.dialect.name,
+            "storage": CONTRIBUTION_STORAGE,
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+            "data": data,
+            "handler_failures": handler_failures,
+            "untimed_methods": untimed,
+        },
+        "results": results,
+    }
+
+
+def main():
+    args = parse_args()
+    configure_database(args.database_url, fresh=not args.reuse)
+    output = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+    if args.json:
+        print(json.dumps(output, indent=2))
+    else:
+        if output["meta"]["handler_failures"]:
+            print(f"Handlers answered with errors: {output['meta']['handler_failures']}")
+        if output["meta"]["untimed_methods"]:
+            print(f"Manager methods without a benchmark: {', '.join(output['meta']['untimed_methods'])}")
+
+
+if __name__ == "__main__":
+    main()
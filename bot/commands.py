@@ -1,15 +1,128 @@
+import os
 import discord
 from discord.ext import commands
 from discord import app_commands
+import asyncio
+import io
 import random
+import tempfile
 import time
 import logging
-from database import DatabaseManager
-from ai_service import get_ai_service
+from datetime import datetime, timedelta
+from database import AsyncDatabaseManager
+from material_catalog import material_catalog
+from leaderboard_cache import leaderboard_cache
+from ingestion import get_contribution_ingestor
+from query_stats import query_stats
+from read_routing import read_your_writes
 from typing import List
 
 logger = logging.getLogger(__name__)
 
+HISTORY_PAGE_SIZE = 10
+AI_ASK_ENABLED = os.getenv('AI_ASK_ENABLED', 'false').lower() == 'true'
+# Discord allows roughly 5 edits per 5 seconds on one message
+AI_STREAM_EDIT_INTERVAL = float(os.getenv('AI_STREAM_EDIT_INTERVAL', '1.0'))
+# Minimum seconds between progress edits of a running /contribute_bulk import or /export
+PROGRESS_EDIT_INTERVAL = float(os.getenv('PROGRESS_EDIT_INTERVAL', '2.0'))
+
+
+class ContributionHistoryView(discord.ui.View):
+    """"Older" button that walks a member's history with keyset pagination"""
+
+    def __init__(self, guild_id: int, target_member: discord.abc.User, requester_id: int):
+        super().__init__(timeout=300)
+        self.guild_id = guild_id
+        self.target_member = target_member
+        self.requester_id = requester_id
+        self.page = 0
+        self.next_cursor = None
+
+    async def load_page(self, before_id) -> discord.Embed:
+        """Fetch one page and render it"""
+        entries, self.next_cursor = await AsyncDatabaseManager.get_member_contribution_history(
+            self.guild_id, self.target_member.id, before_id, HISTORY_PAGE_SIZE
+        )
+        self.page += 1
+        self.older.disabled = self.next_cursor is None
+
+        embed = discord.Embed(
+            title=f"🧾 {self.target_member.display_name}'s Contribution History",
+            color=0x0099ff
+        )
+        if not entries:
+            embed.description = f"{self.target_member.display_name} hasn't made any contributions yet."
+        else:
+            embed.description = "\n".join(
+                f"`{entry['created_at'].strftime('%Y-%m-%d %H:%M') if entry['created_at'] else '—'}` "
+                f"**{entry['amount']:,}** {entry['material_name']} ({entry['points']:,.2f} points)"
+                for entry in entries
+            )
+        embed.set_footer(text=f"Page {self.page}")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.requester_id
+
+    @discord.ui.button(label="Older ▶", style=discord.ButtonStyle.secondary)
+    async def older(self, interaction: discord.Interaction, button: discord.ui.Button):
+        embed = await self.load_page(self.next_cursor)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+class StreamingAnswer:
+    """Progressively edits a deferred response with a streamed AI answer, at most once per interval"""
+
+    def __init__(self, interaction: discord.Interaction, interval: float = AI_STREAM_EDIT_INTERVAL):
+        self.interaction = interaction
+        self.interval = interval
+        self.text = ""
+        self.edits = 0
+        self.first_edit_at = None
+        self._last_edit = float("-inf")
+        self._edit_task = None
+
+    async def update(self, text: str):
+        """on_partial callback: remember the latest text and start an edit if one is due"""
+        self.text = text
+        if self._edit_task is None and time.monotonic() - self._last_edit >= self.interval:
+            self._edit_task = asyncio.create_task(self._edit())
+
+    async def _edit(self):
+        try:
+            embed = discord.Embed(title="🤖 AI Answer", description=self.text[:4094] + " ▌", color=0x00ff00)
+            await self.interaction.edit_original_response(embed=embed)
+            self.edits += 1
+            if self.first_edit_at is None:
+                self.first_edit_at = time.monotonic()
+        except discord.HTTPException as e:
+            logger.warning(f"Streaming edit failed: {e}")
+        finally:
+            self._last_edit = time.monotonic()
+            self._edit_task = None
+
+    async def finish(self, embed: discord.Embed):
+        """Wait for an in-flight edit, then replace the response with the final answer"""
+        if self._edit_task is not None:
+            await self._edit_task
+        await self.interaction.edit_original_response(embed=embed)
+
+
+def add_shard_latencies(embed: discord.Embed, bot: commands.Bot, guild) -> None:
+    """Per-shard gateway latency for AutoShardedBot (this process's shards; the guild's own shard first)"""
+    latencies = getattr(bot, "latencies", None)
+    if not latencies or bot.shard_count is None:
+        return
+    if guild is not None:
+        own = dict(latencies).get(guild.shard_id)
+        if own is not None:
+            embed.add_field(name="This Server's Shard",
+                            value=f"#{guild.shard_id} of {bot.shard_count}: {round(own * 1000)}ms", inline=True)
+    lines = [f"#{shard_id}: {round(latency * 1000)}ms" for shard_id, latency in latencies[:20]]
+    if len(latencies) > 20:
+        lines.append(f"... and {len(latencies) - 20} more")
+    embed.add_field(name=f"Shard Latencies ({len(latencies)} in this process)", value="\n".join(lines), inline=False)
+
+
 async def setup_commands(bot: commands.Bot):
     """Setup commands for the bot"""
     
@@ -57,6 +170,7 @@ async def setup_commands(bot: commands.Bot):
             embed.add_field(name="Status", value="🟡 Good", inline=True)
         else:
             embed.add_field(name="Status", value="🔴 Poor", inline=True)
+        add_shard_latencies(embed, bot, ctx.guild)
             
         await message.edit(content="", embed=embed)
 
@@ -254,6 +368,7 @@ async def setup_commands(bot: commands.Bot):
             embed.add_field(name="Status", value="🟡 Good", inline=True)
         else:
             embed.add_field(name="Status", value="🔴 Poor", inline=True)
+        add_shard_latencies(embed, bot, interaction.guild)
             
         await interaction.response.send_message(embed=embed)
 
@@ -325,7 +440,7 @@ async def setup_commands(bot: commands.Bot):
     async def get_material_choices() -> List[app_commands.Choice[str]]:
         """Get material choices for the dropdown"""
         try:
-            materials = DatabaseManager.get_all_materials()
+            materials = await AsyncDatabaseManager.get_all_materials()
             choices = []
             for material in materials[:25]:  # Discord limit is 25 choices
                 choices.append(app_commands.Choice(
@@ -341,7 +456,9 @@ async def setup_commands(bot: commands.Bot):
     async def testdb(interaction: discord.Interaction):
         """Test database connection"""
         try:
-            materials = DatabaseManager.get_all_materials()
+            # Reload rather than read the cached catalog so this really round-trips to the database
+            await material_catalog.reload_async()
+            materials = await AsyncDatabaseManager.get_all_materials()
             embed = discord.Embed(
                 title="✅ Database Test",
                 description=f"Database is working! Found {len(materials)} materials.",
@@ -349,6 +466,32 @@ async def setup_commands(bot: commands.Bot):
             )
             material_list = ", ".join([m['display_name'] for m in materials[:5]])
             embed.add_field(name="Sample Materials", value=material_list, inline=False)
+            stats = material_catalog.stats()
+            embed.add_field(
+                name="Material Cache",
+                value=f"{stats['hits']} hits / {stats['misses']} misses / {stats['reloads']} reloads",
+                inline=False
+            )
+            board_stats = leaderboard_cache.stats()
+            embed.add_field(
+                name="Leaderboard Cache",
+                value=f"{board_stats['hit_ratio']:.0%} hit ratio / {board_stats['avg_rebuild_ms']:.1f}ms avg rebuild",
+                inline=False
+            )
+            from ai_cache import ai_response_cache
+            ai_stats = ai_response_cache.stats()
+            embed.add_field(
+                name="AI Answer Cache",
+                value=f"{ai_stats['hit_ratio']:.0%} hit ratio / {ai_stats['entries']} answers in memory",
+                inline=False
+            )
+            read_stats = read_your_writes.stats()
+            if read_stats['replica']:
+                embed.add_field(
+                    name="Read Replica",
+                    value=f"{read_stats['replica_reads']} replica / {read_stats['primary_reads']} primary reads",
+                    inline=False
+                )
             await interaction.response.send_message(embed=embed)
         except Exception as e:
             embed = discord.Embed(
@@ -408,16 +551,8 @@ async def setup_commands(bot: commands.Bot):
             return
         
         try:
-            # Ensure guild and member exist in database
-            DatabaseManager.ensure_guild_exists(interaction.guild.id, interaction.guild.name)
-            DatabaseManager.ensure_member_exists(
-                interaction.user.id,
-                interaction.user.name,
-                interaction.user.display_name
-            )
-            
-            # Verify material exists
-            material_info = DatabaseManager.get_material_by_name(material)
+            # Verify material exists (in-memory catalog, no DB access)
+            material_info = await AsyncDatabaseManager.get_material_by_name(material)
             if not material_info:
                 embed = discord.Embed(
                     title="❌ Invalid Material",
@@ -427,13 +562,30 @@ async def setup_commands(bot: commands.Bot):
                 await interaction.response.send_message(embed=embed, ephemeral=True)
                 return
             
-            # Add contribution
-            success = DatabaseManager.add_contribution(
-                interaction.guild.id,
-                interaction.user.id,
-                material,
-                amount_int
-            )
+            ingestor = get_contribution_ingestor()
+            if ingestor:
+                # Write-behind mode: durable in the local journal now, flushed to the database in batches
+                await ingestor.submit(
+                    interaction.guild.id,
+                    interaction.guild.name,
+                    interaction.user.id,
+                    interaction.user.name,
+                    interaction.user.display_name,
+                    material_info,
+                    amount_int
+                )
+                success = True
+            else:
+                # Upsert guild and member and add the contribution in a single transaction
+                success = await AsyncDatabaseManager.record_contribution(
+                    interaction.guild.id,
+                    interaction.guild.name,
+                    interaction.user.id,
+                    interaction.user.name,
+                    interaction.user.display_name,
+                    material,
+                    amount_int
+                ) is not None
             
             if success:
                 embed = discord.Embed(
@@ -470,32 +622,14 @@ async def setup_commands(bot: commands.Bot):
         current: str,
     ) -> List[app_commands.Choice[str]]:
         """Autocomplete for material selection"""
+        # Served entirely from the prebuilt search index: no DB access or logging per keystroke
         try:
-            materials = DatabaseManager.get_all_materials()
-            logger.info(f"Loaded {len(materials)} materials for autocomplete")
-            choices = []
-            
-            # Filter materials based on current input
-            if current:
-                for material in materials:
-                    if current.lower() in material['display_name'].lower() or current.lower() in material['name'].lower():
-                        choices.append(app_commands.Choice(
-                            name=material['display_name'], 
-                            value=material['name']
-                        ))
-                        if len(choices) >= 25:  # Discord limit
-                            break
-            
-            # If no matches or no input, show all materials
-            if not choices:
-                for material in materials[:25]:
-                    choices.append(app_commands.Choice(
-                        name=material['display_name'], 
-                        value=material['name']
-                    ))
-            
-            logger.info(f"Returning {len(choices)} choices for autocomplete")
-            return choices
+            if not material_catalog.loaded:
+                await material_catalog.reload_async()
+            return [
+                app_commands.Choice(name=display_name, value=name)
+                for display_name, name in material_catalog.search(current)
+            ]
         except Exception as e:
             logger.error(f"Error in material autocomplete: {e}")
             # Return some default choices so the command doesn't completely fail
@@ -523,25 +657,13 @@ async def setup_commands(bot: commands.Bot):
         target_member = member or interaction.user
         
         try:
-            # Ensure member exists in database
-            DatabaseManager.ensure_member_exists(
-                target_member.id,
-                target_member.name,
-                target_member.display_name
-            )
-            
-            # Get total points for this member
-            total_points = DatabaseManager.get_member_points(
+            # Per-material totals and the overall total come back aggregated from one query
+            summary = await AsyncDatabaseManager.get_member_contribution_summary(
                 interaction.guild.id,
                 target_member.id
             )
             
-            contributions = DatabaseManager.get_member_contributions_with_points(
-                interaction.guild.id,
-                target_member.id
-            )
-            
-            if not contributions:
+            if not summary['materials']:
                 embed = discord.Embed(
                     title="📊 No Contributions",
                     description=f"{target_member.display_name} hasn't made any contributions yet.",
@@ -550,39 +672,22 @@ async def setup_commands(bot: commands.Bot):
                 await interaction.response.send_message(embed=embed)
                 return
             
-            # Group contributions by material and calculate totals
-            material_totals = {}
-            for contrib in contributions:
-                material = contrib['material_name']
-                amount = contrib['amount']
-                points = contrib['points']
-                
-                if material in material_totals:
-                    material_totals[material]['amount'] += amount
-                    material_totals[material]['points'] += points
-                else:
-                    material_totals[material] = {
-                        'amount': amount,
-                        'points': points,
-                        'value_per_unit': contrib['value_per_unit']
-                    }
-            
             embed = discord.Embed(
                 title=f"📊 {target_member.display_name}'s Contributions",
-                description=f"**Total Contribution Points: {total_points:,.2f}**",
+                description=f"**Total Contribution Points: {summary['total_points']:,.2f}**",
                 color=0x0099ff
             )
             embed.set_thumbnail(url=target_member.avatar.url if target_member.avatar else target_member.default_avatar.url)
             
-            # Add fields for each material with points
-            for material, data in sorted(material_totals.items(), key=lambda x: x[1]['points'], reverse=True):
+            # Add fields for each material with points (already ordered by points)
+            for data in summary['materials'][:25]:  # Discord embed field limit
                 embed.add_field(
-                    name=material,
+                    name=data['material_name'],
                     value=f"{data['amount']:,} units\n{data['points']:.2f} points",
                     inline=True
                 )
             
-            embed.set_footer(text=f"Guild: {interaction.guild.name} • Total entries: {len(contributions)}")
+            embed.set_footer(text=f"Guild: {interaction.guild.name} • Total entries: {summary['entries']} • /contribution_history for details")
             await interaction.response.send_message(embed=embed)
             
         except Exception as e:
@@ -594,6 +699,34 @@ async def setup_commands(bot: commands.Bot):
             )
             await interaction.response.send_message(embed=embed, ephemeral=True)
 
+    @bot.tree.command(name="contribution_history", description="Browse individual contributions, newest first")
+    @app_commands.describe(member="The member to view history for (optional)")
+    async def contribution_history(interaction: discord.Interaction, member: discord.Member = None):
+        """Paginated raw contribution history for a member"""
+        if not interaction.guild:
+            embed = discord.Embed(
+                title="❌ Error",
+                description="This command can only be used in a server!",
+                color=0xff0000
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        target_member = member or interaction.user
+        
+        try:
+            view = ContributionHistoryView(interaction.guild.id, target_member, interaction.user.id)
+            embed = await view.load_page(None)
+            await interaction.response.send_message(embed=embed, view=view if view.next_cursor else None)
+        except Exception as e:
+            logger.error(f"Error in contribution_history command: {e}")
+            embed = discord.Embed(
+                title="❌ Error",
+                description="An unexpected error occurred. Please try again later.",
+                color=0xff0000
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
     @bot.tree.command(name="leaderboard", description="View the top contributors in this guild")
     async def leaderboard(interaction: discord.Interaction):
         """View top contributors leaderboard"""
@@ -607,7 +740,7 @@ async def setup_commands(bot: commands.Bot):
             return
         
         try:
-            top_contributors = DatabaseManager.get_top_contributors_by_points(interaction.guild.id, 10)
+            top_contributors = await AsyncDatabaseManager.get_leaderboard(interaction.guild.id, 10)
             
             if not top_contributors:
                 embed = discord.Embed(
@@ -645,17 +778,350 @@ async def setup_commands(bot: commands.Bot):
             )
             await interaction.response.send_message(embed=embed, ephemeral=True)
 
+    @bot.tree.command(name="rebuild_points", description="Recompute this guild's contribution points from history (admin)")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_permissions(administrator=True)
+    async def rebuild_points(interaction: discord.Interaction):
+        """Rebuild the member points rollup for this guild from the raw contributions"""
+        if not interaction.guild:
+            embed = discord.Embed(
+                title="❌ Error",
+                description="This command can only be used in a server!",
+                color=0xff0000
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            start_time = time.perf_counter()
+            await AsyncDatabaseManager.rebuild_member_points(interaction.guild.id)
+            elapsed = time.perf_counter() - start_time
+            embed = discord.Embed(
+                title="✅ Points Rebuilt",
+                description=f"Contribution points for {interaction.guild.name} were recomputed in {elapsed:.2f}s.",
+                color=0x00ff00
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except Exception as e:
+            logger.error(f"Error in rebuild_points command: {e}")
+            embed = discord.Embed(
+                title="❌ Error",
+                description="Failed to rebuild contribution points. Please try again later.",
+                color=0xff0000
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+
+    active_imports = set()
+
+    @bot.tree.command(name="contribute_bulk", description="Import contributions from a CSV of member, material, amount (officers)")
+    @app_commands.describe(file="CSV file with one contribution per line: member (ID, mention or name), material, amount")
+    @app_commands.default_permissions(manage_guild=True)
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def contribute_bulk(interaction: discord.Interaction, file: discord.Attachment):
+        """Stream a CSV attachment into the database in batches, with progress and a per-row error report"""
+        from bulk_import import BULK_IMPORT_MAX_ROWS, BulkContributionImport, iter_attachment_lines, parse_member_id
+
+        if not interaction.guild:
+            embed = discord.Embed(
+                title="❌ Error",
+                description="This command can only be used in a server!",
+                color=0xff0000
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        if not file.filename.lower().endswith((".csv", ".txt")):
+            embed = discord.Embed(
+                title="❌ Invalid File",
+                description="Please attach a `.csv` file with the columns member, material, amount.",
+                color=0xff0000
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        guild = interaction.guild
+        if guild.id in active_imports:
+            embed = discord.Embed(
+                title="⏳ Import Running",
+                description="An import is already running for this server. Please wait for it to finish.",
+                color=0xff0000
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        def lookup_member(cell: str):
+            member_id = parse_member_id(cell)
+            member = guild.get_member(member_id) if member_id else guild.get_member_named(cell)
+            if member is not None:
+                return member.id, member.name, member.display_name
+            if member_id:
+                # Members who left (or aren't cached) are still recorded by ID
+                return member_id, str(member_id), None
+            return None
+
+        last_progress = time.monotonic()
+
+        async def report_progress(job: BulkContributionImport):
+            nonlocal last_progress
+            if time.monotonic() - last_progress < PROGRESS_EDIT_INTERVAL:
+                return
+            last_progress = time.monotonic()
+            embed = discord.Embed(
+                title="📥 Importing Contributions...",
+                description=f"{job.imported:,} imported from {job.rows:,} rows, {job.error_total:,} errors so far",
+                color=0x0099ff
+            )
+            try:
+                await interaction.edit_original_response(embed=embed)
+            except discord.HTTPException as e:
+                logger.warning(f"Bulk import progress edit failed: {e}")
+
+        active_imports.add(guild.id)
+        try:
+            await interaction.response.defer(ephemeral=True, thinking=True)
+        except discord.HTTPException:
+            # Expired interaction: nothing runs, so don't leave the guild marked busy
+            active_imports.discard(guild.id)
+            raise
+        job = BulkContributionImport(guild.id, guild.name, lookup_member)
+        start_time = time.perf_counter()
+        try:
+            await job.run(iter_attachment_lines(file.url), on_progress=report_progress)
+            failed = False
+        except Exception as e:
+            logger.error(f"Error in contribute_bulk command after {job.imported} rows: {e}")
+            failed = True
+        finally:
+            active_imports.discard(guild.id)
+        elapsed = time.perf_counter() - start_time
+
+        if failed:
+            embed = discord.Embed(
+                title="❌ Import Failed",
+                description=(
+                    f"The import stopped with an error. {job.imported:,} rows in {job.batches} complete "
+                    f"batches were saved; the rest of the file was not imported."
+                ),
+                color=0xff0000
+            )
+        else:
+            embed = discord.Embed(
+                title="✅ Contributions Imported",
+                description=f"Imported **{job.imported:,}** of {job.rows:,} rows from `{file.filename}` in {elapsed:.1f}s.",
+                color=0x00ff00 if not job.error_total else 0xffa500
+            )
+            embed.add_field(name="Points Added", value=f"{job.points:,.2f}", inline=True)
+            embed.add_field(name="Batches", value=f"{job.batches:,}", inline=True)
+        summary = job.error_summary()
+        embed.add_field(name=f"Errors ({job.error_total:,})",
+                        value=summary if len(summary) <= 1024 else summary[:1021] + "...", inline=False)
+        if job.truncated:
+            embed.set_footer(text=f"Only the first {BULK_IMPORT_MAX_ROWS:,} rows were read; split larger files")
+
+        files = []
+        if job.error_total > 10:
+            files.append(discord.File(io.BytesIO(job.error_report().encode()), filename="errors.csv"))
+        await interaction.edit_original_response(embed=embed, attachments=files)
+
+    active_exports = set()
+
+    @bot.tree.command(name="export", description="Download this server's contribution history as a compressed file (officers)")
+    @app_commands.describe(
+        format="CSV for spreadsheets or JSON lines",
+        member="Only this member's contributions (optional)",
+        since="First day to include, YYYY-MM-DD (optional)",
+        until="Last day to include, YYYY-MM-DD (optional)"
+    )
+    @app_commands.choices(format=[
+        app_commands.Choice(name="CSV", value="csv"),
+        app_commands.Choice(name="JSON lines", value="jsonl")
+    ])
+    @app_commands.default_permissions(manage_guild=True)
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def export_contributions(interaction: discord.Interaction, format: str = "csv", member: discord.User = None,
+                                   since: str = None, until: str = None):
+        """Stream the guild's contributions into gzip files and upload them, split at the upload limit"""
+        from export import EXPORT_BATCH_SIZE, ContributionExport
+
+        if not interaction.guild:
+            embed = discord.Embed(
+                title="❌ Error",
+                description="This command can only be used in a server!",
+                color=0xff0000
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        try:
+            since_date = datetime.strptime(since, "%Y-%m-%d") if since else None
+            # until is inclusive: everything before the start of the next day
+            until_date = datetime.strptime(until, "%Y-%m-%d") + timedelta(days=1) if until else None
+        except ValueError:
+            embed = discord.Embed(
+                title="❌ Invalid Date",
+                description="Dates must look like `2024-05-31` (YYYY-MM-DD).",
+                color=0xff0000
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        guild = interaction.guild
+        if guild.id in active_exports:
+            embed = discord.Embed(
+                title="⏳ Export Running",
+                description="An export is already running for this server. Please wait for it to finish.",
+                color=0xff0000
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        last_progress = time.monotonic()
+
+        async def report_progress(job: ContributionExport):
+            nonlocal last_progress
+            if time.monotonic() - last_progress < PROGRESS_EDIT_INTERVAL:
+                return
+            last_progress = time.monotonic()
+            embed = discord.Embed(
+                title="📤 Exporting Contributions...",
+                description=f"{job.rows:,} contributions written so far",
+                color=0x0099ff
+            )
+            try:
+                await interaction.edit_original_response(embed=embed)
+            except discord.HTTPException as e:
+                logger.warning(f"Export progress edit failed: {e}")
+
+        active_exports.add(guild.id)
+        try:
+            await interaction.response.defer(ephemeral=True, thinking=True)
+        except discord.HTTPException:
+            # Expired interaction: nothing runs, so don't leave the guild marked busy
+            active_exports.discard(guild.id)
+            raise
+        start_time = time.perf_counter()
+        try:
+            with tempfile.TemporaryDirectory(prefix="export-") as directory:
+                basename = f"contributions-{guild.id}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+                job = ContributionExport(directory, basename, format, part_limit=guild.filesize_limit)
+                batches = AsyncDatabaseManager.stream_guild_contributions(
+                    guild.id, member.id if member else None, since_date, until_date, EXPORT_BATCH_SIZE
+                )
+                parts = await job.run(batches, on_progress=report_progress)
+                elapsed = time.perf_counter() - start_time
+
+                scope = f" by {member.display_name}" if member else ""
+                if since or until:
+                    scope += f" from {since or 'the start'} to {until or 'today'}"
+                embed = discord.Embed(
+                    title="✅ Export Ready",
+                    description=(
+                        f"{job.rows:,} contributions{scope} in {len(parts)} "
+                        f"{'file' if len(parts) == 1 else 'files'} ({job.size / 1024 / 1024:.1f} MiB), "
+                        f"exported in {elapsed:.1f}s."
+                    ),
+                    color=0x00ff00
+                )
+                if job.truncated:
+                    embed.color = 0xffa500
+                    embed.add_field(
+                        name="Export Truncated",
+                        value=f"Stopped after {len(parts)} files; use `since`/`until` to export the rest.",
+                        inline=False
+                    )
+                await interaction.edit_original_response(embed=embed)
+                for part in parts:
+                    await interaction.followup.send(file=discord.File(part.path, filename=part.filename), ephemeral=True)
+        except Exception as e:
+            logger.error(f"Error in export command: {e}")
+            embed = discord.Embed(
+                title="❌ Error",
+                description="Failed to export contributions. Please try again later.",
+                color=0xff0000
+            )
+            await interaction.edit_original_response(embed=embed)
+        finally:
+            active_exports.discard(guild.id)
+
+    @bot.tree.command(name="query_stats",description="Show the SQL statements using the most database time (admin)")
+    @app_commands.describe(reset="Clear the statistics after showing them (bot owner only)")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_permissions(administrator=True)
+    async def show_query_stats(interaction: discord.Interaction, reset: bool = False):
+        """Top statements by total time since startup (or the last reset), with the command that ran them"""
+        top = query_stats.top(10)
+        embed = discord.Embed(
+            title="🐢 Query Statistics",
+            description=(
+                f"Top statements by total time since {query_stats.since.strftime('%Y-%m-%d %H:%M')} UTC. "
+                f"Slow threshold: {query_stats.threshold_ms:.0f} ms, "
+                f"{len(query_stats.recent_slow)} recent slow queries."
+            ),
+            color=0x0099ff
+        )
+        for stats in top:
+            statement = stats.statement if len(stats.statement) <= 300 else stats.statement[:297] + "..."
+            embed.add_field(
+                name=f"{stats.command} · {stats.total_ms:,.0f} ms total",
+                value=(
+                    f"{stats.calls:,} calls · avg {stats.total_ms / stats.calls:.1f} ms · "
+                    f"max {stats.max_ms:.1f} ms · {stats.slow} slow\n```sql\n{statement}\n```"
+                ),
+                inline=False
+            )
+        if not top:
+            embed.add_field(name="No statements", value="Nothing has been recorded yet.", inline=False)
+
+        if reset:
+            if await bot.is_owner(interaction.user):
+                query_stats.reset()
+                embed.set_footer(text="Statistics were reset")
+            else:
+                embed.set_footer(text="Only the bot owner can reset the statistics")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
     # ==================== AI CONVERSATION COMMANDS ====================
     
-    @bot.tree.command(name="ask", description="Ask AI a question (Currently under development)")
+    @bot.tree.command(name="ask", description="Ask AI a question")
     @app_commands.describe(question="Your question for the AI")
     async def ask_ai(interaction: discord.Interaction, question: str):
-        """AI conversation command - currently disabled"""
+        """AI conversation command (disabled unless AI_ASK_ENABLED=true)"""
+        ai = None
+        if AI_ASK_ENABLED:
+            # Imported on first use: the openai SDK is the slowest import in the bot
+            from ai_service import get_ai_service
+            ai = get_ai_service()
+        if ai is None:
+            embed = discord.Embed(
+                title="🚧 Work in Progress",
+                description="This feature is currently work in progress and temporarily unavailable. Please check back later!",
+                color=0xffa500
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server!", ephemeral=True)
+            return
+
+        await interaction.response.defer(thinking=True)
+
+        async def on_queued(position: int):
+            await interaction.followup.send(
+                f"⏳ The AI is busy - you are #{position} in the queue.", ephemeral=True
+            )
+
+        # Stream the answer into the deferred response instead of waiting for all of it
+        streaming = StreamingAnswer(interaction)
+        success, answer = await ai.ask_ai(
+            interaction.guild.id, interaction.user.id, question, on_queued, on_partial=streaming.update
+        )
         embed = discord.Embed(
-            title="🚧 Work in Progress",
-            description="This feature is currently work in progress and temporarily unavailable. Please check back later!",
-            color=0xffa500
+            title="🤖 AI Answer" if success else "❌ AI Unavailable",
+            description=answer[:4096],
+            color=0x00ff00 if success else 0xff0000
         )
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await streaming.finish(embed)
 
     logger.info("Commands setup complete")
@@ -1,11 +1,17 @@
+import os
+import time
 import discord
 from discord.ext import commands
 import logging
+from bot.tree_sync import sync_command_tree
+from startup import startup_report
 
 logger = logging.getLogger(__name__)
 
 async def setup_events(bot: commands.Bot):
     """Setup event handlers for the bot"""
+    # Time-to-ready after a reconnect, from the last disconnect (startup is timed by startup_report)
+    timing = {"since": None, "tree_checked": False}
     
     @bot.event
     async def on_ready():
@@ -17,18 +23,21 @@ async def setup_events(bot: commands.Bot):
         activity = discord.Game(name="Type !help for commands")
         await bot.change_presence(activity=activity)
         
-        # Sync slash commands
-        try:
-            synced = await bot.tree.sync()
-            logger.info(f"Synced {len(synced)} slash commands")
-            
-            # Log the command names for debugging
-            command_names = [cmd.name for cmd in synced]
-            logger.info(f"Synced commands: {', '.join(command_names)}")
-        except Exception as e:
-            logger.error(f"Failed to sync slash commands: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+        # Sync slash commands (the tree is global, so only the first cluster of a sharded deployment syncs it).
+        # The tree cannot change while the process runs, so reconnects skip even the fingerprint check.
+        if os.getenv('CLUSTER_ID', '0') == '0' and not timing["tree_checked"]:
+            try:
+                await sync_command_tree(bot)
+                timing["tree_checked"] = True
+            except Exception as e:
+                logger.error(f"Failed to sync slash commands: {e}")
+                import traceback
+                logger.error(traceback.format_exc())
+        
+        if timing["since"] is None:
+            startup_report.finish()
+        else:
+            logger.info(f"Ready in {time.perf_counter() - timing['since']:.2f}s after reconnecting")
 
     @bot.event
     async def on_guild_join(guild):
@@ -116,6 +125,7 @@ async def setup_events(bot: commands.Bot):
     async def on_disconnect():
         """Event triggered when bot disconnects"""
         logger.warning("Bot disconnected from Discord")
+        timing["since"] = time.perf_counter()
 
     @bot.event
     async def on_resumed():
@@ -0,0 +1,105 @@
+"""
+Slash-command tree sync that only talks to Discord when the tree changed.
+
+on_ready fires again after every gateway reconnect, and a global
+bot.tree.sync() is a slow, rate-limited HTTP call. sync_command_tree()
+fingerprints the exact payload sync() would upload (plus the application id
+and target scope) and compares it with the fingerprint the last successful
+sync stored in the app_state table, which survives container restarts and is
+shared by every worker:
+
+- COMMAND_SYNC=auto    sync only when the fingerprint changed (default)
+- COMMAND_SYNC=always  sync on every ready, as before
+- COMMAND_SYNC=off     never sync (commands are managed elsewhere)
+
+With COMMAND_SYNC_GUILD_ID set (development), the global commands are copied
+into that guild and synced there only, which Discord applies instantly.
+Delete the command_sync:* rows from app_state, or set COMMAND_SYNC=always, to
+force a sync.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Optional
+
+import discord
+from discord.ext import commands
+
+from database import dialect_insert
+from models import AppState, get_async_db_session
+
+logger = logging.getLogger(__name__)
+
+COMMAND_SYNC = os.getenv('COMMAND_SYNC', 'auto').lower()
+COMMAND_SYNC_GUILD_ID = os.getenv('COMMAND_SYNC_GUILD_ID')
+
+
+def sync_scope(guild_id: Optional[int]) -> str:
+    return f"guild:{guild_id}" if guild_id else "global"
+
+
+def command_tree_fingerprint(bot: commands.Bot, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """sha256 of the payload tree.sync(guild=guild) would upload, for this application"""
+    tree = bot.tree
+    payload = sorted(
+        (command.to_dict(tree) for command in tree._get_all_commands(guild=guild)),
+        key=lambda command: (command.get("type", 1), command["name"])
+    )
+    document = {"application_id": bot.application_id, "commands": payload}
+    return hashlib.sha256(json.dumps(document, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _state_name(scope: str) -> str:
+    return f"command_sync:{scope}"
+
+
+async def _load_fingerprint(scope: str) -> Optional[str]:
+    try:
+        async with get_async_db_session() as session:
+            row = await session.get(AppState, _state_name(scope))
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable command sync state ({scope}): {e}")
+        return None
+    return row.value if row is not None else None
+
+
+async def _save_fingerprint(scope: str, fingerprint: str) -> None:
+    async with get_async_db_session() as session:
+        try:
+            stmt = dialect_insert(session.bind.dialect.name)(AppState)
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=[AppState.name],
+                set_={'value': stmt.excluded.value, 'updated_at': stmt.excluded.updated_at}
+            ), {"name": _state_name(scope), "value": fingerprint, "updated_at": datetime.utcnow()})
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.warning(f"Could not save command sync state ({scope}): {e}")
+
+
+async def sync_command_tree(bot: commands.Bot, mode: str = COMMAND_SYNC,
+                            guild_id: Optional[str] = COMMAND_SYNC_GUILD_ID) -> Optional[int]:
+    """
+    Sync the command tree if it changed since the last successful sync.
+    Returns the number of commands synced, or None when the sync was skipped.
+    """
+    if mode == "off":
+        logger.info("Slash command sync disabled (COMMAND_SYNC=off)")
+        return None
+
+    guild = discord.Object(id=int(guild_id)) if guild_id else None
+    if guild is not None:
+        bot.tree.copy_global_to(guild=guild)
+    scope = sync_scope(guild.id if guild else None)
+    fingerprint = command_tree_fingerprint(bot, guild)
+    if mode != "always" and await _load_fingerprint(scope) == fingerprint:
+        logger.info(f"Slash commands unchanged ({scope}, {fingerprint[:12]}), skipping sync")
+        return None
+
+    synced = await bot.tree.sync(guild=guild)
+    await _save_fingerprint(scope, fingerprint)
+    logger.info(f"Synced {len(synced)} slash commands ({scope}, {fingerprint[:12]})")
+    logger.info(f"Synced commands: {', '.join(cmd.name for cmd in synced)}")
+    return len(synced)
@@ -0,0 +1,232 @@
+"""
+Bulk contribution import from CSV (/contribute_bulk).
+
+The attachment is streamed line by line from Discord's CDN, so memory stays
+bounded by one batch however large the file is. Each line is parsed and
+validated as it arrives:
+
+- member: a Discord user ID, a mention (<@123>) or a name the command's
+  member lookup can resolve
+- material: internal name ("ironOre") or display name ("Iron Ore"), matched
+  case-insensitively against the material catalog
+- amount: a positive integer up to 10**50, as for /contribute
+
+A header row (member,material,amount in any order) is optional. Valid rows
+are collected into batches of BULK_IMPORT_BATCH_SIZE and each batch is
+written in one transaction by AsyncDatabaseManager.import_contributions
+(COPY on PostgreSQL, executemany elsewhere). Invalid rows are skipped and
+reported with their line number; the first MAX_RECORDED_ERRORS are kept.
+Files over BULK_IMPORT_MAX_ROWS data rows are cut off at that limit.
+"""
+import csv
+import io
+import logging
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from database import AsyncDatabaseManager, to_points
+from material_catalog import material_catalog
+
+logger = logging.getLogger(__name__)
+
+BULK_IMPORT_BATCH_SIZE = int(os.getenv('BULK_IMPORT_BATCH_SIZE', '5000'))
+BULK_IMPORT_MAX_ROWS = int(os.getenv('BULK_IMPORT_MAX_ROWS', '200000'))
+MAX_AMOUNT = 10**50
+MAX_MEMBER_ID = 2**63 - 1
+MAX_RECORDED_ERRORS = 1000
+
+_MENTION = re.compile(r"^<@!?(\d+)>$")
+_HEADER_ALIASES = {
+    "member": ("member", "member_id", "user", "user_id", "discord_id"),
+    "material": ("material", "material_name", "item"),
+    "amount": ("amount", "quantity", "qty", "count"),
+}
+
+# member cell -> (member_id, username, display_name), or None if it names nobody
+MemberLookup = Callable[[str], Optional[Tuple[int, str, Optional[str]]]]
+
+
+def parse_member_id(cell: str) -> Optional[int]:
+    """Discord user ID from a plain ID or a mention"""
+    cell = cell.strip()
+    match = _MENTION.match(cell)
+    if match:
+        cell = match.group(1)
+    if cell.isdigit() and 0 < int(cell) <= MAX_MEMBER_ID:
+        return int(cell)
+    return None
+
+
+def parse_amount(cell: str) -> Optional[int]:
+    """Positive integer amount; thousands separators and underscores are ignored"""
+    cell = cell.strip().replace(",", "").replace("_", "")
+    if not cell.isdigit():
+        return None
+    amount = int(cell)
+    return amount if 0 < amount <= MAX_AMOUNT else None
+
+
+def material_lookup() -> Dict[str, Dict]:
+    """Case-insensitive name / display name -> material, from the in-memory catalog"""
+    lookup = {}
+    for material in material_catalog.all():
+        for key in (material["name"], material["display_name"], material["display_name"].replace(" ", "")):
+            lookup[key.casefold()] = material
+    return lookup
+
+
+async def iter_attachment_lines(url: str, timeout: float = 300.0) -> AsyncIterator[str]:
+    """Decoded lines of a remote text file, streamed without holding the whole file"""
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as http:
+        async with http.get(url) as response:
+            response.raise_for_status()
+            first = True
+            async for raw in response.content:
+                line = raw.decode("utf-8-sig" if first else "utf-8", errors="replace")
+                first = False
+                yield line.rstrip("\r\n")
+
+
+@dataclass
+class RowError:
+    line: int
+    reason: str
+    text: str
+
+
+class BulkContributionImport:
+    """Parses, validates and writes one CSV of contributions for a guild"""
+
+    def __init__(self, guild_id: int, guild_name: str, member_lookup: MemberLookup,
+                 batch_size: int = BULK_IMPORT_BATCH_SIZE, max_rows: int = BULK_IMPORT_MAX_ROWS):
+        self.guild_id = guild_id
+        self.guild_name = guild_name
+        self.member_lookup = member_lookup
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.materials = material_lookup()
+        self.columns = {"member": 0, "material": 1, "amount": 2}
+        self.rows = 0
+        self.imported = 0
+        self.centipoints = 0
+        self.batches = 0
+        self.truncated = False
+        self.errors: List[RowError] = []
+        self.error_counts: Counter = Counter()
+        self._members: Dict[int, Dict] = {}
+        self._pending: List[Tuple[int, Dict, int]] = []
+
+    @property
+    def error_total(self) -> int:
+        return sum(self.error_counts.values())
+
+    @property
+    def points(self):
+        return to_points(self.centipoints)
+
+    def _error(self, line: int, reason: str, text: str) -> None:
+        self.error_counts[reason] += 1
+        if len(self.errors) < MAX_RECORDED_ERRORS:
+            self.errors.append(RowError(line, reason, text[:200]))
+
+    def _is_header(self, cells: List[str]) -> bool:
+        names = [c.strip().casefold() for c in cells]
+        columns = {}
+        for column, aliases in _HEADER_ALIASES.items():
+            for index, name in enumerate(names):
+                if name in aliases:
+                    columns[column] = index
+        if len(columns) == 3:
+            self.columns = columns
+            return True
+        return False
+
+    def _parse(self, line_number: int, line: str) -> None:
+        try:
+            cells = next(csv.reader([line]))
+        except csv.Error:
+            self._error(line_number, "malformed CSV", line)
+            return
+        if len(cells) <= max(self.columns.values()):
+            self._error(line_number, "missing columns", line)
+            return
+
+        material = self.materials.get(cells[self.columns["material"]].strip().casefold())
+        if material is None:
+            self._error(line_number, "unknown material", line)
+            return
+        amount = parse_amount(cells[self.columns["amount"]])
+        if amount is None:
+            self._error(line_number, "invalid amount", line)
+            return
+        member = self.member_lookup(cells[self.columns["member"]].strip())
+        if member is None:
+            self._error(line_number, "unknown member", line)
+            return
+
+        member_id, username, display_name = member
+        if member_id not in self._members:
+            self._members[member_id] = {"id": member_id, "username": username, "display_name": display_name or username}
+        self._pending.append((member_id, material, amount))
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        members = [self._members[member_id] for member_id in {member_id for member_id, _, _ in batch}]
+        await AsyncDatabaseManager.import_contributions(self.guild_id, self.guild_name, members, batch)
+        self.imported += len(batch)
+        self.centipoints += sum(amount * material["value"] for _, material, amount in batch)
+        self.batches += 1
+        # Only the members of the next batch need to be kept
+        self._members.clear()
+
+    async def run(self, lines: AsyncIterator[str],
+                  on_progress: Optional[Callable[["BulkContributionImport"], Awaitable[None]]] = None) -> None:
+        """Import every line; on_progress is awaited after each written batch"""
+        line_number = 0
+        seen_content = False
+        async for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            if not seen_content:
+                seen_content = True
+                line = line.lstrip("\ufeff")
+                try:
+                    if self._is_header(next(csv.reader([line]), [])):
+                        continue
+                except csv.Error:
+                    pass
+            if self.rows >= self.max_rows:
+                self.truncated = True
+                break
+            self.rows += 1
+            self._parse(line_number, line)
+            if len(self._pending) >= self.batch_size:
+                await self._flush()
+                if on_progress:
+                    await on_progress(self)
+        await self._flush()
+
+    def error_summary(self, limit: int = 10) -> str:
+        """Counts per error kind and the first `limit` failing lines"""
+        if not self.error_counts:
+            return "No errors"
+        lines = [f"{count:,} × {reason}" for reason, count in self.error_counts.most_common()]
+        lines.extend(f"line {e.line}: {e.reason} (`{e.text[:60]}`)" for e in self.errors[:limit])
+        return "\n".join(lines)
+
+    def error_report(self) -> str:
+        """The recorded errors as CSV (line, reason, text)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["line", "reason", "text"])
+        for error in self.errors:
+            writer.writerow([error.line, error.reason, error.text])
+        return buffer.getvalue()
@@ -0,0 +1,174 @@
+"""
+Cluster launcher: runs the bot as several worker processes, each owning a range of shards.
+
+    python cluster.py
+
+One process handles every guild of its shards, so guild-scoped state (leaderboard
+cache, journal, streaming answers) never needs to be shared between workers.
+The launcher:
+
+- asks Discord for the recommended shard count (or uses SHARD_COUNT)
+- splits shards 0..SHARD_COUNT-1 into CLUSTER_COUNT contiguous ranges
+  (default: one per CPU, never more than there are shards)
+- creates the schema and runs migrations once, so workers skip it (SKIP_DB_INIT)
+- starts one `python main.py` per range with SHARD_COUNT, SHARD_IDS, CLUSTER_ID
+  and a per-worker share of DB_POOL_BUDGET, METRICS_PORT + CLUSTER_ID and its
+  own contribution journal and checkpoint
+- staggers worker starts so their IDENTIFYs respect Discord's
+  max_concurrency-per-5-seconds limit, and restarts a worker that exits
+- forwards SIGINT/SIGTERM to the workers as SIGINT so each shuts down cleanly
+
+Per-user AI quotas are counted per process. A user active in guilds on two
+workers can use up to one quota per worker.
+"""
+import asyncio
+import logging
+import math
+import os
+import signal
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import discord
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO, format="[launcher] %(levelname)s:%(name)s:%(message)s")
+logger = logging.getLogger("cluster")
+
+DISCORD_TOKEN = os.getenv('DISCORD_TOKEN', 'your_discord_token_here')
+SHARD_COUNT = os.getenv('SHARD_COUNT', 'auto')
+CLUSTER_COUNT = int(os.getenv('CLUSTER_COUNT', '0')) or os.cpu_count() or 1
+DB_POOL_BUDGET = int(os.getenv('DB_POOL_BUDGET', '0'))
+METRICS_PORT = int(os.getenv('METRICS_PORT', os.getenv('PORT', '8080')))
+CONTRIBUTION_JOURNAL_PATH = os.getenv('CONTRIBUTION_JOURNAL_PATH', 'contributions.journal')
+IDENTIFY_WINDOW = 5.0  # seconds per max_concurrency IDENTIFYs
+RESTART_DELAY = 5.0
+
+
+def shard_ranges(shard_count: int, clusters: int) -> List[List[int]]:
+    """Split shard ids 0..shard_count-1 into `clusters` contiguous, nearly equal ranges"""
+    clusters = max(1, min(clusters, shard_count))
+    base, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for i in range(clusters):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+def format_shard_ids(shard_ids: List[int]) -> str:
+    return f"{shard_ids[0]}-{shard_ids[-1]}" if len(shard_ids) > 1 else str(shard_ids[0])
+
+
+async def fetch_gateway_info(token: str) -> Tuple[int, int]:
+    """Discord's recommended shard count and the IDENTIFY max_concurrency for this bot"""
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shards, _, session_start_limit = await http.get_bot_gateway()
+        return shards, session_start_limit.get('max_concurrency', 1)
+    finally:
+        await http.close()
+
+
+def worker_env(cluster_id: int, shard_count: int, shard_ids: List[int], clusters: int) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "CLUSTER_ID": str(cluster_id),
+        "SHARD_COUNT": str(shard_count),
+        "SHARD_IDS": format_shard_ids(shard_ids),
+        "SKIP_DB_INIT": "true",
+        "METRICS_PORT": str(METRICS_PORT + cluster_id),
+        "CONTRIBUTION_JOURNAL_PATH": f"{CONTRIBUTION_JOURNAL_PATH}.cluster{cluster_id}",
+        "INGEST_CHECKPOINT_NAME": f"contributions.cluster{cluster_id}",
+    })
+    if DB_POOL_BUDGET:
+        env["DB_POOL_BUDGET"] = str(max(2, DB_POOL_BUDGET // clusters))
+    return env
+
+
+class Worker:
+    """One `python main.py` process and its restart loop"""
+
+    def __init__(self, cluster_id: int, shard_ids: List[int], env: Dict[str, str]):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.env = env
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+
+    async def run(self, stopping: asyncio.Event) -> None:
+        while not stopping.is_set():
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, "main.py", env=self.env, cwd=os.path.dirname(os.path.abspath(__file__))
+            )
+            logger.info(f"Cluster {self.cluster_id} (shards {format_shard_ids(self.shard_ids)}) "
+                        f"started as pid {self.process.pid}")
+            returncode = await self.process.wait()
+            if stopping.is_set():
+                break
+            self.restarts += 1
+            logger.error(f"Cluster {self.cluster_id} exited with code {returncode}, "
+                         f"restarting in {RESTART_DELAY:.0f}s")
+            try:
+                await asyncio.wait_for(stopping.wait(), RESTART_DELAY)
+            except asyncio.TimeoutError:
+                pass
+
+    def interrupt(self) -> None:
+        if self.process and self.process.returncode is None:
+            self.process.send_signal(signal.SIGINT)
+
+
+def init_database() -> None:
+    """Schema creation and migrations, once for all workers"""
+    from models import create_tables, init_default_materials
+    from migrations import run_migrations
+    create_tables()
+    run_migrations()
+    init_default_materials()
+
+
+async def main() -> None:
+    max_concurrency = 1
+    if SHARD_COUNT == 'auto':
+        shard_count, max_concurrency = await fetch_gateway_info(DISCORD_TOKEN)
+    else:
+        shard_count = int(SHARD_COUNT)
+    ranges = shard_ranges(shard_count, CLUSTER_COUNT)
+    logger.info(f"{shard_count} shards across {len(ranges)} clusters"
+                + (f", {DB_POOL_BUDGET // len(ranges)} DB connections each" if DB_POOL_BUDGET else ""))
+
+    await asyncio.to_thread(init_database)
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    workers = [Worker(i, shard_ids, worker_env(i, shard_count, shard_ids, len(ranges)))
+               for i, shard_ids in enumerate(ranges)]
+    tasks = []
+    for worker in workers:
+        tasks.append(asyncio.create_task(worker.run(stopping)))
+        # Each worker IDENTIFYs its shards max_concurrency at a time, one batch per window
+        delay = math.ceil(len(worker.shard_ids) / max_concurrency) * IDENTIFY_WINDOW
+        try:
+            await asyncio.wait_for(stopping.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        if stopping.is_set():
+            break
+
+    await stopping.wait()
+    logger.info("Stopping clusters...")
+    for worker in workers:
+        worker.interrupt()
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,551 @@
-from models import get_db_session, Guild, Member, Material, Contribution
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional, Dict, Any
+from models import (
+    get_db_session, get_async_db_session, Guild, Member, Material, Contribution, MemberPoints, MemberMaterialTotal,
+    CONTRIBUTION_STORAGE, BIGINT_MAX
+)
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import bindparam, func, select, update, insert, delete, text, case
+from datetime import datetime
+from decimal import Context, Decimal
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Dict, Any, Tuple
+from material_catalog import material_catalog
+from leaderboard_cache import leaderboard_cache
+from read_routing import read_your_writes
 import discord
 
+
+# Wide enough for the largest amount /contribute accepts (10**50) times any material value
+_POINTS_CONTEXT = Context(prec=120)
+
+
+def to_points(centipoints) -> Decimal:
+    """Exact points from a centipoint value (amount * material value, which is stored x100)"""
+    return _POINTS_CONTEXT.divide(Decimal(centipoints or 0), 100)
+
+
+def fixed_split(value: int) -> Tuple[Optional[int], int]:
+    """(BIGINT column, Numeric column) for a value in fixed storage mode.
+
+    The value goes into the BIGINT column when it fits and the Numeric column holds 0;
+    otherwise (overflow) the BIGINT column is NULL and the Numeric column holds the value.
+    """
+    return (value, 0) if value <= BIGINT_MAX else (None, value)
+
+
+def stored_value(fixed, numeric) -> int:
+    """Exact value of a BIGINT/Numeric column pair, COALESCE(fixed, 0) + numeric, in either storage mode"""
+    return int(fixed or 0) + int(numeric or 0)
+
+
+def contribution_row(guild_id: int, member_id: int, material: Dict[str, Any], amount: int,
+                     created_at: Optional[datetime] = None) -> Dict[str, Any]:
+    """Column values for a new contribution (amount in BIGINT amount_fixed in fixed storage mode)"""
+    row = {
+        "guild_id": guild_id,
+        "member_id": member_id,
+        "material_id": material['id'],
+        "amount": amount
+    }
+    if CONTRIBUTION_STORAGE == 'fixed':
+        row["amount_fixed"], row["amount"] = fixed_split(amount)
+    if created_at is not None:
+        row["created_at"] = created_at
+    return row
+
+
+_SUM_SPLIT_BITS = 32
+
+
+def exact_sum(column) -> List[Any]:
+    """SUM of a BIGINT column as two partial sums that cannot overflow; recombine with combine_sum().
+
+    SQLite raises "integer overflow" once an integer SUM passes 2**63, and summing through
+    REAL would round. The high and low 32 bits are summed separately instead, which stays
+    exact for up to 2**31 rows on both dialects.
+    """
+    return [
+        func.sum(column.op('>>')(_SUM_SPLIT_BITS)),
+        func.sum(column.op('&')(2**_SUM_SPLIT_BITS - 1))
+    ]
+
+
+def combine_sum(high, low) -> int:
+    """Exact total from the two exact_sum() columns"""
+    return (int(high or 0) << _SUM_SPLIT_BITS) + int(low or 0)
+
+
+def rollup_order(fixed_column, numeric_column) -> list:
+    """ORDER BY for a rollup total, highest first.
+
+    In fixed storage mode a NULL BIGINT column means the total overflowed BIGINT, so those
+    rows rank first (by their Numeric total) and the rest sort on the integer column.
+    """
+    if CONTRIBUTION_STORAGE == 'fixed':
+        return [fixed_column.desc().nulls_first(), numeric_column.desc()]
+    return [numeric_column.desc()]
+
+
+def dialect_insert(dialect_name: str):
+    """INSERT construct with ON CONFLICT support for the active dialect (Postgres or SQLite)"""
+    if dialect_name == 'postgresql':
+        return postgresql.insert
+    return sqlite.insert
+
+
+def guild_member_upserts(dialect_name: str) -> Tuple[Any, Any]:
+    """INSERT ... ON CONFLICT statements equivalent to ensure_guild_exists + ensure_member_exists.
+
+    Execute them with guild {"id", "name"} and member {"id", "username", "display_name"}
+    parameter rows (single row or executemany).
+    """
+    dialect_specific_insert = dialect_insert(dialect_name)
+    guild_stmt = dialect_specific_insert(Guild).on_conflict_do_nothing(index_elements=[Guild.id])
+
+    member_insert = dialect_specific_insert(Member)
+    member_stmt = member_insert.on_conflict_do_update(
+        index_elements=[Member.id],
+        set_={
+            'username': member_insert.excluded.username,
+            'display_name': member_insert.excluded.display_name
+        },
+        # Only rewrite the row when the name actually changed
+        where=(Member.username != member_insert.excluded.username)
+        | Member.display_name.is_distinct_from(member_insert.excluded.display_name)
+    )
+    return guild_stmt, member_stmt
+
+
+def _add_fixed(fixed, numeric, excluded_fixed, excluded_numeric) -> Tuple[Any, Any]:
+    """SET expressions adding an excluded (BIGINT, Numeric) delta onto a stored column pair.
+
+    The sum stays in the BIGINT column while it fits; past BIGINT_MAX the whole total moves to
+    the Numeric column (computed there, so nothing overflows) and the BIGINT column becomes NULL.
+    """
+    fits = fixed.is_not(None) & excluded_fixed.is_not(None) & (fixed <= BIGINT_MAX - excluded_fixed)
+    return (
+        case((fits, fixed + excluded_fixed), else_=None),
+        case((fits, numeric),
+             else_=numeric + excluded_numeric + func.coalesce(fixed, 0) + func.coalesce(excluded_fixed, 0))
+    )
+
+
+def rollup_upserts(dialect_name: str) -> Tuple[Any, Any]:
+    """Statements adding contribution deltas onto member_points / member_material_totals.
+
+    Execute them with the parameter rows from rollup_deltas (single row or executemany).
+    """
+    dialect_specific_insert = dialect_insert(dialect_name)
+
+    member_insert = dialect_specific_insert(MemberPoints)
+    material_insert = dialect_specific_insert(MemberMaterialTotal)
+    if CONTRIBUTION_STORAGE == 'fixed':
+        points_fixed, total_points = _add_fixed(
+            MemberPoints.points_fixed, MemberPoints.total_points,
+            member_insert.excluded.points_fixed, member_insert.excluded.total_points
+        )
+        amount_fixed, total_amount = _add_fixed(
+            MemberPoints.amount_fixed, MemberPoints.total_amount,
+            member_insert.excluded.amount_fixed, member_insert.excluded.total_amount
+        )
+        member_set = {'points_fixed': points_fixed, 'total_points': total_points,
+                      'amount_fixed': amount_fixed, 'total_amount': total_amount}
+        material_points_fixed, material_points = _add_fixed(
+            MemberMaterialTotal.points_fixed, MemberMaterialTotal.points,
+            material_insert.excluded.points_fixed, material_insert.excluded.points
+        )
+        material_amount_fixed, material_amount = _add_fixed(
+            MemberMaterialTotal.amount_fixed, MemberMaterialTotal.amount,
+            material_insert.excluded.amount_fixed, material_insert.excluded.amount
+        )
+        material_set = {'points_fixed': material_points_fixed, 'points': material_points,
+                        'amount_fixed': material_amount_fixed, 'amount': material_amount}
+    else:
+        member_set = {
+            'total_points': MemberPoints.total_points + member_insert.excluded.total_points,
+            'total_amount': MemberPoints.total_amount + member_insert.excluded.total_amount
+        }
+        material_set = {
+            'amount': MemberMaterialTotal.amount + material_insert.excluded.amount,
+            'points': MemberMaterialTotal.points + material_insert.excluded.points
+        }
+
+    member_stmt = member_insert.on_conflict_do_update(
+        index_elements=[MemberPoints.guild_id, MemberPoints.member_id],
+        set_={
+            **member_set,
+            'contribution_count': MemberPoints.contribution_count + member_insert.excluded.contribution_count
+        }
+    )
+    material_stmt = material_insert.on_conflict_do_update(
+        index_elements=[MemberMaterialTotal.guild_id, MemberMaterialTotal.member_id, MemberMaterialTotal.material_id],
+        set_={
+            **material_set,
+            'contribution_count': MemberMaterialTotal.contribution_count + material_insert.excluded.contribution_count
+        }
+    )
+    return member_stmt, material_stmt
+
+
+def _split_rollup_row(row: Dict[str, Any], pairs: Tuple[Tuple[str, str], ...]) -> Dict[str, Any]:
+    """Move exact totals into their (BIGINT, Numeric) columns for fixed storage mode"""
+    if CONTRIBUTION_STORAGE == 'fixed':
+        for fixed, numeric in pairs:
+            row[fixed], row[numeric] = fixed_split(row[numeric])
+    return row
+
+
+_MEMBER_PAIRS = (("points_fixed", "total_points"), ("amount_fixed", "total_amount"))
+_MATERIAL_PAIRS = (("points_fixed", "points"), ("amount_fixed", "amount"))
+
+
+def rollup_deltas(contributions: Iterable[Tuple[int, int, int, int, int]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Aggregate (guild_id, member_id, material_id, amount, value) tuples into rollup parameter rows"""
+    members: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    materials: Dict[Tuple[int, int, int], Dict[str, Any]] = {}
+    for guild_id, member_id, material_id, amount, value in contributions:
+        points = amount * value
+        member = members.setdefault((guild_id, member_id), {
+            "guild_id": guild_id, "member_id": member_id,
+            "total_points": 0, "total_amount": 0, "contribution_count": 0
+        })
+        member["total_points"] += points
+        member["total_amount"] += amount
+        member["contribution_count"] += 1
+
+        material = materials.setdefault((guild_id, member_id, material_id), {
+            "guild_id": guild_id, "member_id": member_id, "material_id": material_id,
+            "amount": 0, "points": 0, "contribution_count": 0
+        })
+        material["amount"] += amount
+        material["points"] += points
+        material["contribution_count"] += 1
+    return ([_split_rollup_row(row, _MEMBER_PAIRS) for row in members.values()],
+            [_split_rollup_row(row, _MATERIAL_PAIRS) for row in materials.values()])
+
+
+def rollup_rebuild_statements(guild_id: Optional[int] = None) -> list:
+    """Statements that recompute the rollup tables from the raw contributions (all guilds or one).
+
+    In fixed storage mode only the deletes are returned; the caller then inserts the rows
+    fixed_rollup_rows builds from rollup_totals_query, which keeps the sums exact.
+    """
+    contribution_filter = [Contribution.guild_id == guild_id] if guild_id is not None else []
+    material_filter = [MemberMaterialTotal.guild_id == guild_id] if guild_id is not None else []
+    member_filter = [MemberPoints.guild_id == guild_id] if guild_id is not None else []
+
+    statements = [
+        delete(MemberMaterialTotal).where(*material_filter),
+        delete(MemberPoints).where(*member_filter)
+    ]
+    if CONTRIBUTION_STORAGE == 'fixed':
+        return statements
+    return statements + [
+        insert(MemberMaterialTotal).from_select(
+            ['guild_id', 'member_id', 'material_id', 'amount', 'points', 'contribution_count'],
+            select(
+                Contribution.guild_id,
+                Contribution.member_id,
+                Contribution.material_id,
+                func.sum(Contribution.amount),
+                func.sum(Contribution.amount * Material.value),
+                func.count(Contribution.id)
+            ).join(Material, Contribution.material_id == Material.id).where(*contribution_filter).group_by(
+                Contribution.guild_id, Contribution.member_id, Contribution.material_id
+            )
+        ),
+        insert(MemberPoints).from_select(
+            ['guild_id', 'member_id', 'total_points', 'total_amount', 'contribution_count'],
+            select(
+                MemberMaterialTotal.guild_id,
+                MemberMaterialTotal.member_id,
+                func.sum(MemberMaterialTotal.points),
+                func.sum(MemberMaterialTotal.amount),
+                func.sum(MemberMaterialTotal.contribution_count)
+            ).where(*material_filter).group_by(MemberMaterialTotal.guild_id, MemberMaterialTotal.member_id)
+        )
+    ]
+
+
+def rollup_totals_query(guild_id: Optional[int] = None):
+    """Exact per (guild, member, material) contribution totals, for the fixed storage mode rebuild"""
+    contribution_filter = [Contribution.guild_id == guild_id] if guild_id is not None else []
+    return select(
+        Contribution.guild_id,
+        Contribution.member_id,
+        Contribution.material_id,
+        Material.value,
+        *exact_sum(Contribution.amount_fixed),
+        func.sum(Contribution.amount),
+        func.count(Contribution.id)
+    ).join(Material, Contribution.material_id == Material.id).where(*contribution_filter).group_by(
+        Contribution.guild_id, Contribution.member_id, Contribution.material_id, Material.value
+    )
+
+
+def fixed_rollup_rows(rows) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """member_material_totals and member_points rows for rollup_totals_query rows (fixed storage mode).
+
+    Points are priced in Python (total amount * value), so neither the amounts nor the points
+    are ever summed or multiplied in SQL where they could overflow BIGINT.
+    """
+    members: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    materials = []
+    for guild_id, member_id, material_id, value, high, low, numeric, count in rows:
+        amount = combine_sum(high, low) + int(numeric or 0)
+        points = amount * value
+        member = members.setdefault((guild_id, member_id), {
+            "guild_id": guild_id, "member_id": member_id,
+            "total_points": 0, "total_amount": 0, "contribution_count": 0
+        })
+        member["total_points"] += points
+        member["total_amount"] += amount
+        member["contribution_count"] += count
+        materials.append(_split_rollup_row({
+            "guild_id": guild_id, "member_id": member_id, "material_id": material_id,
+            "amount": amount, "points": points, "contribution_count": count
+        }, _MATERIAL_PAIRS))
+    return materials, [_split_rollup_row(row, _MEMBER_PAIRS) for row in members.values()]
+
+
+def rollup_revalue_statements(material_id: int, value: int) -> list:
+    """Statements that reprice one material's rollup points after its value changed.
+
+    In fixed storage mode the member totals are recomputed afterwards from
+    member_points_totals_query, since summing them in SQL could overflow BIGINT.
+    """
+    if CONTRIBUTION_STORAGE == 'fixed':
+        if value == 0:
+            return [update(MemberMaterialTotal).where(MemberMaterialTotal.material_id == material_id).values(
+                points_fixed=0, points=0
+            )]
+        fits = MemberMaterialTotal.amount_fixed.is_not(None) & (
+            MemberMaterialTotal.amount_fixed <= BIGINT_MAX // value
+        )
+        return [
+            update(MemberMaterialTotal).where(MemberMaterialTotal.material_id == material_id).values(
+                points_fixed=case((fits, MemberMaterialTotal.amount_fixed * value), else_=None),
+                points=case((fits, 0), else_=(
+                    MemberMaterialTotal.amount + func.coalesce(MemberMaterialTotal.amount_fixed, 0)
+                ) * value)
+            )
+        ]
+
+    material_points = select(func.sum(MemberMaterialTotal.points)).where(
+        MemberMaterialTotal.guild_id == MemberPoints.guild_id,
+        MemberMaterialTotal.member_id == MemberPoints.member_id
+    ).scalar_subquery()
+    holds_material = select(MemberMaterialTotal.member_id).where(
+        MemberMaterialTotal.guild_id == MemberPoints.guild_id,
+        MemberMaterialTotal.member_id == MemberPoints.member_id,
+        MemberMaterialTotal.material_id == material_id
+    ).exists()
+    return [
+        update(MemberMaterialTotal).where(MemberMaterialTotal.material_id == material_id).values(
+            points=MemberMaterialTotal.amount * value
+        ),
+        update(MemberPoints).where(holds_material).values(total_points=material_points)
+    ]
+
+
+def member_points_totals_query(material_id: int):
+    """Exact point totals of every member holding a material, from member_material_totals (fixed mode)"""
+    holder = aliased(MemberMaterialTotal)
+    holds_material = select(holder.member_id).where(
+        holder.guild_id == MemberMaterialTotal.guild_id,
+        holder.member_id == MemberMaterialTotal.member_id,
+        holder.material_id == material_id
+    ).exists()
+    return select(
+        MemberMaterialTotal.guild_id,
+        MemberMaterialTotal.member_id,
+        *exact_sum(MemberMaterialTotal.points_fixed),
+        func.sum(MemberMaterialTotal.points)
+    ).where(holds_material).group_by(MemberMaterialTotal.guild_id, MemberMaterialTotal.member_id)
+
+
+def member_points_updates(rows) -> Tuple[Any, List[Dict[str, Any]]]:
+    """UPDATE member_points statement and its executemany rows for member_points_totals_query rows"""
+    table = MemberPoints.__table__
+    stmt = update(table).where(
+        table.c.guild_id == bindparam('b_guild_id'),
+        table.c.member_id == bindparam('b_member_id')
+    ).values(points_fixed=bindparam('b_points_fixed'), total_points=bindparam('b_total_points'))
+    params = []
+    for guild_id, member_id, high, low, numeric in rows:
+        points_fixed, total_points = fixed_split(combine_sum(high, low) + int(numeric or 0))
+        params.append({"b_guild_id": guild_id, "b_member_id": member_id,
+                       "b_points_fixed": points_fixed, "b_total_points": total_points})
+    return stmt, params
+
+
+def member_summary_query(guild_id: int, member_id: int):
+    """Per-material totals for one member from the rollup"""
+    return select(
+        Material.display_name,
+        Material.value,
+        MemberMaterialTotal.amount_fixed,
+        MemberMaterialTotal.amount,
+        MemberMaterialTotal.points_fixed,
+        MemberMaterialTotal.points,
+        MemberMaterialTotal.contribution_count
+    ).join(Material, MemberMaterialTotal.material_id == Material.id).where(
+        MemberMaterialTotal.guild_id == guild_id,
+        MemberMaterialTotal.member_id == member_id
+    ).order_by(*rollup_order(MemberMaterialTotal.points_fixed, MemberMaterialTotal.points), Material.display_name)
+
+
+def member_summary_from_rows(rows) -> Dict[str, Any]:
+    """Shape member_summary_query rows into the summary returned by the managers (totals summed exactly here)"""
+    total_points = 0
+    summary = {"total_points": to_points(0), "entries": 0, "materials": []}
+    for display_name, value, amount_fixed, amount, points_fixed, points, count in rows:
+        points = stored_value(points_fixed, points)
+        total_points += points
+        summary["entries"] += count
+        summary["materials"].append({
+            "material_name": display_name,
+            "amount": stored_value(amount_fixed, amount),
+            "points": to_points(points),
+            "value_per_unit": float(value) / 100.0,
+            "entries": count
+        })
+    summary["total_points"] = to_points(total_points)
+    return summary
+
+
+def guild_summary_query(guild_id: int):
+    """Per-material contribution totals for a guild (exact_sum over the BIGINT amounts plus the Numeric ones)"""
+    return select(
+        Material.display_name,
+        *exact_sum(Contribution.amount_fixed),
+        func.sum(Contribution.amount),
+        func.count(Contribution.id)
+    ).join(Contribution, Contribution.material_id == Material.id).where(
+        Contribution.guild_id == guild_id
+    ).group_by(Material.id, Material.display_name)
+
+
+def guild_summary_from_rows(rows) -> List[Dict[str, Any]]:
+    """Shape guild_summary_query rows into the summary returned by the managers, largest total first"""
+    summary = [
+        {
+            "material": display_name,
+            "total_amount": combine_sum(high, low) + int(numeric or 0),
+            "contribution_count": count
+        }
+        for display_name, high, low, numeric, count in rows
+    ]
+    return sorted(summary, key=lambda x: x['total_amount'], reverse=True)
+
+
+def top_contributors_query(guild_id: int, limit: int, by_points: bool):
+    """Top members of a guild from the member_points rollup, by points or by contributed amount"""
+    fixed, numeric = ((MemberPoints.points_fixed, MemberPoints.total_points) if by_points
+                      else (MemberPoints.amount_fixed, MemberPoints.total_amount))
+    return select(
+        Member.display_name,
+        Member.username,
+        fixed,
+        numeric
+    ).join(MemberPoints, MemberPoints.member_id == Member.id).where(
+        MemberPoints.guild_id == guild_id
+    ).order_by(*rollup_order(fixed, numeric)).limit(limit)
+
+
+def member_points_query(guild_id: int, member_id: int):
+    return select(MemberPoints.points_fixed, MemberPoints.total_points).where(
+        MemberPoints.guild_id == guild_id,
+        MemberPoints.member_id == member_id
+    )
+
+
+def member_history_query(guild_id: int, member_id: int, before_id: Optional[int], limit: int):
+    """Newest-first contributions for one member, starting below the keyset cursor `before_id`"""
+    stmt = select(
+        Contribution.id,
+        Material.display_name,
+        Material.value,
+        Contribution.amount_fixed,
+        Contribution.amount,
+        Contribution.created_at
+    ).join(Material, Contribution.material_id == Material.id).where(
+        Contribution.guild_id == guild_id,
+        Contribution.member_id == member_id
+    )
+    if before_id is not None:
+        stmt = stmt.where(Contribution.id < before_id)
+    # One extra row tells us whether another page exists
+    return stmt.order_by(Contribution.id.desc()).limit(limit + 1)
+
+
+def member_history_page(rows, limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """Shape member_history_query rows into (entries, cursor for the next page or None)"""
+    entries = []
+    for contribution_id, display_name, value, amount_fixed, amount, created_at in rows[:limit]:
+        amount = stored_value(amount_fixed, amount)
+        entries.append({
+            "id": contribution_id,
+            "material_name": display_name,
+            "amount": amount,
+            "points": to_points(amount * value),
+            "created_at": created_at
+        })
+    next_cursor = entries[-1]["id"] if len(rows) > limit else None
+    return entries, next_cursor
+
+
+def contribution_export_query(guild_id: int, member_id: Optional[int] = None, since: Optional[datetime] = None,
+                              until: Optional[datetime] = None):
+    """A guild's contributions in the [since, until) range, optionally for one member, oldest first.
+
+    Without a member the scan follows ix_contributions_guild_created in (created_at, id) order, so
+    the rows come out of the index already sorted and stream without a sort step. With a member
+    the rows are found through ix_contributions_guild_member_id (or the date index when a range
+    is given) and sorted by id; one member's history is small enough for that.
+    """
+    stmt = select(
+        Contribution.id,
+        Contribution.created_at,
+        Contribution.member_id,
+        Member.username,
+        Member.display_name,
+        Material.name,
+        Material.display_name,
+        Material.value,
+        Contribution.amount_fixed,
+        Contribution.amount
+    ).join(Member, Contribution.member_id == Member.id).join(
+        Material, Contribution.material_id == Material.id
+    ).where(Contribution.guild_id == guild_id)
+    if since is not None:
+        stmt = stmt.where(Contribution.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(Contribution.created_at < until)
+    if member_id is not None:
+        return stmt.where(Contribution.member_id == member_id).order_by(Contribution.id)
+    return stmt.order_by(Contribution.created_at, Contribution.id)
+
+
+def export_rows(rows) -> List[Dict[str, Any]]:
+    """Shape contribution_export_query rows into export records"""
+    records = []
+    for (contribution_id, created_at, member_id, username, display_name, material, material_name, value,
+         amount_fixed, amount) in rows:
+        amount = stored_value(amount_fixed, amount)
+        records.append({
+            "id": contribution_id,
+            "created_at": created_at,
+            "member_id": member_id,
+            "username": username,
+            "display_name": display_name,
+            "material": material,
+            "material_name": material_name,
+            "amount": amount,
+            "points": to_points(amount * value)
+        })
+    return records
+
+
 class DatabaseManager:
     """Database operations manager for the Discord bot"""
     
@@ -48,45 +590,77 @@ class DatabaseManager:
     
     @staticmethod
     def get_all_materials() -> List[Dict[str, Any]]:
-        """Get all available materials"""
+        """Get all available materials (served from the in-memory catalog)"""
+        material_catalog.ensure_loaded()
+        return material_catalog.all()
+    
+    @staticmethod
+    def get_material_by_name(material_name: str) -> Optional[Dict[str, Any]]:
+        """Get material by name (served from the in-memory catalog)"""
+        material_catalog.ensure_loaded()
+        return material_catalog.get(material_name)
+    
+    @staticmethod
+    def add_material(name: str, display_name: str, value: int) -> bool:
+        """Add a new material and reload the catalog"""
         session = get_db_session()
         try:
-            materials = session.query(Material).order_by(Material.display_name).all()
-            return [{"id": m.id, "name": m.name, "display_name": m.display_name, "value": m.value} for m in materials]
+            session.add(Material(name=name, display_name=display_name, value=value))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Error adding material: {e}")
+            return False
         finally:
             session.close()
+        material_catalog.reload()
+        return True
     
     @staticmethod
-    def get_material_by_name(material_name: str) -> Optional[Dict[str, Any]]:
-        """Get material by name"""
+    def update_material_value(name: str, value: int) -> bool:
+        """Change a material's point value and reload the catalog"""
         session = get_db_session()
         try:
-            material = session.query(Material).filter(Material.name == material_name).first()
-            if material:
-                return {"id": material.id, "name": material.name, "display_name": material.display_name}
-            return None
+            material = session.query(Material).filter(Material.name == name).first()
+            if not material:
+                return False
+            material.value = value
+            # Rollup points are stored priced, so reprice them in the same transaction
+            for stmt in rollup_revalue_statements(material.id, value):
+                session.execute(stmt)
+            if CONTRIBUTION_STORAGE == 'fixed':
+                stmt, params = member_points_updates(session.execute(member_points_totals_query(material.id)).all())
+                if params:
+                    session.execute(stmt, params)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Error updating material value: {e}")
+            return False
         finally:
             session.close()
+        material_catalog.reload()
+        leaderboard_cache.invalidate()
+        read_your_writes.note_write()
+        return True
     
     @staticmethod
     def add_contribution(guild_id: int, member_id: int, material_name: str, amount: int) -> bool:
         """Add a contribution record"""
+        # Get material
+        material = DatabaseManager.get_material_by_name(material_name)
+        if not material:
+            return False
+
         session = get_db_session()
         try:
-            # Get material
-            material = session.query(Material).filter(Material.name == material_name).first()
-            if not material:
-                return False
-            
             # Create contribution
-            contribution = Contribution(
-                guild_id=guild_id,
-                member_id=member_id,
-                material_id=material.id,
-                amount=amount
-            )
+            contribution = Contribution(**contribution_row(guild_id, member_id, material, amount))
             session.add(contribution)
+            DatabaseManager.apply_rollup(session, [(guild_id, member_id, material['id'], amount, material['value'])])
             session.commit()
+            leaderboard_cache.invalidate(guild_id)
+            read_your_writes.note_write(guild_id, member_id)
             return True
         except Exception as e:
             session.rollback()
@@ -95,10 +669,38 @@ class DatabaseManager:
         finally:
             session.close()
     
+    @staticmethod
+    def record_contribution(guild_id: int, guild_name: str, member_id: int, username: str,
+                            display_name: Optional[str], material_name: str, amount: int) -> Optional[Dict[str, Any]]:
+        """Upsert guild and member and insert a contribution in one transaction.
+
+        Returns the material on success, or None if the material does not exist.
+        """
+        material = DatabaseManager.get_material_by_name(material_name)
+        if not material:
+            return None
+
+        session = get_db_session()
+        try:
+            guild_stmt, member_stmt = guild_member_upserts(session.get_bind().dialect.name)
+            session.execute(guild_stmt, {"id": guild_id, "name": guild_name})
+            session.execute(member_stmt, {"id": member_id, "username": username, "display_name": display_name or username})
+            session.execute(insert(Contribution).values(**contribution_row(guild_id, member_id, material, amount)))
+            DatabaseManager.apply_rollup(session, [(guild_id, member_id, material['id'], amount, material['value'])])
+            session.commit()
+            leaderboard_cache.invalidate(guild_id)
+            read_your_writes.note_write(guild_id, member_id)
+            return material
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
     @staticmethod
     def get_member_contributions(guild_id: int, member_id: int) -> List[Dict[str, Any]]:
         """Get all contributions for a member in a guild"""
-        session = get_db_session()
+        session = read_your_writes.session(guild_id, member_id)
         try:
             contributions = session.query(
                 Contribution, Material
@@ -111,7 +713,7 @@ class DatabaseManager:
             for contribution, material in contributions:
                 result.append({
                     "material_name": material.display_name,
-                    "amount": contribution.amount,
+                    "amount": stored_value(contribution.amount_fixed, contribution.amount),
                     "created_at": contribution.created_at
                 })
             return result
@@ -121,54 +723,25 @@ class DatabaseManager:
     @staticmethod
     def get_guild_contributions_summary(guild_id: int) -> List[Dict[str, Any]]:
         """Get total contributions summary for a guild"""
-        session = get_db_session()
+        session = read_your_writes.session(guild_id)
         try:
-            from sqlalchemy import func
-            
-            # Get total contributions per material
-            results = session.query(
-                Material.display_name,
-                func.sum(Contribution.amount).label('total_amount'),
-                func.count(Contribution.id).label('contribution_count')
-            ).join(Contribution).filter(
-                Contribution.guild_id == guild_id
-            ).group_by(Material.id, Material.display_name).all()
-            
-            summary = []
-            for display_name, total_amount, count in results:
-                summary.append({
-                    "material": display_name,
-                    "total_amount": total_amount,
-                    "contribution_count": count
-                })
-            
-            return sorted(summary, key=lambda x: x['total_amount'], reverse=True)
+            return guild_summary_from_rows(session.execute(guild_summary_query(guild_id)).all())
         finally:
             session.close()
     
     @staticmethod
     def get_top_contributors(guild_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top contributors in a guild"""
-        session = get_db_session()
+        session = read_your_writes.session(guild_id)
         try:
-            from sqlalchemy import func
-            
-            results = session.query(
-                Member.display_name,
-                Member.username,
-                func.sum(Contribution.amount).label('total_contributions')
-            ).join(Contribution).filter(
-                Contribution.guild_id == guild_id
-            ).group_by(Member.id, Member.display_name, Member.username).order_by(
-                func.sum(Contribution.amount).desc()
-            ).limit(limit).all()
+            results = session.execute(top_contributors_query(guild_id, limit, by_points=False)).all()
             
             contributors = []
-            for display_name, username, total in results:
+            for display_name, username, amount_fixed, total_amount in results:
                 contributors.append({
                     "display_name": display_name,
                     "username": username,
-                    "total_contributions": total
+                    "total_contributions": stored_value(amount_fixed, total_amount)
                 })
             
             return contributors
@@ -176,52 +749,71 @@ class DatabaseManager:
             session.close()
     
     @staticmethod
-    def get_member_points(guild_id: int, member_id: int) -> float:
-        """Calculate total contribution points for a member"""
-        session = get_db_session()
+    def get_member_points(guild_id: int, member_id: int) -> Decimal:
+        """Total contribution points for a member (rollup lookup)"""
+        session = read_your_writes.session(guild_id, member_id)
         try:
-            total_points = session.query(
-                func.sum(Contribution.amount * Material.value).label('points')
-            ).join(Material).filter(
-                Contribution.guild_id == guild_id,
-                Contribution.member_id == member_id
-            ).scalar()
+            row = session.execute(member_points_query(guild_id, member_id)).first()
             
-            return float(total_points or 0) / 100.0  # Convert back to decimal
+            return to_points(stored_value(*row) if row else 0)
         finally:
             session.close()
     
     @staticmethod
     def get_top_contributors_by_points(guild_id: int, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get top contributors by points in a guild"""
-        session = get_db_session()
+        """Get top contributors by points in a guild (rollup index scan)"""
+        session = read_your_writes.session(guild_id)
         try:
-            results = session.query(
-                Member.display_name,
-                Member.username,
-                func.sum(Contribution.amount * Material.value).label('total_points')
-            ).join(Contribution).join(Material).filter(
-                Contribution.guild_id == guild_id
-            ).group_by(Member.id, Member.display_name, Member.username).order_by(
-                func.sum(Contribution.amount * Material.value).desc()
-            ).limit(limit).all()
+            results = session.execute(top_contributors_query(guild_id, limit, by_points=True)).all()
             
             contributors = []
-            for display_name, username, total_points in results:
+            for display_name, username, points_fixed, total_points in results:
                 contributors.append({
                     "display_name": display_name,
                     "username": username,
-                    "total_points": float(total_points or 0) / 100.0  # Convert to decimal
+                    "total_points": to_points(stored_value(points_fixed, total_points))
                 })
             
             return contributors
         finally:
             session.close()
     
+    @staticmethod
+    def rebuild_member_points(guild_id: Optional[int] = None) -> None:
+        """Recompute the points rollup from the raw contributions (one guild, or all)"""
+        session = get_db_session()
+        try:
+            if session.get_bind().dialect.name == 'postgresql':
+                # Queue concurrent contribution writers behind the rebuild so none is lost or double counted
+                session.execute(text("LOCK TABLE member_points, member_material_totals IN EXCLUSIVE MODE"))
+            for stmt in rollup_rebuild_statements(guild_id):
+                session.execute(stmt)
+            if CONTRIBUTION_STORAGE == 'fixed':
+                material_rows, member_rows = fixed_rollup_rows(session.execute(rollup_totals_query(guild_id)).all())
+                if material_rows:
+                    session.execute(insert(MemberMaterialTotal.__table__), material_rows)
+                    session.execute(insert(MemberPoints.__table__), member_rows)
+            session.commit()
+            leaderboard_cache.invalidate(guild_id)
+            read_your_writes.note_write(guild_id)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    @staticmethod
+    def apply_rollup(session: Session, contributions: List[Tuple[int, int, int, int, int]]) -> None:
+        """Add (guild_id, member_id, material_id, amount, value) contributions to the rollup in the caller's transaction"""
+        member_rows, material_rows = rollup_deltas(contributions)
+        member_stmt, material_stmt = rollup_upserts(session.get_bind().dialect.name)
+        session.execute(member_stmt, member_rows)
+        session.execute(material_stmt, material_rows)
+    
     @staticmethod
     def get_member_contributions_with_points(guild_id: int, member_id: int) -> List[Dict[str, Any]]:
         """Get contributions with points calculation for a member"""
-        session = get_db_session()
+        session = read_your_writes.session(guild_id, member_id)
         try:
             contributions = session.query(
                 Contribution, Material
@@ -232,14 +824,401 @@ class DatabaseManager:
             
             result = []
             for contribution, material in contributions:
-                points = float(int(contribution.amount) * material.value) / 100.0
+                amount = stored_value(contribution.amount_fixed, contribution.amount)
                 result.append({
                     "material_name": material.display_name,
-                    "amount": contribution.amount,
+                    "amount": amount,
                     "value_per_unit": float(material.value) / 100.0,
-                    "points": points,
+                    "points": to_points(amount * material.value),
                     "created_at": contribution.created_at
                 })
             return result
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+    @staticmethod
+    def get_member_contribution_summary(guild_id: int, member_id: int) -> Dict[str, Any]:
+        """Per-material amount/points and the member's totals, aggregated in a single query.
+
+        Returns {"total_points", "entries", "materials": [{"material_name", "amount", "points",
+        "value_per_unit", "entries"}]} with materials ordered by points, highest first.
+        """
+        session = read_your_writes.session(guild_id, member_id)
+        try:
+            return member_summary_from_rows(session.execute(member_summary_query(guild_id, member_id)).all())
+        finally:
+            session.close()
+
+    @staticmethod
+    def get_member_contribution_history(guild_id: int, member_id: int, before_id: Optional[int] = None,
+                                        limit: int = 10) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """One keyset-paginated page of a member's raw contributions, newest first.
+
+        Pass the returned cursor as `before_id` to fetch the next page; it is None on the last page.
+        """
+        session = read_your_writes.session(guild_id, member_id)
+        try:
+            rows = session.execute(member_history_query(guild_id, member_id, before_id, limit)).all()
+            return member_history_page(rows, limit)
+        finally:
+            session.close()
+
+    @staticmethod
+    def iter_guild_contributions(guild_id: int, member_id: Optional[int] = None, since: Optional[datetime] = None,
+                                 until: Optional[datetime] = None,
+                                 batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """Stream a guild's contributions (see contribution_export_query) in batches of export records.
+
+        Rows are fetched through a server-side cursor (yield_per), so memory holds one batch
+        however large the guild's history is. The session stays open until the iterator is
+        exhausted or closed.
+        """
+        session = read_your_writes.session(guild_id, member_id)
+        try:
+            stmt = contribution_export_query(guild_id, member_id, since, until)
+            result = session.execute(stmt.execution_options(yield_per=batch_size))
+            for partition in result.partitions():
+                yield export_rows(partition)
+        finally:
+            session.close()
+
+
+class AsyncDatabaseManager:
+    """Asyncio counterpart of DatabaseManager, used from command coroutines so that
+    database round trips never block the gateway event loop"""
+
+    @staticmethod
+    async def ensure_guild_exists(guild_id: int, guild_name: str) -> None:
+        """Ensure guild exists in database"""
+        async with get_async_db_session() as session:
+            guild = await session.get(Guild, guild_id)
+            if not guild:
+                session.add(Guild(id=guild_id, name=guild_name))
+                await session.commit()
+
+    @staticmethod
+    async def ensure_member_exists(member_id: int, username: str, display_name: Optional[str] = None) -> None:
+        """Ensure member exists in database"""
+        async with get_async_db_session() as session:
+            member = await session.get(Member, member_id)
+            current_display_name = display_name or username
+            if not member:
+                session.add(Member(
+                    id=member_id,
+                    username=username,
+                    display_name=current_display_name
+                ))
+                await session.commit()
+            elif member.username != username or member.display_name != current_display_name:
+                # Update member info if changed
+                await session.execute(
+                    update(Member).where(Member.id == member_id).values(
+                        username=username,
+                        display_name=current_display_name
+                    )
+                )
+                await session.commit()
+
+    @staticmethod
+    async def get_all_materials() -> List[Dict[str, Any]]:
+        """Get all available materials (served from the in-memory catalog)"""
+        await material_catalog.ensure_loaded_async()
+        return material_catalog.all()
+
+    @staticmethod
+    async def get_material_by_name(material_name: str) -> Optional[Dict[str, Any]]:
+        """Get material by name (served from the in-memory catalog)"""
+        await material_catalog.ensure_loaded_async()
+        return material_catalog.get(material_name)
+
+    @staticmethod
+    async def add_material(name: str, display_name: str, value: int) -> bool:
+        """Add a new material and reload the catalog"""
+        async with get_async_db_session() as session:
+            try:
+                session.add(Material(name=name, display_name=display_name, value=value))
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                print(f"Error adding material: {e}")
+                return False
+        await material_catalog.reload_async()
+        return True
+
+    @staticmethod
+    async def update_material_value(name: str, value: int) -> bool:
+        """Change a material's point value and reload the catalog"""
+        async with get_async_db_session() as session:
+            try:
+                material = await session.scalar(select(Material).where(Material.name == name))
+                if not material:
+                    return False
+                material.value = value
+                # Rollup points are stored priced, so reprice them in the same transaction
+                for stmt in rollup_revalue_statements(material.id, value):
+                    await session.execute(stmt)
+                if CONTRIBUTION_STORAGE == 'fixed':
+                    rows = (await session.execute(member_points_totals_query(material.id))).all()
+                    stmt, params = member_points_updates(rows)
+                    if params:
+                        await session.execute(stmt, params)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                print(f"Error updating material value: {e}")
+                return False
+        await material_catalog.reload_async()
+        leaderboard_cache.invalidate()
+        read_your_writes.note_write()
+        return True
+
+    @staticmethod
+    async def add_contribution(guild_id: int, member_id: int, material_name: str, amount: int) -> bool:
+        """Add a contribution record"""
+        material = await AsyncDatabaseManager.get_material_by_name(material_name)
+        if not material:
+            return False
+
+        async with get_async_db_session() as session:
+            try:
+                session.add(Contribution(**contribution_row(guild_id, member_id, material, amount)))
+                await AsyncDatabaseManager.apply_rollup(
+                    session, [(guild_id, member_id, material['id'], amount, material['value'])]
+                )
+                await session.commit()
+                leaderboard_cache.invalidate(guild_id)
+                read_your_writes.note_write(guild_id, member_id)
+                return True
+            except Exception as e:
+                await session.rollback()
+                print(f"Error adding contribution: {e}")
+                return False
+
+    @staticmethod
+    async def record_contribution(guild_id: int, guild_name: str, member_id: int, username: str,
+                                  display_name: Optional[str], material_name: str,
+                                  amount: int) -> Optional[Dict[str, Any]]:
+        """Upsert guild and member and insert a contribution in one transaction.
+
+        Returns the material on success, or None if the material does not exist.
+        """
+        material = await AsyncDatabaseManager.get_material_by_name(material_name)
+        if not material:
+            return None
+
+        async with get_async_db_session() as session:
+            try:
+                guild_stmt, member_stmt = guild_member_upserts(session.bind.dialect.name)
+                await session.execute(guild_stmt, {"id": guild_id, "name": guild_name})
+                await session.execute(
+                    member_stmt, {"id": member_id, "username": username, "display_name": display_name or username}
+                )
+                await session.execute(
+                    insert(Contribution).values(**contribution_row(guild_id, member_id, material, amount))
+                )
+                await AsyncDatabaseManager.apply_rollup(
+                    session, [(guild_id, member_id, material['id'], amount, material['value'])]
+                )
+                await session.commit()
+                leaderboard_cache.invalidate(guild_id)
+                read_your_writes.note_write(guild_id, member_id)
+                return material
+            except Exception:
+                await session.rollback()
+                raise
+
+    @staticmethod
+    async def import_contributions(guild_id: int, guild_name: str, members: List[Dict[str, Any]],
+                                   contributions: List[Tuple[int, Dict[str, Any], int]]) -> None:
+        """Insert one batch of (member_id, material, amount) contributions in one transaction.
+
+        `members` are {"id", "username", "display_name"} rows for every member in the batch; members
+        that already exist keep their names. Contributions are written with COPY on PostgreSQL and
+        one executemany INSERT elsewhere, and the points rollup is updated in the same transaction.
+        """
+        created_at = datetime.utcnow()
+        rows = [contribution_row(guild_id, member_id, material, amount, created_at)
+                for member_id, material, amount in contributions]
+        async with get_async_db_session() as session:
+            try:
+                dialect_name = session.bind.dialect.name
+                guild_stmt, _ = guild_member_upserts(dialect_name)
+                await session.execute(guild_stmt, {"id": guild_id, "name": guild_name})
+                await session.execute(
+                    dialect_insert(dialect_name)(Member).on_conflict_do_nothing(index_elements=[Member.id]), members
+                )
+                if dialect_name == 'postgresql':
+                    await AsyncDatabaseManager._copy_contributions(session, rows)
+                else:
+                    await session.execute(insert(Contribution.__table__), rows)
+                await AsyncDatabaseManager.apply_rollup(session, [
+                    (guild_id, member_id, material['id'], amount, material['value'])
+                    for member_id, material, amount in contributions
+                ])
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+        leaderboard_cache.invalidate(guild_id)
+        read_your_writes.note_write(guild_id)
+
+    @staticmethod
+    async def _copy_contributions(session, rows: List[Dict[str, Any]]) -> None:
+        """COPY contribution rows through the session's asyncpg connection (inside its transaction)"""
+        columns = list(rows[0])
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            Contribution.__tablename__,
+            records=[tuple(Decimal(row[c]) if c == 'amount' else row[c] for c in columns) for row in rows],
+            columns=columns
+        )
+
+    @staticmethod
+    async def stream_guild_contributions(guild_id: int, member_id: Optional[int] = None,
+                                         since: Optional[datetime] = None, until: Optional[datetime] = None,
+                                         batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream a guild's contributions in batches of export records through a server-side cursor"""
+        async with read_your_writes.async_session(guild_id, member_id) as session:
+            stmt = contribution_export_query(guild_id, member_id, since, until)
+            result = await session.stream(stmt.execution_options(yield_per=batch_size))
+            async for partition in result.partitions():
+                yield export_rows(partition)
+
+    @staticmethod
+    async def get_member_contributions(guild_id: int, member_id: int) -> List[Dict[str, Any]]:
+        """Get all contributions for a member in a guild"""
+        async with read_your_writes.async_session(guild_id, member_id) as session:
+            results = await session.execute(
+                select(Material.display_name, Contribution.amount_fixed, Contribution.amount, Contribution.created_at)
+                .join(Material, Contribution.material_id == Material.id)
+                .where(Contribution.guild_id == guild_id, Contribution.member_id == member_id)
+            )
+            return [
+                {"material_name": display_name, "amount": stored_value(amount_fixed, amount), "created_at": created_at}
+                for display_name, amount_fixed, amount, created_at in results
+            ]
+
+    @staticmethod
+    async def get_guild_contributions_summary(guild_id: int) -> List[Dict[str, Any]]:
+        """Get total contributions summary for a guild"""
+        async with read_your_writes.async_session(guild_id) as session:
+            rows = (await session.execute(guild_summary_query(guild_id))).all()
+            return guild_summary_from_rows(rows)
+
+    @staticmethod
+    async def get_top_contributors(guild_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get top contributors in a guild"""
+        async with read_your_writes.async_session(guild_id) as session:
+            results = await session.execute(top_contributors_query(guild_id, limit, by_points=False))
+            return [
+                {
+                    "display_name": display_name,
+                    "username": username,
+                    "total_contributions": stored_value(amount_fixed, total_amount)
+                }
+                for display_name, username, amount_fixed, total_amount in results
+            ]
+
+    @staticmethod
+    async def get_member_points(guild_id: int, member_id: int) -> Decimal:
+        """Total contribution points for a member (rollup lookup)"""
+        async with read_your_writes.async_session(guild_id, member_id) as session:
+            row = (await session.execute(member_points_query(guild_id, member_id))).first()
+            return to_points(stored_value(*row) if row else 0)
+
+    @staticmethod
+    async def get_top_contributors_by_points(guild_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get top contributors by points in a guild (rollup index scan)"""
+        async with read_your_writes.async_session(guild_id) as session:
+            results = await session.execute(top_contributors_query(guild_id, limit, by_points=True))
+            return [
+                {
+                    "display_name": display_name,
+                    "username": username,
+                    "total_points": to_points(stored_value(points_fixed, total_points))
+                }
+                for display_name, username, points_fixed, total_points in results
+            ]
+
+    @staticmethod
+    async def get_leaderboard(guild_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Top contributors by points, served from the per-guild leaderboard cache"""
+        return await leaderboard_cache.get(
+            guild_id, limit, lambda: AsyncDatabaseManager.get_top_contributors_by_points(guild_id, limit)
+        )
+
+    @staticmethod
+    async def rebuild_member_points(guild_id: Optional[int] = None) -> None:
+        """Recompute the points rollup from the raw contributions (one guild, or all)"""
+        async with get_async_db_session() as session:
+            try:
+                if session.bind.dialect.name == 'postgresql':
+                    # Queue concurrent contribution writers behind the rebuild so none is lost or double counted
+                    await session.execute(text("LOCK TABLE member_points, member_material_totals IN EXCLUSIVE MODE"))
+                for stmt in rollup_rebuild_statements(guild_id):
+                    await session.execute(stmt)
+                if CONTRIBUTION_STORAGE == 'fixed':
+                    totals = (await session.execute(rollup_totals_query(guild_id))).all()
+                    material_rows, member_rows = fixed_rollup_rows(totals)
+                    if material_rows:
+                        await session.execute(insert(MemberMaterialTotal.__table__), material_rows)
+                        await session.execute(insert(MemberPoints.__table__), member_rows)
+                await session.commit()
+                leaderboard_cache.invalidate(guild_id)
+                read_your_writes.note_write(guild_id)
+            except Exception:
+                await session.rollback()
+                raise
+
+    @staticmethod
+    async def apply_rollup(session, contributions: List[Tuple[int, int, int, int, int]]) -> None:
+        """Add (guild_id, member_id, material_id, amount, value) contributions to the rollup in the caller's transaction"""
+        member_rows, material_rows = rollup_deltas(contributions)
+        member_stmt, material_stmt = rollup_upserts(session.bind.dialect.name)
+        await session.execute(member_stmt, member_rows)
+        await session.execute(material_stmt, material_rows)
+
+    @staticmethod
+    async def get_member_contributions_with_points(guild_id: int, member_id: int) -> List[Dict[str, Any]]:
+        """Get contributions with points calculation for a member"""
+        async with read_your_writes.async_session(guild_id, member_id) as session:
+            results = await session.execute(
+                select(Material.display_name, Material.value, Contribution.amount_fixed, Contribution.amount,
+                       Contribution.created_at)
+                .join(Material, Contribution.material_id == Material.id)
+                .where(Contribution.guild_id == guild_id, Contribution.member_id == member_id)
+            )
+            entries = []
+            for display_name, value, amount_fixed, amount, created_at in results:
+                amount = stored_value(amount_fixed, amount)
+                entries.append({
+                    "material_name": display_name,
+                    "amount": amount,
+                    "value_per_unit": float(value) / 100.0,
+                    "points": to_points(amount * value),
+                    "created_at": created_at
+                })
+            return entries
+
+    @staticmethod
+    async def get_member_contribution_summary(guild_id: int, member_id: int) -> Dict[str, Any]:
+        """Per-material amount/points and the member's totals, aggregated in a single query.
+
+        Returns {"total_points", "entries", "materials": [{"material_name", "amount", "points",
+        "value_per_unit", "entries"}]} with materials ordered by points, highest first.
+        """
+        async with read_your_writes.async_session(guild_id, member_id) as session:
+            rows = (await session.execute(member_summary_query(guild_id, member_id))).all()
+            return member_summary_from_rows(rows)
+
+    @staticmethod
+    async def get_member_contribution_history(guild_id: int, member_id: int, before_id: Optional[int] = None,
+                                              limit: int = 10) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """One keyset-paginated page of a member's raw contributions, newest first.
+
+        Pass the returned cursor as `before_id` to fetch the next page; it is None on the last page.
+        """
+        async with read_your_writes.async_session(guild_id, member_id) as session:
+            rows = (await session.execute(member_history_query(guild_id, member_id, before_id, limit))).all()
+            return member_history_page(rows, limit)
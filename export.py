@@ -0,0 +1,151 @@
+"""
+Streaming export of a guild's contribution history (/export).
+
+Contributions come out of AsyncDatabaseManager.stream_guild_contributions in
+batches of EXPORT_BATCH_SIZE rows (a server-side cursor, so the database
+never sends the whole history at once) and are written straight into gzip
+files on disk, as CSV or as JSON lines:
+
+    id,created_at,member_id,username,display_name,material,material_name,amount,points
+
+Memory therefore holds one batch regardless of the size of the history.
+Each file is cut off just below a size limit (the guild's upload limit for
+/export) and the export continues in a new part; every part is a complete
+gzip file with its own CSV header, so parts can be opened independently.
+After EXPORT_MAX_PARTS parts the export stops and is marked truncated.
+"""
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+from contextlib import aclosing
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_MAX_PARTS = int(os.getenv('EXPORT_MAX_PARTS', '10'))
+EXPORT_FORMATS = ("csv", "jsonl")
+COLUMNS = ["id", "created_at", "member_id", "username", "display_name", "material", "material_name", "amount", "points"]
+# gzip and the text buffer hold back some output, so a part is closed this far below the limit
+PART_HEADROOM = 512 * 1024
+
+
+@dataclass
+class ExportPart:
+    path: str
+    filename: str
+    rows: int = 0
+    size: int = 0
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # Points are exact decimals; a JSON number would round them through float
+    return str(value)
+
+
+def _csv_row(record: Dict[str, Any]) -> List[Any]:
+    row = [record[c] for c in COLUMNS]
+    created_at = record["created_at"]
+    row[COLUMNS.index("created_at")] = created_at.isoformat(sep=" ") if created_at else ""
+    return row
+
+
+class ContributionExport:
+    """Writes export records into size-limited gzip parts in `directory`"""
+
+    def __init__(self, directory: str, basename: str, fmt: str = "csv", part_limit: int = 10 * 1024 * 1024,
+                 max_parts: int = EXPORT_MAX_PARTS):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r}")
+        self.directory = directory
+        self.basename = basename
+        self.fmt = fmt
+        self.part_bytes = max(part_limit - PART_HEADROOM, part_limit // 2)
+        self.max_parts = max_parts
+        self.parts: List[ExportPart] = []
+        self.rows = 0
+        self.truncated = False
+        self._raw = None
+        self._text = None
+        self._writer = None
+
+    @property
+    def extension(self) -> str:
+        return f"{self.fmt}.gz"
+
+    @property
+    def size(self) -> int:
+        return sum(part.size for part in self.parts)
+
+    def _open_part(self) -> None:
+        number = len(self.parts) + 1
+        part = ExportPart(os.path.join(self.directory, f"{self.basename}-{number}.{self.extension}"),
+                          f"{self.basename}.{self.extension}")
+        self._raw = open(part.path, "wb")
+        gz = gzip.GzipFile(fileobj=self._raw, mode="wb", filename=f"{self.basename}.{self.fmt}")
+        self._text = io.TextIOWrapper(gz, encoding="utf-8", newline="")
+        if self.fmt == "csv":
+            self._writer = csv.writer(self._text)
+            self._writer.writerow(COLUMNS)
+        self.parts.append(part)
+
+    def _close_part(self) -> None:
+        if self._text is None:
+            return
+        self._text.close()  # also closes the GzipFile and writes its trailer
+        self.parts[-1].size = self._raw.tell()
+        self._raw.close()
+        self._raw = self._text = self._writer = None
+
+    def write(self, records: List[Dict[str, Any]]) -> bool:
+        """Append one batch; returns False once the part limit is reached and nothing more is written"""
+        if self.truncated:
+            return False
+        if self._text is None:
+            if len(self.parts) >= self.max_parts:
+                self.truncated = True
+                return False
+            self._open_part()
+
+        if self.fmt == "csv":
+            self._writer.writerows([_csv_row(record) for record in records])
+        else:
+            self._text.writelines(json.dumps(record, default=_jsonable) + "\n" for record in records)
+        self.rows += len(records)
+        self.parts[-1].rows += len(records)
+
+        self._text.flush()
+        if self._raw.tell() >= self.part_bytes:
+            self._close_part()
+        return True
+
+    def finish(self) -> List[ExportPart]:
+        """Close the open part and name the files (part numbers only when the export was split)"""
+        self._close_part()
+        if not self.parts:
+            self._open_part()  # an empty export is still a valid file with a header
+            self._close_part()
+        if len(self.parts) > 1:
+            for number, part in enumerate(self.parts, 1):
+                part.filename = f"{self.basename}-part{number}of{len(self.parts)}.{self.extension}"
+        return self.parts
+
+    async def run(self, batches: AsyncIterator[List[Dict[str, Any]]],
+                  on_progress: Optional[Callable[["ContributionExport"], Awaitable[None]]] = None) -> List[ExportPart]:
+        """Write every batch (compression runs in a worker thread) and return the finished parts"""
+        async with aclosing(batches):
+            async for records in batches:
+                if not await asyncio.to_thread(self.write, records):
+                    logger.warning(f"Export {self.basename} stopped after {self.max_parts} parts ({self.rows} rows)")
+                    break
+                if on_progress:
+                    await on_progress(self)
+        return await asyncio.to_thread(self.finish)
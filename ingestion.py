@@ -0,0 +1,352 @@
+"""
+Write-behind contribution ingestion.
+
+With CONTRIBUTION_INGEST_MODE=journal, /contribute appends the contribution to
+a local journal file, waits for it to be fsynced (concurrent submissions share
+one fsync) and acknowledges immediately. A background task flushes the
+journal to the database in bulk executemany batches whenever
+INGEST_BATCH_SIZE records are pending or INGEST_FLUSH_INTERVAL seconds pass.
+
+Each flush runs in one transaction that upserts guilds and members, inserts
+the contributions, updates the points rollup and advances the row in
+ingest_checkpoints. On startup, recover() replays every journal record above
+that checkpoint, so a crash never loses an acknowledged contribution and never
+applies one twice.
+
+Contributions are visible to /contributions and /leaderboard only once they
+have been flushed, so reads can lag by up to one flush interval.
+
+A sealed segment that fails INGEST_MAX_ATTEMPTS flushes in a row (a row the
+database rejects, say for a deleted material) is renamed to
+`<segment>.quarantined` and the checkpoint moves past it, so one bad segment
+cannot hold back everything journaled after it. Quarantined segments are left
+for an operator to inspect; they are never replayed automatically.
+"""
+import asyncio
+import glob
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+
+from models import get_async_db_session, Contribution, IngestCheckpoint
+from database import AsyncDatabaseManager, contribution_row, dialect_insert, guild_member_upserts
+from leaderboard_cache import leaderboard_cache
+from read_routing import read_your_writes
+
+logger = logging.getLogger(__name__)
+
+CONTRIBUTION_INGEST_MODE = os.getenv('CONTRIBUTION_INGEST_MODE', 'direct')
+CONTRIBUTION_JOURNAL_PATH = os.getenv('CONTRIBUTION_JOURNAL_PATH', 'contributions.journal')
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '500'))
+INGEST_FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', '1.0'))
+INGEST_MAX_ATTEMPTS = int(os.getenv('INGEST_MAX_ATTEMPTS', '5'))
+# One checkpoint row per journal; cluster workers each have their own journal and checkpoint
+CHECKPOINT_NAME = os.getenv('INGEST_CHECKPOINT_NAME', 'contributions')
+
+
+class ContributionJournal:
+    """Append-only JSON-lines journal split into segments that are deleted once flushed"""
+
+    def __init__(self, path: str = CONTRIBUTION_JOURNAL_PATH):
+        self.path = path
+        self.sequence = 0
+        self._durable_sequence = 0
+        self._file = None
+        self._sync_task: Optional[asyncio.Task] = None
+        # Serializes fsyncs with rotation, which swaps and closes the file being synced
+        self._lock = asyncio.Lock()
+
+    def open(self, start_sequence: int) -> None:
+        """Open the active segment for appending; sequence numbers continue after start_sequence"""
+        self.sequence = max(self.sequence, start_sequence)
+        self._durable_sequence = self.sequence
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self) -> None:
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def existing_segments(self) -> List[str]:
+        """Segments left on disk by a previous run, oldest first (rotated segments, then the active one)"""
+        rotated = sorted(glob.glob(f"{glob.escape(self.path)}.*.segment"),
+                         key=lambda p: int(p.rsplit('.', 2)[1]))
+        return rotated + ([self.path] if os.path.exists(self.path) else [])
+
+    @staticmethod
+    def read_segment(path: str) -> List[Dict[str, Any]]:
+        """Records of one segment; a torn final line from a crash mid-write is skipped"""
+        records = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping torn journal line in {path}")
+        return records
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """Write a record (not yet durable) and return its sequence number"""
+        self.sequence += 1
+        record["seq"] = self.sequence
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        return self.sequence
+
+    async def wait_durable(self, sequence: int) -> None:
+        """Wait until the record with this sequence number is fsynced (group commit)"""
+        while self._durable_sequence < sequence:
+            if self._sync_task is None:
+                self._sync_task = asyncio.create_task(self._fsync())
+            await asyncio.shield(self._sync_task)
+
+    async def _fsync(self) -> None:
+        try:
+            async with self._lock:
+                target = self.sequence
+                self._file.flush()
+                await asyncio.to_thread(os.fsync, self._file.fileno())
+                self._durable_sequence = max(self._durable_sequence, target)
+        finally:
+            self._sync_task = None
+
+    async def rotate(self) -> Optional[Tuple[str, int]]:
+        """Seal the active segment under a new name and start a fresh one.
+
+        Returns the sealed path and the last sequence number in it. The new segment is
+        swapped in before the old one is fsynced, so records appended meanwhile land in
+        the new segment and are only acknowledged once that one is fsynced.
+        """
+        async with self._lock:
+            if self._file.tell() == 0:
+                return None
+            sealed_file, target = self._file, self.sequence
+            sealed_file.flush()
+            sealed = f"{self.path}.{target}.segment"
+            os.replace(self.path, sealed)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            try:
+                await asyncio.to_thread(os.fsync, sealed_file.fileno())
+            finally:
+                sealed_file.close()
+            self._durable_sequence = max(self._durable_sequence, target)
+            return sealed, target
+
+
+class ContributionIngestor:
+    """Journals contributions and flushes them to the database in batches"""
+
+    def __init__(self, journal: Optional[ContributionJournal] = None,
+                 batch_size: int = INGEST_BATCH_SIZE, flush_interval: float = INGEST_FLUSH_INTERVAL,
+                 max_attempts: int = INGEST_MAX_ATTEMPTS):
+        self.journal = journal or ContributionJournal()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._attempts = 0  # failed flushes of the oldest sealed segment
+        self._pending: List[Dict[str, Any]] = []
+        self._sealed: List[Tuple[str, List[Dict[str, Any]]]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.flushed = 0
+        self.flushes = 0
+        self.quarantined = 0
+
+    async def _checkpoint(self) -> int:
+        async with get_async_db_session() as session:
+            return await session.scalar(
+                select(IngestCheckpoint.last_sequence).where(IngestCheckpoint.name == CHECKPOINT_NAME)
+            ) or 0
+
+    async def start(self) -> None:
+        """Replay unflushed journal records, then start the background flusher"""
+        await self.recover()
+        self._task = asyncio.create_task(self._run())
+
+    async def recover(self) -> int:
+        """Flush every journal record above the database checkpoint. Returns the number replayed."""
+        checkpoint = await self._checkpoint()
+        segments = self.journal.existing_segments()
+        highest = checkpoint
+        replay: List[Dict[str, Any]] = []
+        for path in segments:
+            for record in self.journal.read_segment(path):
+                highest = max(highest, record["seq"])
+                if record["seq"] > checkpoint:
+                    replay.append(record)
+
+        if replay:
+            logger.info(f"Replaying {len(replay)} journaled contributions after checkpoint {checkpoint}")
+            await self._flush_records(replay)
+        for path in segments:
+            os.remove(path)
+
+        self.journal.open(highest)
+        return len(replay)
+
+    async def submit(self, guild_id: int, guild_name: str, member_id: int, username: str,
+                     display_name: Optional[str], material: Dict[str, Any], amount: int) -> int:
+        """Journal a contribution and return once it is durable on local disk"""
+        record = {
+            "guild_id": guild_id,
+            "guild_name": guild_name,
+            "member_id": member_id,
+            "username": username,
+            "display_name": display_name or username,
+            "material_id": material["id"],
+            "value": material["value"],
+            "amount": str(amount),  # Amounts may exceed JSON-safe integers in other readers
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        sequence = self.journal.append(record)
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        await self.journal.wait_durable(sequence)
+        return sequence
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # Records stay sealed on disk and in memory; the next tick retries them
+                logger.error(f"Contribution flush failed (attempt {self._attempts}/{self.max_attempts}), "
+                             f"will retry: {e}")
+
+    async def flush(self) -> None:
+        """Seal the active segment and write every sealed segment to the database"""
+        if self._pending:
+            sealed = await self.journal.rotate()
+            if sealed:
+                # Records submitted while the segment was being sealed went to the new one
+                sealed_path, last_sequence = sealed
+                count = sum(1 for record in self._pending if record["seq"] <= last_sequence)
+                self._sealed.append((sealed_path, self._pending[:count]))
+                self._pending = self._pending[count:]
+
+        while self._sealed:
+            path, records = self._sealed[0]
+            try:
+                await self._flush_records(records)
+            except Exception as e:
+                self._attempts += 1
+                if self._attempts < self.max_attempts:
+                    raise
+                await self._quarantine(path, records, e)
+            else:
+                os.remove(path)
+            self._attempts = 0
+            self._sealed.pop(0)
+
+    async def _quarantine(self, path: str, records: List[Dict[str, Any]], error: Exception) -> None:
+        """Set aside a segment that keeps failing and move the checkpoint past it"""
+        quarantine_path = f"{path}.quarantined"
+        last_sequence = max(r["seq"] for r in records)
+        # Renamed first: a crash before the checkpoint commits leaves the records set aside, not deleted
+        if os.path.exists(path):
+            os.replace(path, quarantine_path)
+        async with get_async_db_session() as session:
+            try:
+                await session.execute(*self._checkpoint_upsert(session.bind.dialect.name, last_sequence))
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+        self.quarantined += len(records)
+        logger.error(
+            f"Quarantined {len(records)} journaled contributions (seq {records[0]['seq']}-{last_sequence}) "
+            f"to {quarantine_path} after {self._attempts} failed flushes: {error}"
+        )
+
+    @staticmethod
+    def _checkpoint_upsert(dialect_name: str, last_sequence: int) -> Tuple[Any, Dict[str, Any]]:
+        """Statement and parameters advancing this journal's checkpoint row"""
+        checkpoint_insert = dialect_insert(dialect_name)(IngestCheckpoint)
+        return checkpoint_insert.on_conflict_do_update(
+            index_elements=[IngestCheckpoint.name],
+            set_={
+                'last_sequence': checkpoint_insert.excluded.last_sequence,
+                'updated_at': checkpoint_insert.excluded.updated_at
+            }
+        ), {"name": CHECKPOINT_NAME, "last_sequence": last_sequence, "updated_at": datetime.utcnow()}
+
+    async def _flush_records(self, records: List[Dict[str, Any]]) -> None:
+        """Write records in one transaction, advancing the checkpoint with them"""
+        guilds: Dict[int, Dict[str, Any]] = {}
+        members: Dict[int, Dict[str, Any]] = {}
+        rollup: List[Tuple[int, int, int, int, int]] = []
+        for record in records:
+            guilds[record["guild_id"]] = {"id": record["guild_id"], "name": record["guild_name"]}
+            members[record["member_id"]] = {
+                "id": record["member_id"], "username": record["username"], "display_name": record["display_name"]
+            }
+            rollup.append((record["guild_id"], record["member_id"], record["material_id"],
+                           int(record["amount"]), record["value"]))
+
+        async with get_async_db_session() as session:
+            try:
+                dialect_name = session.bind.dialect.name
+                guild_stmt, member_stmt = guild_member_upserts(dialect_name)
+                await session.execute(guild_stmt, list(guilds.values()))
+                await session.execute(member_stmt, list(members.values()))
+
+                for start in range(0, len(records), self.batch_size):
+                    await session.execute(insert(Contribution.__table__), [
+                        contribution_row(
+                            r["guild_id"],
+                            r["member_id"],
+                            {"id": r["material_id"], "value": r["value"]},
+                            int(r["amount"]),
+                            datetime.fromisoformat(r["created_at"])
+                        )
+                        for r in records[start:start + self.batch_size]
+                    ])
+                await AsyncDatabaseManager.apply_rollup(session, rollup)
+
+                await session.execute(*self._checkpoint_upsert(dialect_name, max(r["seq"] for r in records)))
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+        for guild_id in guilds:
+            leaderboard_cache.invalidate(guild_id)
+        for record in records:
+            read_your_writes.note_write(record["guild_id"], record["member_id"])
+        self.flushed += len(records)
+        self.flushes += 1
+
+    async def stop(self) -> None:
+        """Stop the flusher after writing everything still pending"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+        try:
+            await self.flush()
+        finally:
+            self.journal.close()
+
+
+# Global ingestor instance (only created when CONTRIBUTION_INGEST_MODE=journal)
+contribution_ingestor: Optional[ContributionIngestor] = None
+
+
+def get_contribution_ingestor() -> Optional[ContributionIngestor]:
+    """Get the write-behind ingestor, or None when contributions are written directly"""
+    global contribution_ingestor
+    if contribution_ingestor is None and CONTRIBUTION_INGEST_MODE == 'journal':
+        contribution_ingestor = ContributionIngestor()
+    return contribution_ingestor
@@ -0,0 +1,100 @@
+"""
+Per-guild leaderboard cache.
+
+Entries are keyed by (guild_id, limit) and expire after LEADERBOARD_CACHE_TTL
+seconds. Every contribution write in this process invalidates its guild
+(write-through invalidation), so the TTL only bounds staleness from writers in
+other processes. Concurrent misses for the same key share a single query.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+LEADERBOARD_CACHE_TTL = float(os.getenv('LEADERBOARD_CACHE_TTL', '60'))
+
+CacheKey = Tuple[int, int]
+
+
+class LeaderboardCache:
+    """TTL cache with per-guild invalidation and single-flight rebuilds"""
+
+    def __init__(self, ttl: float = LEADERBOARD_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[CacheKey, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        # Bumped on invalidation so a rebuild that started before a write is not cached after it
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.rebuilds = 0
+        self.rebuild_seconds = 0.0
+        self.last_rebuild_ms = 0.0
+
+    async def get(self, guild_id: int, limit: int,
+                  loader: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """Cached leaderboard, loading it with `loader` on a miss"""
+        key = (guild_id, limit)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = (self._epoch, self._generations.get(guild_id, 0))
+        start = time.perf_counter()
+        try:
+            value = await loader()
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        else:
+            elapsed = time.perf_counter() - start
+            self.rebuilds += 1
+            self.rebuild_seconds += elapsed
+            self.last_rebuild_ms = elapsed * 1000
+            if (self._epoch, self._generations.get(guild_id, 0)) == generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, guild_id: Optional[int] = None) -> None:
+        """Drop cached leaderboards for one guild, or for every guild"""
+        if guild_id is None:
+            self._epoch += 1
+            self._entries.clear()
+            return
+        self._generations[guild_id] = self._generations.get(guild_id, 0) + 1
+        for key in [k for k in self._entries if k[0] == guild_id]:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit ratio and rebuild latency for observability"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "rebuilds": self.rebuilds,
+            "avg_rebuild_ms": (self.rebuild_seconds / self.rebuilds * 1000) if self.rebuilds else 0.0,
+            "last_rebuild_ms": self.last_rebuild_ms,
+            "entries": len(self._entries),
+        }
+
+
+# Global cache instance
+leaderboard_cache = LeaderboardCache()
@@ -1,3 +1,6 @@
+from startup import startup_report
+startup_report.begin("import", since=startup_report.started)
+
 import os
 import asyncio
 import discord
@@ -8,13 +11,23 @@ import logging
 # Load environment variables
 load_dotenv()
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
 # Bot configuration
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN', 'your_discord_token_here')
 BOT_PREFIX = os.getenv('BOT_PREFIX', '!')
+# Sharding: unset runs one unsharded connection, "auto" lets Discord pick the shard count,
+# a number fixes it. SHARD_IDS (e.g. "0-3") limits this process to some of the shards;
+# cluster.py sets it, with CLUSTER_ID, for each worker process.
+SHARD_COUNT = os.getenv('SHARD_COUNT')
+SHARD_IDS = os.getenv('SHARD_IDS')
+CLUSTER_ID = os.getenv('CLUSTER_ID')
+SKIP_DB_INIT = os.getenv('SKIP_DB_INIT', 'false').lower() == 'true'
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format=f"[cluster {CLUSTER_ID}] %(levelname)s:%(name)s:%(message)s" if CLUSTER_ID else logging.BASIC_FORMAT
+)
+logger = logging.getLogger(__name__)
 
 # Create bot instance with intents
 intents = discord.Intents.default()
@@ -22,28 +35,93 @@ intents.message_content = True  # Required for message content access
 intents.guilds = True
 intents.guild_messages = True
 
-bot = commands.Bot(command_prefix=BOT_PREFIX, intents=intents)
 
-# Import event handlers and commands
-from bot.events import setup_events
-from bot.commands import setup_commands
+def parse_shard_ids(value: str) -> list:
+    """"0-3,8" -> [0, 1, 2, 3, 8]"""
+    shard_ids = []
+    for part in value.split(','):
+        start, _, end = part.strip().partition('-')
+        shard_ids.extend(range(int(start), int(end or start) + 1))
+    return shard_ids
+
+
+if SHARD_COUNT or SHARD_IDS:
+    bot = commands.AutoShardedBot(
+        command_prefix=BOT_PREFIX,
+        intents=intents,
+        shard_count=None if SHARD_COUNT in (None, 'auto') else int(SHARD_COUNT),
+        shard_ids=parse_shard_ids(SHARD_IDS) if SHARD_IDS else None
+    )
+else:
+    bot = commands.Bot(command_prefix=BOT_PREFIX, intents=intents)
+
+
+def init_database():
+    """Schema checks, migrations and the material catalog (runs in a thread, concurrently with login)"""
+    with startup_report.phase("db_init"):
+        from query_stats import install_query_stats
+        install_query_stats()
+        if not SKIP_DB_INIT:  # cluster.py initializes the schema once for all workers
+            from models import create_tables, init_default_materials
+            from migrations import run_migrations
+            create_tables()
+            run_migrations()
+            init_default_materials()
+        from material_catalog import material_catalog
+        material_catalog.reload()
+    logger.info(f"Database initialized successfully ({len(material_catalog)} materials cached)")
+
 
 async def main():
     """Main function to start the bot"""
+    startup_report.end("import")
+    metrics_server = None
+    ai_enabled = False
     try:
-        # Initialize database
-        from models import create_tables, init_default_materials
-        create_tables()
-        init_default_materials()
-        logger.info("Database initialized successfully")
+        # Initialize the database while logging in; nothing below login needs it
+        db_init = asyncio.create_task(asyncio.to_thread(init_database))
+        try:
+            with startup_report.phase("login"):
+                await bot.login(DISCORD_TOKEN)
+        finally:
+            with startup_report.phase("db_wait"):
+                await db_init
         
-        # Setup events and commands
-        await setup_events(bot)
-        await setup_commands(bot)
+        with startup_report.phase("services"):
+            # Start write-behind contribution ingestion (replays the journal after a crash)
+            from ingestion import get_contribution_ingestor
+            ingestor = get_contribution_ingestor()
+            if ingestor:
+                await ingestor.start()
+                logger.info("Contribution journal ingestion enabled")
+            
+            # Setup events and commands (the AI service and openai SDK are only imported by /ask)
+            from bot.events import setup_events
+            from bot.commands import setup_commands, AI_ASK_ENABLED
+            await setup_events(bot)
+            await setup_commands(bot)
+            
+            # Seed today's AI quota counters and start batching usage rows
+            ai_enabled = AI_ASK_ENABLED
+            if ai_enabled:
+                from ai_quota import ai_quota
+                await ai_quota.start()
+                from ai_cache import ai_response_cache
+                cached = await ai_response_cache.load()
+                logger.info(f"AI response cache warmed with {cached} answers")
+            
+            # Command timing and attribution (also used by the SQL query stats)
+            from metrics import instrument_bot
+            instrument_bot(bot)
+            
+            # Prometheus metrics and health/readiness probes (METRICS_PORT)
+            from metrics import start_metrics_server
+            metrics_server = await start_metrics_server(bot)
         
-        # Start the bot
+        # Connect to the gateway; on_ready closes this phase and logs the startup report
         logger.info("Starting Discord bot...")
-        await bot.start(DISCORD_TOKEN)
+        startup_report.begin("gateway")
+        await bot.connect()
         
     except discord.LoginFailure:
         logger.error("Invalid Discord token provided!")
@@ -54,6 +132,18 @@ async def main():
     finally:
         if not bot.is_closed():
             await bot.close()
+        if metrics_server:
+            await metrics_server.stop()
+        from ingestion import contribution_ingestor
+        if contribution_ingestor:
+            await contribution_ingestor.stop()
+        if ai_enabled:
+            from ai_quota import ai_quota
+            await ai_quota.stop()
+        from models import async_engine, async_read_engine
+        await async_engine.dispose()
+        if async_read_engine is not async_engine:
+            await async_read_engine.dispose()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,96 @@
+"""
+In-process material catalog.
+
+The materials table is effectively static (seeded by init_default_materials),
+so it is loaded once at startup and served from memory. Every write that goes
+through DatabaseManager/AsyncDatabaseManager (add_material,
+update_material_value) reloads it. Writes made outside the bot (e.g. by hand
+in psql) need a restart or an explicit reload().
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select
+from models import get_db_session, get_async_db_session, Material
+from material_search import MaterialSearchIndex
+
+
+class MaterialCatalog:
+    """name -> material lookups and the display-ordered material list, without DB access"""
+
+    def __init__(self):
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._ordered: List[Dict[str, Any]] = []
+        self.search_index = MaterialSearchIndex([])
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _install(self, materials) -> None:
+        """Swap in a freshly loaded material list (a single assignment per structure, so readers never see a partial catalog)"""
+        ordered = [
+            {"id": m.id, "name": m.name, "display_name": m.display_name, "value": m.value}
+            for m in sorted(materials, key=lambda m: m.display_name)
+        ]
+        self._by_name = {m["name"]: m for m in ordered}
+        self._ordered = ordered
+        self.search_index = MaterialSearchIndex(ordered)
+        self.loaded = True
+        self.reloads += 1
+
+    def reload(self) -> None:
+        """Load the catalog from the database (blocking; startup and sync callers)"""
+        session = get_db_session()
+        try:
+            self._install(session.query(Material).all())
+        finally:
+            session.close()
+
+    async def reload_async(self) -> None:
+        """Load the catalog from the database without blocking the event loop"""
+        async with get_async_db_session() as session:
+            self._install((await session.scalars(select(Material))).all())
+
+    def ensure_loaded(self) -> None:
+        """Load the catalog if it has not been loaded yet"""
+        if self.loaded:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.reload()
+
+    async def ensure_loaded_async(self) -> None:
+        """Async variant of ensure_loaded"""
+        if self.loaded:
+            self.hits += 1
+        else:
+            self.misses += 1
+            await self.reload_async()
+
+    def all(self) -> List[Dict[str, Any]]:
+        """All materials ordered by display name"""
+        return [dict(m) for m in self._ordered]
+
+    def get(self, material_name: str) -> Optional[Dict[str, Any]]:
+        """Material by internal name, or None"""
+        material = self._by_name.get(material_name)
+        return dict(material) if material else None
+
+    def search(self, query: str) -> List[Tuple[str, str]]:
+        """Ranked (display_name, name) autocomplete matches"""
+        return self.search_index.search(query)
+
+    def __len__(self) -> int:
+        return len(self._ordered)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters for observability"""
+        return {"hits": self.hits, "misses": self.misses, "reloads": self.reloads, "size": len(self._ordered)}
+
+
+# Global catalog instance
+material_catalog = MaterialCatalog()
+
+
+def get_material_catalog() -> MaterialCatalog:
+    """Get the process-wide material catalog"""
+    return material_catalog
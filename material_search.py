@@ -0,0 +1,98 @@
+"""
+Precomputed search index for material autocomplete.
+
+Every lookup key a user might type is expanded ahead of time into a flattened
+prefix trie: a dict from each prefix (or substring) to the ranked list of
+matching materials. A keystroke is therefore one dict lookup, with no
+lowercasing or scanning of the catalog on the hot path.
+
+Ranking, best first:
+    0  exact display name / internal name
+    1  prefix of the display name or internal name  ("spice m" -> Spice Melange)
+    2  prefix of a word in the name                  ("mel"     -> Spice Melange)
+    3  prefix of the word acronym                    ("sm"      -> Spice Melange)
+    4  substring anywhere in the name                ("ela"     -> Spice Melange)
+Ties keep catalog (display name) order.
+"""
+import re
+from typing import Any, Dict, List, Tuple
+
+MAX_RESULTS = 25  # Discord autocomplete limit
+
+_CAMEL_BOUNDARY = re.compile(r'(?<=[a-z0-9])(?=[A-Z])')
+_WORD_SPLIT = re.compile(r'[^a-z0-9]+')
+
+
+def _words(material: Dict[str, Any]) -> List[str]:
+    """Lowercase words of the display name plus the camelCase parts of the internal name"""
+    words = [w for w in _WORD_SPLIT.split(material['display_name'].lower()) if w]
+    for part in _CAMEL_BOUNDARY.split(material['name']):
+        part = part.lower()
+        if part and part not in words:
+            words.append(part)
+    return words
+
+
+class MaterialSearchIndex:
+    """Ranked material lookup built once per catalog load"""
+
+    def __init__(self, materials: List[Dict[str, Any]], limit: int = MAX_RESULTS):
+        self.limit = limit
+        self._default: List[Tuple[str, str]] = [(m['display_name'], m['name']) for m in materials[:limit]]
+        self._words: List[List[str]] = []
+        best: Dict[str, Dict[int, int]] = {}
+
+        def add(key: str, position: int, score: int) -> None:
+            ranks = best.setdefault(key, {})
+            if score < ranks.get(position, 99):
+                ranks[position] = score
+
+        for position, material in enumerate(materials):
+            display = material['display_name'].lower()
+            name = material['name'].lower()
+            words = _words(material)
+            self._words.append(words)
+            acronym = ''.join(w[0] for w in _WORD_SPLIT.split(display) if w)
+
+            for full in (display, name):
+                add(full, position, 0)
+                for end in range(1, len(full)):
+                    add(full[:end], position, 1)
+                for start in range(1, len(full)):
+                    for end in range(start + 1, len(full) + 1):
+                        add(full[start:end], position, 4)
+            for word in words:
+                for end in range(1, len(word) + 1):
+                    add(word[:end], position, 2)
+            if len(acronym) > 1:
+                for end in range(2, len(acronym) + 1):
+                    add(acronym[:end], position, 3)
+
+        self._materials = [(m['display_name'], m['name']) for m in materials]
+        self._table: Dict[str, List[Tuple[str, str]]] = {
+            key: [self._materials[p] for p, _ in sorted(ranks.items(), key=lambda item: (item[1], item[0]))][:limit]
+            for key, ranks in best.items()
+        }
+
+    def search(self, query: str) -> List[Tuple[str, str]]:
+        """Ranked (display_name, name) matches for the text typed so far.
+
+        An empty query, or one that matches nothing, returns the first materials
+        in display order so the dropdown is never empty.
+        """
+        key = query.strip().lower()
+        if not key:
+            return self._default
+        hit = self._table.get(key)
+        if hit is not None:
+            return hit
+        if ' ' in key:
+            # "sp mel": every typed word must prefix some word of the material
+            parts = key.split()
+            matches = [
+                self._materials[position] for position, words in enumerate(self._words)
+                if all(any(w.startswith(p) for w in words) for p in parts)
+            ]
+            if matches:
+                return matches[:self.limit]
+        return self._default
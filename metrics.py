@@ -0,0 +1,413 @@
+"""
+Built-in metrics in the Prometheus text format, plus health probes.
+
+start_metrics_server() serves, on METRICS_HOST:METRICS_PORT (PORT on Railway,
+8080 otherwise):
+
+    /metrics  Prometheus text exposition of everything below
+    /healthz  liveness: 200 while the event loop is serving requests
+    /readyz   readiness: 200 once the bot is connected to the gateway and the
+              database answers SELECT 1, 503 with the reason otherwise
+
+Exported series:
+
+- discord_command_duration_seconds{command}  histogram per slash command
+                                             (prefix commands as !name)
+- discord_command_errors_total{command}      exceptions escaping a handler and
+                                             errors the handler logged itself
+- db_pool_*{engine}                           size, checked out, overflow and
+                                             checkout wait of models.engine,
+                                             models.async_engine and the read
+                                             replica engines
+- ai_request_duration_seconds{outcome}       /ask latency by completion/cache/
+                                             coalesced/limited/error
+- ai_output_tokens_total                     completion tokens used
+- discord_gateway_latency_seconds{shard}     heartbeat latency per shard
+- event_loop_lag_seconds                     histogram of 0.5 s ticker lateness
+- startup_phase_seconds{phase}               import/db_init/login/services/gateway
+
+No client library is needed: the few metric types used here are implemented
+below and the HTTP server is aiohttp, which discord.py already depends on.
+"""
+import asyncio
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+METRICS_PORT = int(os.getenv('METRICS_PORT', os.getenv('PORT', '8080')))
+READINESS_DB_TIMEOUT = 2.0
+LOOP_LAG_INTERVAL = 0.5
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Slash (name) or prefix (!name) command currently being handled, for attributing
+# errors logged and SQL statements executed inside handlers (see query_stats)
+current_command: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('current_command', default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """Base for labelled metrics; children are created on first use of a label combination"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def _child(self, values: Tuple[str, ...]):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._child(key))
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def render(self, name, labelnames, key) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _child(self, values):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def render(self, name, labelnames, key) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, [('le', str(bound))])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labelnames, key, [('le', '+Inf')])} {self.count}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {self.count}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self, values):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+class GaugeCallback:
+    """Gauge whose samples are read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            for values, value in self.collect():
+                lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}")
+        except Exception as e:
+            logger.warning(f"Metric {self.name} could not be collected: {e}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[object] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+command_duration = registry.register(Histogram(
+    "discord_command_duration_seconds", "Slash command handler latency", ["command"]))
+command_errors = registry.register(Counter(
+    "discord_command_errors_total", "Slash command errors (raised or logged by the handler)", ["command"]))
+ai_request_duration = registry.register(Histogram(
+    "ai_request_duration_seconds", "/ask latency by how the answer was produced", ["outcome"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)))
+ai_output_tokens = registry.register(Counter(
+    "ai_output_tokens_total", "Completion tokens used by /ask"))
+event_loop_lag = registry.register(Histogram(
+    "event_loop_lag_seconds", "How late a periodic event loop ticker woke up",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)))
+pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection", ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)))
+pool_checkouts = registry.register(Counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool", ["engine"]))
+
+_engines: Dict[str, object] = {}
+_bot = None
+
+
+def _pool_samples(read: Callable[[object], float]):
+    for label, engine in _engines.items():
+        yield (label,), read(engine.pool)
+
+
+registry.register(GaugeCallback("db_pool_size", "Configured pool size", ["engine"],
+                                lambda: _pool_samples(lambda pool: pool.size())))
+registry.register(GaugeCallback("db_pool_checked_out", "Connections currently checked out", ["engine"],
+                                lambda: _pool_samples(lambda pool: pool.checkedout())))
+registry.register(GaugeCallback("db_pool_overflow", "Connections open beyond the pool size", ["engine"],
+                                lambda: _pool_samples(lambda pool: max(pool.overflow(), 0))))
+
+
+def _gateway_latency_samples():
+    # AutoShardedBot reports one latency per shard this process runs
+    latencies = getattr(_bot, "latencies", None) if _bot else None
+    if latencies is None:
+        latencies = [(getattr(_bot, "shard_id", None) or 0, _bot.latency)] if _bot else []
+    for shard_id, latency in latencies:
+        if math.isfinite(latency):
+            yield (str(shard_id),), latency
+
+
+def _startup_samples():
+    from startup import startup_report
+    for phase, seconds in startup_report.phases.items():
+        yield (phase,), seconds
+    if startup_report.total is not None:
+        yield ("total",), startup_report.total
+
+
+registry.register(GaugeCallback("startup_phase_seconds", "Duration of each startup phase (see startup.py)",
+                                ["phase"], _startup_samples))
+registry.register(GaugeCallback("discord_gateway_latency_seconds", "Heartbeat latency to the Discord gateway",
+                                ["shard"], _gateway_latency_samples))
+
+
+def instrument_engine(label: str, engine) -> None:
+    """Export pool gauges for an engine and time how long checkouts wait for a connection"""
+    from sqlalchemy import event
+    _engines[label] = engine
+    pool = engine.pool
+    checkouts = pool_checkouts.labels(label)
+    event.listen(pool, "checkout", lambda *args: checkouts.inc())
+
+    # QueuePool._do_get is where a checkout blocks when the pool is exhausted
+    if hasattr(pool, "_do_get"):
+        do_get = pool._do_get
+        wait = pool_checkout_wait.labels(label)
+
+        def timed_do_get():
+            start = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                wait.observe(time.perf_counter() - start)
+
+        pool._do_get = timed_do_get
+
+
+def instrument_bot(bot) -> None:
+    """
+    Time every registered slash and prefix command, count their errors and set
+    current_command while they run. Call once after setup_commands(); works with
+    METRICS_ENABLED=false too, so query_stats still knows the command.
+    """
+    for command in bot.tree.get_commands():
+        if not hasattr(command, "_callback"):
+            continue
+        command._callback = _timed_callback(command.name, command._callback)
+
+    @bot.before_invoke
+    async def _prefix_command_started(ctx):
+        name = f"!{ctx.command.qualified_name}"
+        ctx.metrics_started = (current_command.set(name), time.perf_counter())
+
+    @bot.after_invoke
+    async def _prefix_command_finished(ctx):
+        started = getattr(ctx, "metrics_started", None)
+        if started is None:
+            return
+        token, start = started
+        name = current_command.get()
+        command_duration.labels(name).observe(time.perf_counter() - start)
+        if ctx.command_failed:
+            command_errors.labels(name).inc()
+        current_command.reset(token)
+
+
+def _timed_callback(name: str, callback):
+    duration = command_duration.labels(name)
+    errors = command_errors.labels(name)
+
+    async def timed(*args, **kwargs):
+        token = current_command.set(name)
+        start = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - start)
+            current_command.reset(token)
+
+    timed.__name__ = getattr(callback, "__name__", name)
+    timed.__doc__ = callback.__doc__
+    return timed
+
+
+class CommandErrorLogHandler(logging.Handler):
+    """Counts ERROR records logged while a command runs (handlers log and swallow their own exceptions)"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        command = current_command.get()
+        if command is not None:
+            command_errors.labels(command).inc()
+
+
+async def _measure_loop_lag() -> None:
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        event_loop_lag.observe(max(0.0, time.perf_counter() - start - LOOP_LAG_INTERVAL))
+
+
+async def _metrics(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+
+async def _healthz(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+async def _readyz(request: web.Request) -> web.Response:
+    problems = []
+    if _bot is None or not _bot.is_ready():
+        problems.append("not connected to the Discord gateway")
+    from models import async_engine
+    try:
+        async with asyncio.timeout(READINESS_DB_TIMEOUT):
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        problems.append(f"database unavailable: {type(e).__name__}")
+    if problems:
+        return web.json_response({"status": "unavailable", "problems": problems}, status=503)
+    return web.json_response({"status": "ready"})
+
+
+class MetricsServer:
+    def __init__(self, runner: web.AppRunner, lag_task: asyncio.Task):
+        self._runner = runner
+        self._lag_task = lag_task
+
+    async def stop(self) -> None:
+        self._lag_task.cancel()
+        await self._runner.cleanup()
+
+
+async def start_metrics_server(bot=None, host: str = METRICS_HOST, port: int = METRICS_PORT) -> Optional[MetricsServer]:
+    """Instrument the engines and serve /metrics, /healthz and /readyz (bot is used for readiness and latency)"""
+    global _bot
+    if not METRICS_ENABLED:
+        return None
+    from models import engine, async_engine, read_engine, async_read_engine
+    _bot = bot
+    if "sync" not in _engines:
+        instrument_engine("sync", engine)
+        instrument_engine("async", async_engine.sync_engine)
+        if read_engine is not engine:
+            instrument_engine("read", read_engine)
+            instrument_engine("async_read", async_read_engine.sync_engine)
+        logging.getLogger("bot").addHandler(CommandErrorLogHandler())
+
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics)
+    app.router.add_get("/healthz", _healthz)
+    app.router.add_get("/readyz", _readyz)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics and health probes on http://{host}:{port}/metrics")
+    return MetricsServer(runner, asyncio.create_task(_measure_loop_lag()))
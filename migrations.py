@@ -0,0 +1,245 @@
+"""
+Online schema migrations.
+
+Base.metadata.create_all() only creates missing tables, so new nullable
+columns and indexes on existing tables are added here. On PostgreSQL every index is created with
+CREATE INDEX CONCURRENTLY, which does not take a write lock on the table and
+can run against a live bot. Run it standalone with `python migrations.py`;
+main.py also runs it at startup, where it is a no-op once the indexes exist.
+
+`python migrations.py --rebuild-points` recomputes the member points rollup
+from the raw contributions. Stored values are converted to the current
+CONTRIBUTION_STORAGE layout on the first start after the mode changes; the
+last converted mode is recorded in app_state so later starts skip the scan.
+`python migrations.py --convert-storage` forces a conversion.
+"""
+import logging
+from datetime import datetime
+from typing import List
+from sqlalchemy import BigInteger, case, cast, func, inspect, select, text, update
+from sqlalchemy.schema import CreateIndex
+from models import (
+    engine, Base, AppState, Contribution, MemberPoints, MemberMaterialTotal, CONTRIBUTION_STORAGE, BIGINT_MAX
+)
+
+logger = logging.getLogger(__name__)
+
+
+# pg_advisory_lock key that serializes create_indexes across bot processes
+INDEX_MIGRATION_LOCK = 7_210_530_001
+# app_state row holding the CONTRIBUTION_STORAGE mode the stored values were last converted to
+STORAGE_STATE = "contribution_storage"
+
+
+def _invalid_postgres_index(conn, index_name: str) -> bool:
+    """A failed concurrent build leaves an INVALID index behind that IF NOT EXISTS would skip.
+
+    An index that another session is still building CONCURRENTLY is INVALID too, so only
+    indexes with no CREATE INDEX in progress count as left over.
+    """
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+        "WHERE c.relname = :name AND NOT i.indisvalid AND NOT EXISTS ("
+        "SELECT 1 FROM pg_stat_progress_create_index p WHERE p.index_relid = c.oid)"
+    ), {"name": index_name}).scalar())
+
+
+def create_indexes(target_engine=engine) -> int:
+    """Create every index declared on the models that does not exist yet.
+
+    Returns the number of CREATE INDEX statements issued.
+    """
+    is_postgres = target_engine.dialect.name == 'postgresql'
+    created = 0
+
+    # CONCURRENTLY cannot run inside a transaction block
+    with target_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if is_postgres:
+            # Workers starting together wait here, then find the indexes already built
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": INDEX_MIGRATION_LOCK})
+        try:
+            for table in Base.metadata.sorted_tables:
+                for index in sorted(table.indexes, key=lambda i: i.name):
+                    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=target_engine.dialect))
+                    if is_postgres:
+                        if _invalid_postgres_index(conn, index.name):
+                            logger.warning(f"Dropping invalid index {index.name} left by an interrupted build")
+                            conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+                        ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+
+                    conn.execute(text(ddl))
+                    created += 1
+        finally:
+            if is_postgres:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": INDEX_MIGRATION_LOCK})
+
+    return created
+
+
+def add_missing_columns(target_engine=engine) -> List[str]:
+    """ALTER TABLE ... ADD COLUMN for nullable model columns missing from existing tables.
+
+    Adding a nullable column without a default is a catalog-only change on both
+    PostgreSQL and SQLite, so it does not rewrite or lock the table for long.
+    Returns the added "table.column" names.
+    """
+    added = []
+    existing_tables = set(inspect(target_engine).get_table_names())
+    with target_engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                if not column.nullable:
+                    logger.error(f"Cannot add NOT NULL column {table.name}.{column.name} online; migrate it by hand")
+                    continue
+                column_type = column.type.compile(dialect=target_engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.append(f"{table.name}.{column.name}")
+    for name in added:
+        logger.info(f"Added column {name}")
+    return added
+
+
+# (BIGINT column, Numeric column) pairs holding one value between them in fixed storage mode
+_STORAGE_PAIRS = [
+    (MemberPoints, "points_fixed", "total_points"),
+    (MemberPoints, "amount_fixed", "total_amount"),
+    (MemberMaterialTotal, "points_fixed", "points"),
+    (MemberMaterialTotal, "amount_fixed", "amount"),
+]
+
+
+def convert_storage(target_engine=engine, batch_size: int = 10_000) -> int:
+    """Move stored values into the layout of the current CONTRIBUTION_STORAGE mode.
+
+    Fixed mode keeps each value that fits in its BIGINT column and 0 in the Numeric column;
+    numeric mode keeps everything in the Numeric column (see models.CONTRIBUTION_STORAGE).
+    Contributions are converted through id ranges in short transactions so a live bot is
+    never blocked for long; the rollup tables are converted in one transaction each.
+    Also converts contributions written by the earlier fixed layout, which kept the amount
+    in both columns. Returns the number of contribution rows updated.
+    """
+    fixed = CONTRIBUTION_STORAGE == 'fixed'
+    if fixed:
+        pending = (Contribution.amount != 0) & (
+            Contribution.amount_fixed.is_not(None) | (Contribution.amount <= BIGINT_MAX)
+        )
+        values = {
+            "amount_fixed": func.coalesce(Contribution.amount_fixed, cast(Contribution.amount, BigInteger)),
+            "amount": 0
+        }
+    else:
+        pending = Contribution.amount_fixed.is_not(None)
+        # The earlier fixed layout left the amount in both columns, the current one leaves 0 in amount
+        values = {
+            "amount": case((Contribution.amount == 0, Contribution.amount_fixed), else_=Contribution.amount),
+            "amount_fixed": None
+        }
+
+    with target_engine.connect() as conn:
+        low, high = conn.execute(select(func.min(Contribution.id), func.max(Contribution.id)).where(pending)).one()
+
+    updated = 0
+    if low is not None:
+        for start in range(low, high + 1, batch_size):
+            with target_engine.begin() as conn:
+                result = conn.execute(
+                    update(Contribution).where(
+                        Contribution.id >= start,
+                        Contribution.id < start + batch_size,
+                        pending
+                    ).values(**values)
+                )
+                updated += result.rowcount
+
+    with target_engine.begin() as conn:
+        for model, fixed_name, numeric_name in _STORAGE_PAIRS:
+            fixed_column, numeric_column = getattr(model, fixed_name), getattr(model, numeric_name)
+            if fixed:
+                stmt = update(model).where(fixed_column.is_(None), numeric_column <= BIGINT_MAX).values(
+                    {fixed_name: cast(numeric_column, BigInteger), numeric_name: 0}
+                )
+            else:
+                stmt = update(model).where(fixed_column.is_not(None)).values(
+                    {numeric_name: numeric_column + fixed_column, fixed_name: None}
+                )
+            conn.execute(stmt)
+
+    _set_state(target_engine, STORAGE_STATE, CONTRIBUTION_STORAGE)
+    if updated:
+        logger.info(f"Converted {updated} contributions to {CONTRIBUTION_STORAGE} storage")
+    return updated
+
+
+def _get_state(target_engine, name: str):
+    with target_engine.connect() as conn:
+        return conn.execute(select(AppState.value).where(AppState.name == name)).scalar()
+
+
+def _set_state(target_engine, name: str, value: str) -> None:
+    from database import dialect_insert
+
+    stmt = dialect_insert(target_engine.dialect.name)(AppState).values(
+        name=name, value=value, updated_at=datetime.utcnow()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AppState.name], set_={"value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at}
+    )
+    with target_engine.begin() as conn:
+        conn.execute(stmt)
+
+
+def convert_storage_if_changed(target_engine=engine) -> bool:
+    """Run convert_storage() only if the stored values were last converted to another mode.
+
+    A database with no record yet is converted once, since it may hold rows from either
+    layout. Returns True if a conversion ran.
+    """
+    if _get_state(target_engine, STORAGE_STATE) == CONTRIBUTION_STORAGE:
+        return False
+    convert_storage(target_engine)
+    return True
+
+
+def backfill_member_points(target_engine=engine) -> bool:
+    """Populate the points rollup tables on the first start after they were introduced.
+
+    Returns True if a backfill ran.
+    """
+    from database import DatabaseManager
+
+    with target_engine.connect() as conn:
+        has_rollup = conn.execute(text("SELECT 1 FROM member_points LIMIT 1")).first() is not None
+        has_contributions = conn.execute(text("SELECT 1 FROM contributions LIMIT 1")).first() is not None
+    if has_rollup or not has_contributions:
+        return False
+
+    logger.info("Backfilling member_points rollup from contributions")
+    DatabaseManager.rebuild_member_points()
+    return True
+
+
+def run_migrations(target_engine=engine) -> None:
+    """Apply all online migrations"""
+    add_missing_columns(target_engine)
+    count = create_indexes(target_engine)
+    logger.info(f"Index migration checked {count} indexes")
+    backfill_member_points(target_engine)
+    convert_storage_if_changed(target_engine)
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    if "--rebuild-points" in sys.argv:
+        from database import DatabaseManager
+        DatabaseManager.rebuild_member_points()
+        logger.info("Rebuilt member_points rollup")
+    elif "--convert-storage" in sys.argv:
+        convert_storage()
+    else:
+        run_migrations()
@@ -1,6 +1,7 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, BigInteger, DateTime, ForeignKey, Numeric
+from sqlalchemy import create_engine, Column, Integer, String, BigInteger, DateTime, ForeignKey, Numeric, Index, Text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 
@@ -9,21 +10,102 @@ DATABASE_URL = os.getenv('DATABASE_URL')
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is required")
 
-# Configure SSL for PostgreSQL connection
-engine_config = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
 
-# Add SSL configuration for PostgreSQL
-if DATABASE_URL.startswith('postgresql://'):
-    engine_config["connect_args"] = {"sslmode": "require"}
-
-engine = create_engine(DATABASE_URL, **engine_config)
+def pool_limits(connections: int) -> dict:
+    """pool_size/max_overflow for an engine that may hold at most `connections` connections"""
+    connections = max(1, connections)
+    pool_size = max(1, connections // 2)
+    return {"pool_size": pool_size, "max_overflow": connections - pool_size}
+
+
+# Optional cap on the connections this process may open across both engines. The cluster
+# launcher divides one host-wide DB_POOL_BUDGET between its worker processes. The sync
+# engine only serves startup and background work, so the async engine gets the rest.
+DB_POOL_BUDGET = int(os.getenv('DB_POOL_BUDGET', '0'))
+SYNC_POOL_CONNECTIONS = max(1, DB_POOL_BUDGET // 4)
+ASYNC_POOL_CONNECTIONS = max(1, DB_POOL_BUDGET - SYNC_POOL_CONNECTIONS)
+
+
+def get_engine_config(url: str) -> dict:
+    """create_engine() options for a sync database URL"""
+    config = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    # Add SSL configuration for PostgreSQL
+    if url.startswith('postgresql://'):
+        config["connect_args"] = {"sslmode": "require"}
+    if DB_POOL_BUDGET:
+        config.update(pool_limits(SYNC_POOL_CONNECTIONS))
+    return config
+
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver (asyncpg / aiosqlite)"""
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    if url.startswith('postgresql://') or url.startswith('postgresql+psycopg2://'):
+        return 'postgresql+asyncpg://' + url.split('://', 1)[1]
+    if url.startswith('sqlite://'):
+        return 'sqlite+aiosqlite://' + url.split('://', 1)[1]
+    return url
+
+
+def get_async_engine_config(async_url: str) -> dict:
+    """create_async_engine() options for an asyncio database URL"""
+    config = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    # asyncpg takes "ssl" instead of libpq's "sslmode"
+    if async_url.startswith('postgresql+asyncpg://'):
+        config["connect_args"] = {"ssl": "require"}
+    elif async_url.startswith('sqlite+aiosqlite://'):
+        # Concurrent command coroutines contend for SQLite's single writer lock; wait instead of failing fast
+        config["connect_args"] = {"timeout": 30}
+    if DB_POOL_BUDGET:
+        config.update(pool_limits(ASYNC_POOL_CONNECTIONS))
+    return config
+
+
+engine = create_engine(DATABASE_URL, **get_engine_config(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the bot's command handlers so queries never block the event loop
+ASYNC_DATABASE_URL = get_async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **get_async_engine_config(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Optional read replica with its own engines and pools (same DB_POOL_BUDGET share as the
+# primary). Read-only DatabaseManager/AsyncDatabaseManager queries go through
+# read_routing.read_your_writes.session() / async_session(), which fall back to the
+# primary for guilds and members written to in the last few seconds.
+# Without READ_DATABASE_URL the read engines are the primary ones.
+READ_DATABASE_URL = os.getenv('READ_DATABASE_URL')
+if READ_DATABASE_URL:
+    read_engine = create_engine(READ_DATABASE_URL, **get_engine_config(READ_DATABASE_URL))
+    ASYNC_READ_DATABASE_URL = get_async_database_url(READ_DATABASE_URL)
+    async_read_engine = create_async_engine(ASYNC_READ_DATABASE_URL, **get_async_engine_config(ASYNC_READ_DATABASE_URL))
+else:
+    read_engine = engine
+    async_read_engine = async_engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+# Contribution storage mode. "numeric" keeps amounts and point totals in the arbitrary-precision
+# Numeric columns. "fixed" keeps them in BIGINT columns (points as integer centipoints) for
+# contributions and for the member_points / member_material_totals rollups, so that writes,
+# sums and the leaderboard sort are integer-only. A value too large for BIGINT (an overflow
+# row) leaves its BIGINT column NULL and is stored in the Numeric column instead; otherwise
+# the Numeric column holds 0. Either way the value is COALESCE(fixed, 0) + numeric, and
+# migrations.convert_storage() moves existing rows over on the first start after the mode changes
+# (the last converted mode is kept in the app_state table).
+# SQLite stores Numeric values beyond 64 bits as REAL, so there only BIGINT-sized values are exact.
+CONTRIBUTION_STORAGE = os.getenv('CONTRIBUTION_STORAGE', 'numeric')
+BIGINT_MAX = 2**63 - 1
+
 
 class Guild(Base):
     """Guild/Server model"""
@@ -72,7 +154,8 @@ class Contribution(Base):
     guild_id = Column(BigInteger, ForeignKey("guilds.id"), nullable=False)
     member_id = Column(BigInteger, ForeignKey("members.id"), nullable=False)
     material_id = Column(Integer, ForeignKey("materials.id"), nullable=False)
-    amount = Column(Numeric, nullable=False)
+    amount = Column(Numeric, nullable=False)  # 0 when amount_fixed holds the amount
+    amount_fixed = Column(BigInteger)  # amount as BIGINT (fixed storage mode, NULL for overflow rows)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -80,6 +163,69 @@ class Contribution(Base):
     member = relationship("Member", back_populates="contributions")
     material = relationship("Material", back_populates="contributions")
 
+    __table_args__ = (
+        # Serves the (guild_id, member_id) filters of get_member_points / get_member_contributions_with_points
+        # and, through its guild_id prefix, the per-guild group-by of get_top_contributors_by_points.
+        # INCLUDE (amount) lets Postgres answer the point sums with an index-only scan.
+        Index('ix_contributions_guild_member_material', 'guild_id', 'member_id', 'material_id',
+              postgresql_include=['amount']),
+        # Keyset pagination of a member's history (ORDER BY id DESC)
+        Index('ix_contributions_guild_member_id', 'guild_id', 'member_id', 'id'),
+        # Guild exports in time order, optionally limited to a date range (see contribution_export_query)
+        Index('ix_contributions_guild_created', 'guild_id', 'created_at', 'id'),
+    )
+
+
+class MemberPoints(Base):
+    """Per-member contribution totals, maintained alongside every contribution insert"""
+    __tablename__ = "member_points"
+
+    guild_id = Column(BigInteger, ForeignKey("guilds.id"), primary_key=True)
+    member_id = Column(BigInteger, ForeignKey("members.id"), primary_key=True)
+    total_points = Column(Numeric, nullable=False, default=0)  # Sum of amount * material value (divide by 100)
+    total_amount = Column(Numeric, nullable=False, default=0)
+    points_fixed = Column(BigInteger)  # total_points as BIGINT (fixed storage mode, NULL on overflow)
+    amount_fixed = Column(BigInteger)  # total_amount as BIGINT (fixed storage mode, NULL on overflow)
+    contribution_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Leaderboard: top N members of a guild by points
+        Index('ix_member_points_guild_points', 'guild_id', 'total_points'),
+        Index('ix_member_points_guild_points_fixed', 'guild_id', 'points_fixed'),
+    )
+
+
+class MemberMaterialTotal(Base):
+    """Per-member, per-material contribution totals, maintained alongside every contribution insert"""
+    __tablename__ = "member_material_totals"
+
+    guild_id = Column(BigInteger, ForeignKey("guilds.id"), primary_key=True)
+    member_id = Column(BigInteger, ForeignKey("members.id"), primary_key=True)
+    material_id = Column(Integer, ForeignKey("materials.id"), primary_key=True)
+    amount = Column(Numeric, nullable=False, default=0)
+    points = Column(Numeric, nullable=False, default=0)  # Sum of amount * material value (divide by 100)
+    amount_fixed = Column(BigInteger)  # amount as BIGINT (fixed storage mode, NULL on overflow)
+    points_fixed = Column(BigInteger)  # points as BIGINT (fixed storage mode, NULL on overflow)
+    contribution_count = Column(Integer, nullable=False, default=0)
+
+
+class IngestCheckpoint(Base):
+    """Highest journal sequence number flushed to the database by the write-behind ingestor"""
+    __tablename__ = "ingest_checkpoints"
+
+    name = Column(String, primary_key=True)
+    last_sequence = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AppState(Base):
+    """Named values shared by every bot process, e.g. the storage mode the data was last converted to"""
+    __tablename__ = "app_state"
+
+    name = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 
 class AIUsage(Base):
     """AI usage tracking for cost control"""
@@ -94,6 +240,28 @@ class AIUsage(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     date_only = Column(String, nullable=False)  # YYYY-MM-DD for daily tracking
 
+    __table_args__ = (
+        # Daily quota checks in AIService.check_usage_limits
+        Index('ix_ai_usage_user_date', 'user_id', 'date_only'),
+        Index('ix_ai_usage_guild_date', 'guild_id', 'date_only'),
+    )
+
+
+class AIResponseCacheEntry(Base):
+    """Persisted /ask answers keyed by a hash of model, system prompt and normalized question"""
+    __tablename__ = "ai_response_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 hex digest
+    model_used = Column(String, nullable=False)
+    answer = Column(Text, nullable=False)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Startup warm-up of the most recent entries and TTL expiry
+        Index('ix_ai_response_cache_created', 'created_at'),
+    )
+
 
 # Create all tables
 def create_tables():
@@ -111,6 +279,21 @@ def get_db_session():
         raise
 
 
+def get_async_db_session():
+    """Get async database session (use as `async with get_async_db_session() as session`)"""
+    return AsyncSessionLocal()
+
+
+def get_read_db_session():
+    """Get a database session on the read replica (the primary when READ_DATABASE_URL is unset)"""
+    return ReadSessionLocal()
+
+
+def get_async_read_db_session():
+    """Get an async database session on the read replica (the primary when READ_DATABASE_URL is unset)"""
+    return AsyncReadSessionLocal()
+
+
 # Initialize default materials
 def init_default_materials():
     """Initialize default materials in the database"""
@@ -0,0 +1,193 @@
+"""
+Per-statement SQL timing with slash/prefix command attribution and a slow-query log.
+
+install() hooks before/after_cursor_execute on an engine. Every statement
+is timed and aggregated by (command, statement). The command comes from
+metrics.current_command, which is set while a slash or prefix command runs;
+"-" means background work such as startup, ingestion flushes or quota flushes.
+Statements slower than SLOW_QUERY_MS are:
+
+- appended as JSON lines to SLOW_QUERY_LOG (empty to only log them)
+- logged as warnings on the "slow_queries" logger
+- with SLOW_QUERY_EXPLAIN=true on PostgreSQL, re-run once per statement every
+  EXPLAIN_COOLDOWN seconds under EXPLAIN (ANALYZE, BUFFERS) (SELECTs only,
+  since ANALYZE executes the statement again) and logged with the plan
+
+/query_stats shows the top statements by total time from top().
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from metrics import current_command, registry, Counter
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger("slow_queries")
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'slow_queries.log')
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'false').lower() == 'true'
+EXPLAIN_COOLDOWN = 300.0
+MAX_STATEMENTS = 1000  # distinct (command, statement) pairs kept in memory
+MAX_LOGGED_PARAMETERS = 1000  # characters of repr(parameters) written per slow query
+
+_START_TIMES = "query_stats_start_times"
+_WHITESPACE = re.compile(r"\s+")
+# Expanded IN lists: (?, ?, ?) / ($1, $2) / (%(p_1)s, %(p_2)s)
+_IN_LIST = re.compile(r"\((?:\?|\$\d+|%\(\w+\)s)(?:\s*,\s*(?:\?|\$\d+|%\(\w+\)s))+\)")
+
+slow_queries_total = registry.register(Counter(
+    "db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ["command"]))
+
+
+def normalize_statement(statement: str) -> str:
+    """One line, IN lists collapsed, so the same statement always aggregates under one key"""
+    return _IN_LIST.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+@dataclass
+class StatementStats:
+    command: str
+    statement: str
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    slow: int = 0
+
+
+class QueryStats:
+    """Aggregated statement timings plus the most recent slow queries"""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, log_path: str = SLOW_QUERY_LOG,
+                 explain: bool = SLOW_QUERY_EXPLAIN):
+        self.threshold_ms = threshold_ms
+        self.log_path = log_path
+        self.explain = explain
+        self.since = datetime.utcnow()
+        self.recent_slow: Deque[Dict[str, Any]] = deque(maxlen=50)
+        self._stats: Dict[Tuple[str, str], StatementStats] = {}
+        self._explained: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._engines = set()
+        self._file_logger: Optional[logging.Logger] = None
+
+    def install(self, engine) -> None:
+        """Time every statement executed through a (sync) engine; use async_engine.sync_engine for async"""
+        if id(engine) in self._engines:
+            return
+        self._engines.add(id(engine))
+        if self.log_path and self._file_logger is None:
+            handler = logging.FileHandler(self.log_path, encoding="utf-8", delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._file_logger = logging.getLogger("slow_queries.file")
+            self._file_logger.propagate = False
+            self._file_logger.addHandler(handler)
+            self._file_logger.setLevel(logging.INFO)
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._failed)
+
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_START_TIMES, []).append(time.perf_counter())
+
+    @staticmethod
+    def _failed(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get(_START_TIMES):
+            conn.info[_START_TIMES].pop()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get(_START_TIMES)
+        if not started:
+            return
+        elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+        command = current_command.get() or "-"
+        key = (command, normalize_statement(statement))
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= MAX_STATEMENTS:
+                    key = (command, "(other statements)")
+                    stats = self._stats.setdefault(key, StatementStats(*key))
+                else:
+                    stats = self._stats[key] = StatementStats(*key)
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            if elapsed_ms >= self.threshold_ms:
+                stats.slow += 1
+
+        if elapsed_ms >= self.threshold_ms:
+            self._log_slow(conn, command, key[1], statement, parameters, executemany, elapsed_ms)
+
+    def _log_slow(self, conn, command: str, normalized: str, statement: str, parameters,
+                  executemany: bool, elapsed_ms: float) -> None:
+        entry = {
+            "ts": datetime.utcnow().isoformat(timespec="milliseconds"),
+            "command": command,
+            "ms": round(elapsed_ms, 2),
+            "statement": normalized,
+            "parameters": repr(parameters)[:MAX_LOGGED_PARAMETERS],
+            "executemany": executemany,
+        }
+        plan = self._explain(conn, normalized, statement, parameters, executemany)
+        if plan:
+            entry["plan"] = plan
+        slow_queries_total.labels(command).inc()
+        self.recent_slow.append(entry)
+        slow_logger.warning(f"Slow query ({elapsed_ms:.0f} ms, {command}): {normalized[:300]}")
+        if self._file_logger:
+            self._file_logger.info(json.dumps(entry))
+
+    def _explain(self, conn, normalized: str, statement: str, parameters, executemany: bool) -> Optional[str]:
+        if (not self.explain or executemany or conn.dialect.name != "postgresql"
+                or not normalized.lower().startswith(("select", "with"))):
+            return None
+        now = time.monotonic()
+        if now - self._explained.get(normalized, float("-inf")) < EXPLAIN_COOLDOWN:
+            return None
+        self._explained[normalized] = now
+        try:
+            # A fresh DBAPI cursor on the same connection, so these hooks do not time the EXPLAIN itself
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                return "\n".join(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.warning(f"EXPLAIN ANALYZE of slow query failed: {e}")
+            return None
+
+    def top(self, limit: int = 10) -> List[StatementStats]:
+        """Statements with the highest total time, with their command"""
+        with self._lock:
+            return sorted(self._stats.values(), key=lambda s: s.total_ms, reverse=True)[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self.recent_slow.clear()
+            self.since = datetime.utcnow()
+
+
+# Global query stats instance
+query_stats = QueryStats()
+
+
+def install_query_stats() -> QueryStats:
+    """Time statements on models.engine and models.async_engine (and the read replica engines)"""
+    from models import engine, async_engine, read_engine, async_read_engine
+    for target in (engine, async_engine.sync_engine, read_engine, async_read_engine.sync_engine):
+        query_stats.install(target)
+    return query_stats
@@ -0,0 +1,102 @@
+"""
+Read-replica routing with read-your-writes.
+
+With READ_DATABASE_URL set, read-only DatabaseManager queries run on the
+replica engines from models.py. A replica lags the primary, though, so a
+member who just contributed could see a leaderboard or history without their
+contribution (and a leaderboard rebuilt from the replica right after an
+invalidation would be cached stale for LEADERBOARD_CACHE_TTL). Every write in
+this process is therefore noted per guild and per (guild, member), and for
+READ_YOUR_WRITES_WINDOW seconds afterwards reads of that guild or member go
+to the primary:
+
+- member-scoped reads (history, summaries, points) check the member
+- guild-scoped reads (leaderboard, guild summary) check the guild
+- writes that touch every guild (material revaluation, full rebuild)
+  send all reads to the primary for the window
+
+Set the window a little above the replica's usual lag. Writes are tracked
+per process; with cluster.py a guild is always served by the same worker.
+"""
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from models import READ_DATABASE_URL, get_db_session, get_async_db_session, get_read_db_session, get_async_read_db_session
+
+READ_YOUR_WRITES_WINDOW = float(os.getenv('READ_YOUR_WRITES_WINDOW', '5.0'))
+PRUNE_THRESHOLD = 10_000
+
+
+class ReadYourWrites:
+    """Remembers recent writes so reads that must see them skip the replica"""
+
+    def __init__(self, window: float = READ_YOUR_WRITES_WINDOW, replica: bool = bool(READ_DATABASE_URL)):
+        self.window = window
+        self.replica = replica
+        self._guilds: Dict[int, float] = {}
+        self._members: Dict[Tuple[int, int], float] = {}
+        self._everything = float("-inf")
+        self.primary_reads = 0
+        self.replica_reads = 0
+
+    def note_write(self, guild_id: Optional[int] = None, member_id: Optional[int] = None) -> None:
+        """Record a committed write to a guild (and member), or to every guild when guild_id is None"""
+        if not self.replica:
+            return
+        now = time.monotonic()
+        if guild_id is None:
+            self._everything = now
+            return
+        self._guilds[guild_id] = now
+        if member_id is not None:
+            self._members[(guild_id, member_id)] = now
+        if len(self._members) + len(self._guilds) > PRUNE_THRESHOLD:
+            self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window
+        self._guilds = {k: t for k, t in self._guilds.items() if t > cutoff}
+        self._members = {k: t for k, t in self._members.items() if t > cutoff}
+
+    def use_primary(self, guild_id: Optional[int] = None, member_id: Optional[int] = None) -> bool:
+        """Whether a read of this guild (or member) must go to the primary"""
+        if not self.replica:
+            return True
+        cutoff = time.monotonic() - self.window
+        if self._everything > cutoff:
+            return True
+        if member_id is not None:
+            written = self._members.get((guild_id, member_id), float("-inf"))
+        else:
+            written = self._guilds.get(guild_id, float("-inf")) if guild_id is not None else float("-inf")
+        return written > cutoff
+
+    def session(self, guild_id: Optional[int] = None, member_id: Optional[int] = None):
+        """Sync session for a read-only query of this guild (or member)"""
+        if self.use_primary(guild_id, member_id):
+            self.primary_reads += 1
+            return get_db_session()
+        self.replica_reads += 1
+        return get_read_db_session()
+
+    def async_session(self, guild_id: Optional[int] = None, member_id: Optional[int] = None):
+        """Async session for a read-only query of this guild (or member)"""
+        if self.use_primary(guild_id, member_id):
+            self.primary_reads += 1
+            return get_async_db_session()
+        self.replica_reads += 1
+        return get_async_read_db_session()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "replica": self.replica,
+            "primary_reads": self.primary_reads,
+            "replica_reads": self.replica_reads,
+            "tracked_guilds": len(self._guilds),
+            "tracked_members": len(self._members),
+        }
+
+
+# Global read router instance
+read_your_writes = ReadYourWrites()